@@ -0,0 +1,215 @@
+"""Declarative table of the agent's Q actions.
+
+Every entry of Q_actions is declared once as an ActionSpec: which unit to
+select and how, which PySC2 function to issue and where, what to do on the
+step after, which agent counter or research flag the order updates, and
+when the action is excluded. compile_registry turns the list into integer
+lookup tables indexed by action id, and the exclusion rules into flat clause
+arrays that are evaluated for all actions with a few NumPy operations.
+
+An exclusion rule is a list of clauses that are OR-ed together. A clause
+(feature, op, threshold) compares one CONTEXT feature with a constant, e.g.
+('barracks', '==', 0).
+"""
+import collections
+
+import numpy as np
+from pysc2.lib import actions, units
+
+from placement import BUILDING_SIZE
+
+FUNCTIONS = actions.FUNCTIONS
+
+# selection modes (select phase, see macro.py)
+SELECT_NONE = 0
+SELECT_WORKER = 1           # select one SCV that is not at the screen edge
+SELECT_ALL_TYPE = 2         # select_all_type on the first unit of the type
+SELECT_ALL_ON_SCREEN = 3    # as SELECT_ALL_TYPE, no_op if the unit is at the screen edge
+SELECT_BARRACKS_SITE = 4    # select a random barracks we placed
+SELECT_ARMY = 5
+
+# order targets (order phase)
+TARGET_NONE = 0             # quick command
+TARGET_NEAR_HALF = 1        # free spot for the footprint in our half of the screen
+TARGET_FAR_HALF = 2         # free spot in the other half
+TARGET_BARRACKS_SITE = 3    # as TARGET_FAR_HALF, and remember the spot for add-ons
+TARGET_VESPENE = 4          # next free vespene geyser
+TARGET_GAS_WORKER = 5       # refinery that still needs workers
+TARGET_ADDON = 6            # the barracks selected in the select phase
+TARGET_MINIMAP = 7          # attack location on the minimap
+
+# queue policies
+QUEUE_NOW = 0
+QUEUE_QUEUED = 1
+QUEUE_IF_ADDONS = 2         # queued once both reactors and tech labs are built
+
+# follow-ups (follow-up phase)
+FOLLOWUP_NONE = 0
+FOLLOWUP_HARVEST = 1        # send the builder back to the minerals
+FOLLOWUP_RALLY = 2          # rally the command center to the minerals once
+
+# features the exclusion rules can test, filled in by the agent every decision
+CONTEXT = [
+    'supply_depots',
+    'refineries',
+    'barracks',
+    'engineering_bays',
+    'factories',
+    'armories',
+    'scvs',
+    'free_supply',
+    'army_supply',
+    'vespene',
+    'reactors',
+    'techlabs',
+    'refinery_workers',
+    'combatshield_research',
+    'infantryweapons_research',
+    'infantryarmor_research',
+    'vehicleweapons_research',
+]
+CONTEXT_INDEX = {name: i for i, name in enumerate(CONTEXT)}
+
+ActionSpec = collections.namedtuple('ActionSpec', [
+    'name', 'selector', 'select_mode', 'function', 'target', 'queue', 'followup',
+    'counter', 'flag', 'exclude', 'x', 'y', 'footprint'])
+
+
+def action(name, selector=None, select_mode=SELECT_NONE, function=None, target=TARGET_NONE,
+           queue=QUEUE_NOW, followup=FOLLOWUP_NONE, counter=None, flag=None, exclude=(), x=0, y=0,
+           footprint=0):
+    return ActionSpec(name, selector, select_mode, function, target, queue, followup,
+                      counter, flag, list(exclude), x, y, footprint)
+
+
+def _build(name, function, target, exclude, structure=None, followup=FOLLOWUP_HARVEST):
+    return action(name, units.Terran.SCV, SELECT_WORKER, function, target,
+                  followup=followup, exclude=exclude, footprint=BUILDING_SIZE.get(structure, 0))
+
+
+def _research(name, selector, select_mode, function, flag, building):
+    return action(name, selector, select_mode, function, queue=QUEUE_QUEUED, flag=flag,
+                  exclude=[(building, '==', 0), ('vespene', '<', 100), (flag, '==', 1)])
+
+
+ACTIONS = [
+    action('no_op'),
+
+    _build('Build_SupplyDepot', FUNCTIONS.Build_SupplyDepot_screen, TARGET_NEAR_HALF,
+           [('supply_depots', '>=', 10), ('free_supply', '>', 10)], units.Terran.SupplyDepot),
+    _build('Build_Refinery', FUNCTIONS.Build_Refinery_screen, TARGET_VESPENE,
+           [('supply_depots', '==', 0), ('refineries', '>=', 2)], followup=FOLLOWUP_NONE),
+    _build('Build_Barracks', FUNCTIONS.Build_Barracks_screen, TARGET_BARRACKS_SITE,
+           [('supply_depots', '==', 0), ('barracks', '>=', 3)], units.Terran.Barracks),
+    action('Build_Reactor', units.Terran.Barracks, SELECT_BARRACKS_SITE, FUNCTIONS.Build_Reactor_screen,
+           TARGET_ADDON, counter='reactor_count', exclude=[('barracks', '==', 0), ('reactors', '>=', 2)]),
+    action('Build_TechLab', units.Terran.Barracks, SELECT_BARRACKS_SITE, FUNCTIONS.Build_TechLab_screen,
+           TARGET_ADDON, counter='techlab_count', exclude=[('barracks', '==', 0), ('techlabs', '>=', 2)]),
+    _build('Build_EngineeringBay', FUNCTIONS.Build_EngineeringBay_screen, TARGET_NEAR_HALF,
+           [('barracks', '==', 0), ('engineering_bays', '>=', 1)], units.Terran.EngineeringBay),
+    _build('Build_Factory', FUNCTIONS.Build_Factory_screen, TARGET_FAR_HALF,
+           [('barracks', '==', 0), ('factories', '>=', 2)], units.Terran.Factory),
+    _build('Build_Armory', FUNCTIONS.Build_Armory_screen, TARGET_NEAR_HALF,
+           [('factories', '==', 0)], units.Terran.Armory),
+
+    action('Train_SCV', units.Terran.CommandCenter, SELECT_ALL_TYPE, FUNCTIONS.Train_SCV_quick,
+           queue=QUEUE_QUEUED, followup=FOLLOWUP_RALLY, exclude=[('scvs', '>=', 22)]),
+    action('Train_Marine', units.Terran.Barracks, SELECT_ALL_TYPE, FUNCTIONS.Train_Marine_quick,
+           queue=QUEUE_IF_ADDONS, exclude=[('barracks', '==', 0), ('free_supply', '==', 0)]),
+    action('Train_Marauder', units.Terran.Barracks, SELECT_ALL_TYPE, FUNCTIONS.Train_Marauder_quick,
+           queue=QUEUE_IF_ADDONS, exclude=[('barracks', '==', 0), ('free_supply', '==', 0)]),
+    action('Train_Hellion', units.Terran.Factory, SELECT_ALL_TYPE, FUNCTIONS.Train_Hellion_quick,
+           queue=QUEUE_QUEUED, exclude=[('factories', '==', 0), ('free_supply', '<', 2)]),
+    action('Train_Cyclone', units.Terran.Factory, SELECT_ALL_TYPE, FUNCTIONS.Train_Cyclone_quick,
+           queue=QUEUE_QUEUED, exclude=[('factories', '==', 0), ('free_supply', '<', 2), ('vespene', '<', 100)]),
+
+    _research('Research_CombatShield', units.Terran.BarracksTechLab, SELECT_ALL_ON_SCREEN,
+              FUNCTIONS.Research_CombatShield_quick, 'combatshield_research', 'techlabs'),
+    _research('Research_TerranInfantryWeapons', units.Terran.EngineeringBay, SELECT_ALL_TYPE,
+              FUNCTIONS.Research_TerranInfantryWeapons_quick, 'infantryweapons_research', 'engineering_bays'),
+    _research('Research_TerranInfantryArmor', units.Terran.EngineeringBay, SELECT_ALL_TYPE,
+              FUNCTIONS.Research_TerranInfantryArmor_quick, 'infantryarmor_research', 'engineering_bays'),
+    _research('Research_TerranVehicleWeapons', units.Terran.Armory, SELECT_ALL_TYPE,
+              FUNCTIONS.Research_TerranVehicleWeapons_quick, 'vehicleweapons_research', 'armories'),
+
+    action('Move_Refinery', units.Terran.SCV, SELECT_WORKER, FUNCTIONS.Harvest_Gather_screen,
+           TARGET_GAS_WORKER, queue=QUEUE_QUEUED, exclude=[('refineries', '==', 0), ('refinery_workers', '==', 8)]),
+]
+
+for mm_x in range(0, 64):
+    for mm_y in range(0, 64):
+        if (mm_x + 1) % 32 == 0 and (mm_y + 1) % 32 == 0:
+            ACTIONS.append(action('Attack' + '-' + str(mm_x - 16) + '-' + str(mm_y - 16),
+                                  select_mode=SELECT_ARMY, function=FUNCTIONS.Attack_minimap,
+                                  target=TARGET_MINIMAP, exclude=[('army_supply', '==', 0)],
+                                  x=mm_x - 16, y=mm_y - 16))
+
+
+def _interval(op, threshold):
+    # 모든 context 값은 정수이므로 비교식을 닫힌 구간 [low, high] 으로 바꿀 수 있음
+    if op == '==':
+        return threshold, threshold
+    if op == '>=':
+        return threshold, np.inf
+    if op == '>':
+        return threshold + 1, np.inf
+    if op == '<=':
+        return -np.inf, threshold
+    if op == '<':
+        return -np.inf, threshold - 1
+    raise ValueError('Unknown comparison %r' % op)
+
+
+class ActionRegistry:
+    """ACTIONS compiled into per-action lookup tables indexed by action id."""
+
+    def __init__(self, specs):
+        self.specs = list(specs)
+        self.names = [spec.name for spec in self.specs]
+        self.selector = [spec.selector for spec in self.specs]
+        self.select_mode = [spec.select_mode for spec in self.specs]
+        self.function = [spec.function for spec in self.specs]
+        self.function_id = [spec.function.id if spec.function is not None else None for spec in self.specs]
+        self.target = [spec.target for spec in self.specs]
+        self.queue = [spec.queue for spec in self.specs]
+        self.followup = [spec.followup for spec in self.specs]
+        self.counter = [spec.counter for spec in self.specs]
+        self.flag = [spec.flag for spec in self.specs]
+        self.x = [spec.x for spec in self.specs]
+        self.y = [spec.y for spec in self.specs]
+        self.footprint = [spec.footprint for spec in self.specs]
+
+        clauses = [(action_id, CONTEXT_INDEX[feature]) + _interval(op, threshold)
+                   for action_id, spec in enumerate(self.specs)
+                   for feature, op, threshold in spec.exclude]
+        self.clause_action = np.array([clause[0] for clause in clauses], dtype=np.intp)
+        self.clause_feature = np.array([clause[1] for clause in clauses], dtype=np.intp)
+        self.clause_low = np.array([clause[2] for clause in clauses], dtype=np.float64)
+        self.clause_high = np.array([clause[3] for clause in clauses], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.specs)
+
+    def excluded(self, context):
+        """Bool mask of excluded actions for a CONTEXT vector."""
+        values = context[self.clause_feature]
+        hit = (values >= self.clause_low) & (values <= self.clause_high)
+        mask = np.zeros(len(self.specs), dtype=bool)
+        mask[self.clause_action[hit]] = True
+        return mask
+
+    def excluded_batch(self, contexts):
+        """(n, actions) exclusion masks for an (n, len(CONTEXT)) matrix of contexts."""
+        values = contexts[:, self.clause_feature]
+        hit = (values >= self.clause_low) & (values <= self.clause_high)
+        masks = np.zeros((len(contexts), len(self.specs)), dtype=bool)
+        rows, clauses = np.nonzero(hit)
+        masks[rows, self.clause_action[clauses]] = True
+        return masks
+
+
+def compile_registry(specs=None):
+    return ActionRegistry(ACTIONS if specs is None else specs)
+
+
+REGISTRY = compile_registry()
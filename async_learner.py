@@ -0,0 +1,124 @@
+"""Q-learning updates and checkpoint writes on a background thread.
+
+With the synchronous loop the agent applies qlearn.learn before it returns
+its action and flushes the checkpoint at the end of every game, so SC2 waits
+for the learner and the learner waits for SC2. AsyncLearner takes both off
+the action path: learn() and flush() only append to a pending list, and the
+agent calls wake() as it returns its action. A single worker thread then
+applies the pending work in order - transitions reach the table in the same
+order as before - while the main thread is blocked in env.step, which waits
+on the game process without holding the GIL.
+
+The agent still reads the table to choose actions, so it has to hold `lock`
+around choose_action (as with a background ReplayTrainer). The update for
+the transition into a state is then applied after the action in that state
+was chosen. For the one-step q learner that gives the same table as the
+synchronous loop, since the update only writes the previous state's row;
+nstep, qlambda and LinearQ updates can reach the row being chosen, so with
+those learners the agent drain()s the pending update before every decision
+and only the checkpoint flush overlaps the game. The agent also drains at
+the start of a game, so the first decision sees the end-of-game update and
+max_rows pruning.
+"""
+from absl import flags
+
+import collections
+import threading
+
+import instrumentation
+
+FLAGS = flags.FLAGS
+flags.DEFINE_bool('async_learning', True, 'Apply Q-learning updates and checkpoint writes on a background '
+                                          'thread; learners other than one-step q still wait for the '
+                                          'update before each decision. --noasync_learning runs them '
+                                          'synchronously.')
+
+_LEARN = 0
+_FLUSH = 1
+_MARK = 2       # drain() 가 기다리는 threading.Event
+_STOP = 3
+
+
+class AsyncLearner:
+    def __init__(self, qlearn):
+        self.qlearn = qlearn
+        self.lock = threading.Lock()
+        self.error = None
+        self._pending = collections.deque()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def background(self):
+        return True
+
+    def learn(self, s, a, r, s_, choice=None):
+        """choice is the agent's own record of the decision (qlambda), since the table's may have moved on."""
+        self._put(_LEARN, (s, a, r, s_, choice))
+
+    def flush(self, checkpoint):
+        """Queues a checkpoint flush after every update queued so far."""
+        self._put(_FLUSH, checkpoint)
+
+    def _put(self, kind, payload):
+        if self.error is not None:
+            raise self.error
+        self._pending.append((kind, payload))
+
+    def wake(self):
+        """Lets the worker apply what is pending; call it right before the env steps."""
+        if self._pending and not self._wake.is_set():
+            self._wake.set()
+
+    def backlog(self):
+        return len(self._pending)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            while self._pending:
+                kind, payload = self._pending.popleft()
+                if kind == _STOP:
+                    return
+                if kind == _MARK:
+                    payload.set()
+                elif self.error is None:
+                    try:
+                        self._apply(kind, payload)
+                    except Exception as e:     # 다음 learn/flush 호출에서 메인 스레드로 전달
+                        self.error = e
+
+    def _apply(self, kind, payload):
+        with self.lock:
+            if kind == _LEARN:
+                s, a, r, s_, choice = payload
+                if choice is None:
+                    self.qlearn.learn(s, a, r, s_)
+                else:
+                    # choice 는 qlambda QLearningTable 에서만 생김
+                    self.qlearn.learn(s, a, r, s_, choice)
+            else:
+                with instrumentation.timer('save'):
+                    payload.flush(self.qlearn)
+
+    def drain(self):
+        """Blocks until every queued update and flush has been applied."""
+        if self._thread.is_alive():
+            done = threading.Event()
+            self._pending.append((_MARK, done))
+            self._wake.set()
+            done.wait()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        """Applies what is still queued and stops the worker."""
+        if self._thread.is_alive():
+            self._pending.append((_STOP, None))
+            self._wake.set()
+            self._thread.join()
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,223 @@
+"""Per-phase latency benchmark for TerranAgent.step.
+
+Drives the agent with synthetic observations from MockSC2Env (no game binary
+needed) against Q-tables prefilled to several sizes, and reports p50/p99
+latency of every phase of a step plus the memory allocated per step:
+
+    state      build_state          (minimap features + state key)
+    mask       build_excluded_actions
+    choose     qlearn.choose_action
+    learn      qlearn.learn
+    select     select_step          (macro select phase)
+    order      order_step           (macro order phase)
+    return     return_step          (macro follow-up phase)
+    step       the whole agent.step call
+
+Results are written as JSON so runs from different commits can be diffed:
+
+    python bench_agent.py --sizes 1000,10000,100000 --output bench_agent.json
+    python bench_agent.py --baseline old.json
+"""
+from absl import app, flags
+
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import state_codec
+from mock_env import MockSC2Env
+from terran_agent_alpha import TerranAgent
+
+FLAGS = flags.FLAGS
+flags.DEFINE_list('sizes', ['1000', '10000', '100000'], 'Q-table sizes (number of states) to benchmark.')
+flags.DEFINE_integer('steps', 5000, 'Agent steps to time per table size.')
+flags.DEFINE_integer('alloc_steps', 500, 'Agent steps to trace allocations over per table size.')
+flags.DEFINE_integer('seed', 0, 'Seed for the mock env, the agent and the table fill.')
+flags.DEFINE_string('output', 'bench_agent.json', 'Where to write the JSON results.')
+flags.DEFINE_string('baseline', None, 'Earlier results to compare p50/p99 against.')
+
+AGENT_PHASES = [
+    ('state', 'build_state'),
+    ('mask', 'build_excluded_actions'),
+    ('select', 'select_step'),
+    ('order', 'order_step'),
+    ('return', 'return_step'),
+]
+
+TABLE_PHASES = [
+    ('choose', 'choose_action'),
+    ('learn', 'learn'),
+]
+
+
+def _timed(function, samples):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - start)
+    return wrapper
+
+
+def fill_table(qlearn, size, rng):
+    """Adds random states until the table holds size rows."""
+    while len(qlearn) < size:
+        buckets = rng.randint(0, state_codec.MAXES + 1, size=(size - len(qlearn), state_codec.STATE_SIZE))
+        for key in state_codec.pack(buckets).tolist():
+            qlearn.check_state_exist(key)
+    qlearn.values[:len(qlearn)] = rng.normal(scale=0.01, size=(len(qlearn), len(qlearn.actions)))
+
+
+def make_agent(size, seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    agent = TerranAgent(persist=False)
+    fill_table(agent.qlearn, size, np.random.RandomState(seed))
+    return agent
+
+
+def drive(agent, env, steps, on_step=None):
+    """Runs agent.step for the given number of steps, calling on_step around each call."""
+    agent.setup(env.observation_spec(), env.action_spec())
+    timestep = env.reset()[0]
+    agent.reset()
+    for _ in range(steps):
+        if on_step is not None:
+            action = on_step(agent, timestep)
+        else:
+            action = agent.step(timestep)
+        if timestep.last():
+            timestep = env.reset()[0]
+            agent.reset()
+        else:
+            timestep = env.step([action])[0]
+
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1e6
+    if len(samples) == 0:
+        return {'count': 0}
+    return {
+        'count': int(len(samples)),
+        'p50_us': float(np.percentile(samples, 50)),
+        'p99_us': float(np.percentile(samples, 99)),
+        'mean_us': float(samples.mean()),
+    }
+
+
+def time_phases(size, steps, seed):
+    agent = make_agent(size, seed)
+    samples = {name: [] for name, _ in AGENT_PHASES + TABLE_PHASES}
+    samples['step'] = []
+    for name, method in AGENT_PHASES:
+        setattr(agent, method, _timed(getattr(agent, method), samples[name]))
+    for name, method in TABLE_PHASES:
+        setattr(agent.qlearn, method, _timed(getattr(agent.qlearn, method), samples[name]))
+
+    step = _timed(agent.step, samples['step'])
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        drive(agent, MockSC2Env(seed=seed), steps, lambda agent, timestep: step(timestep))
+    return {name: percentiles(values) for name, values in samples.items()}
+
+
+def trace_allocations(size, steps, seed):
+    agent = make_agent(size, seed)
+    blocks = []
+    peaks = []
+
+    def on_step(agent, timestep):
+        before = sys.getallocatedblocks()
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        current, _ = tracemalloc.get_traced_memory()
+        action = agent.step(timestep)
+        _, peak = tracemalloc.get_traced_memory()
+        blocks.append(sys.getallocatedblocks() - before)
+        peaks.append(peak - current)
+        return action
+
+    tracemalloc.start()
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            drive(agent, MockSC2Env(seed=seed), steps, on_step)
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        'retained_blocks_mean': float(np.mean(blocks)),
+        'retained_blocks_p99': float(np.percentile(blocks, 99)),
+    }
+    # tracemalloc.reset_peak 이 없는 버전(3.9 미만)에서는 peak 가 누적되므로 기록하지 않음
+    if hasattr(tracemalloc, 'reset_peak'):
+        result['peak_bytes_p50'] = float(np.percentile(peaks, 50))
+        result['peak_bytes_p99'] = float(np.percentile(peaks, 99))
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, steps, alloc_steps, seed):
+    results = {
+        'meta': {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'steps': steps,
+            'alloc_steps': alloc_steps,
+            'seed': seed,
+        },
+        'sizes': {},
+    }
+    for size in sizes:
+        results['sizes'][str(size)] = {
+            'latency': time_phases(size, steps, seed),
+            'allocations': trace_allocations(size, alloc_steps, seed),
+        }
+    return results
+
+
+def report(results, baseline=None):
+    for size, result in results['sizes'].items():
+        print('Q-table size %s' % size)
+        for phase, stats in result['latency'].items():
+            if not stats['count']:
+                continue
+            line = '  %-7s n=%6d  p50 %8.1f us  p99 %8.1f us' % (phase, stats['count'], stats['p50_us'], stats['p99_us'])
+            old = baseline and baseline['sizes'].get(size, {}).get('latency', {}).get(phase)
+            if old and old.get('count'):
+                line += '  (p50 x%.2f, p99 x%.2f vs baseline)' % (stats['p50_us'] / old['p50_us'],
+                                                                  stats['p99_us'] / old['p99_us'])
+            print(line)
+        print('  allocations: ' + ', '.join('%s %.0f' % item for item in sorted(result['allocations'].items())))
+
+
+def main(unused_argv):
+    results = run([int(size) for size in FLAGS.sizes], FLAGS.steps, FLAGS.alloc_steps, FLAGS.seed)
+    with open(FLAGS.output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+    baseline = None
+    if FLAGS.baseline:
+        with open(FLAGS.baseline) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+
+
+if __name__ == "__main__":
+    app.run(main)
@@ -0,0 +1,185 @@
+"""Episodes-to-target-winrate benchmark of the QLearningTable learners.
+
+Trains a fresh TerranAgent with each learner on MockSC2Env and counts the
+episodes until the win rate over the last --window games reaches --target
+(or --max_episodes runs out). Every learner is run with the same seeds, so
+the numbers are comparable between learners and between commits. Each run
+also records its win rate curve (every --window episodes) and the memory
+held by the learner at the end; `linear` is the tile-coded LinearQ.
+
+Before training, every seed plays --window games with an untrained agent
+that never learns (all-zero Q-values, so uniformly random among the allowed
+actions). Its win rate is reported next to the results: a target the
+untrained agent already reaches says nothing about learning, so the default
+difficulty is one where it wins about 10% of the games:
+
+    python bench_learners.py --learners q,nstep,qlambda,linear --seeds 0,1,2 --output bench_learners.json
+"""
+from absl import app, flags
+
+import collections
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+import terran_agent_alpha
+from mock_env import MockSC2Env
+from linear_q import LinearQ
+from q_table import LEARNERS, QLearningTable
+from terran_agent_alpha import Q_actions, TerranAgent
+
+FLAGS = flags.FLAGS
+flags.DEFINE_list('learners', list(LEARNERS) + ['linear'], 'Learners to compare.')
+flags.DEFINE_list('seeds', ['0', '1', '2'], 'One training run per seed and learner.')
+flags.DEFINE_integer('difficulty', 3, 'Mock bot difficulty (1 = very_easy ... 7 = very_hard).')
+flags.DEFINE_integer('step_mul', 16, 'Game steps per agent step.')
+flags.DEFINE_float('target', 0.3, 'Win rate to reach.')
+flags.DEFINE_integer('window', 50, 'Games the win rate is measured over.')
+flags.DEFINE_integer('max_episodes', 1000, 'Give up after this many episodes.')
+flags.DEFINE_float('learning_rate', 0.01, 'Learning rate of every learner.')
+flags.DEFINE_integer('n_steps', 5, 'Steps of the nstep learner.')
+flags.DEFINE_float('trace_decay', 0.8, 'Lambda of the qlambda learner.')
+flags.DEFINE_float('linear_learning_rate', 0.1, 'Learning rate of the linear learner (split over its active tiles).')
+flags.DEFINE_integer('memory_size', 4096, 'Weight rows of the linear learner.')
+flags.DEFINE_integer('n_tilings', 8, 'Tilings per feature group of the linear learner.')
+flags.DEFINE_string('output', 'bench_learners.json', 'Where to write the JSON results.')
+
+
+def make_table(learner, config):
+    if learner == 'linear':
+        return LinearQ(actions=list(range(len(Q_actions))),
+                       learning_rate=config['linear_learning_rate'],
+                       memory_size=config['memory_size'],
+                       n_tilings=config['n_tilings'])
+    return QLearningTable(actions=list(range(len(Q_actions))),
+                          learning_rate=config['learning_rate'],
+                          learner=learner,
+                          n_steps=config['n_steps'],
+                          trace_decay=config['trace_decay'])
+
+
+def model_bytes(qlearn):
+    """Approximate memory held by a learner's values and state lookups."""
+    masks = sum(sys.getsizeof(mask) for mask in qlearn.disallowed_actions.values())
+    if isinstance(qlearn, LinearQ):
+        return qlearn.weights.nbytes + qlearn.dirty.nbytes + sys.getsizeof(qlearn.disallowed_actions) + masks
+    keys = sum(sys.getsizeof(state) for state in qlearn.states)
+    return (qlearn.values[:len(qlearn)].nbytes + sys.getsizeof(qlearn.state_index) + sys.getsizeof(qlearn.states) +
+            keys + sys.getsizeof(qlearn.disallowed_actions) + masks)
+
+
+def play(agent, env, episodes):
+    """Win rate of agent over the given number of games."""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        wins = sum(terran_agent_alpha.run_episode(env, agent).reward == 1 for _ in range(episodes))
+    return wins / float(episodes)
+
+
+def baseline(seed, config):
+    """Win rate of an untrained agent that never learns, over --window games."""
+    random.seed(seed)
+    np.random.seed(seed)
+    # learning_rate=0: Q 값이 계속 0 이라 허용된 행동 중 무작위
+    agent = TerranAgent(qlearn=QLearningTable(actions=list(range(len(Q_actions))), learning_rate=0.0),
+                        persist=False)
+    env = MockSC2Env(seed=seed, difficulty=config['difficulty'], step_mul=config['step_mul'])
+    agent.setup(env.observation_spec(), env.action_spec())
+    return play(agent, env, config['window'])
+
+
+def train(learner, seed, config):
+    """Trains until the target win rate; returns a result dict."""
+    random.seed(seed)
+    np.random.seed(seed)
+    agent = TerranAgent(qlearn=make_table(learner, config), persist=False)
+    env = MockSC2Env(seed=seed, difficulty=config['difficulty'], step_mul=config['step_mul'])
+    agent.setup(env.observation_spec(), env.action_spec())
+
+    recent = collections.deque(maxlen=config['window'])
+    best = 0.0
+    curve = []
+    start = time.time()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for episode in range(1, config['max_episodes'] + 1):
+            last = terran_agent_alpha.run_episode(env, agent)
+            recent.append(1 if last.reward == 1 else 0)
+            if len(recent) == recent.maxlen:
+                winrate = sum(recent) / float(len(recent))
+                best = max(best, winrate)
+                if episode % config['window'] == 0:
+                    curve.append(winrate)
+                if winrate >= config['target']:
+                    break
+        else:
+            episode = None
+
+    return {
+        'episodes': episode,
+        'best_winrate': best,
+        'states': len(agent.qlearn),
+        'model_bytes': model_bytes(agent.qlearn),
+        'curve': curve,
+        'seconds': time.time() - start,
+    }
+
+
+def run(config):
+    results = {'config': config, 'learners': {}}
+    rates = [baseline(seed, config) for seed in config['seeds']]
+    results['baseline'] = {'winrates': rates, 'mean_winrate': float(np.mean(rates))}
+    for learner in config['learners']:
+        runs = [train(learner, seed, config) for seed in config['seeds']]
+        reached = [run['episodes'] for run in runs if run['episodes'] is not None]
+        results['learners'][learner] = {
+            'runs': runs,
+            'reached': len(reached),
+            'median_episodes': float(np.median(reached)) if reached else None,
+            'mean_model_mb': float(np.mean([run['model_bytes'] for run in runs])) / 2 ** 20,
+        }
+    return results
+
+
+def report(results):
+    config = results['config']
+    print('episodes to %.0f%% wins over %d games (difficulty %d, max %d episodes)' % (
+        config['target'] * 100, config['window'], config['difficulty'], config['max_episodes']))
+    untrained = results['baseline']['mean_winrate']
+    print('  untrained %.0f%% wins%s' % (untrained * 100, '  (already at the target: raise --target or --difficulty)'
+                                        if untrained >= config['target'] else ''))
+    for learner, result in results['learners'].items():
+        episodes = ' '.join('-' if run['episodes'] is None else str(run['episodes']) for run in result['runs'])
+        median = result['median_episodes']
+        print('  %-8s reached %d/%d  median %s  (%s)  %.2f MB' % (
+            learner, result['reached'], len(result['runs']), '-' if median is None else '%.0f' % median, episodes,
+            result['mean_model_mb']))
+
+
+def main(unused_argv):
+    config = {
+        'learners': FLAGS.learners,
+        'seeds': [int(seed) for seed in FLAGS.seeds],
+        'difficulty': FLAGS.difficulty,
+        'step_mul': FLAGS.step_mul,
+        'target': FLAGS.target,
+        'window': FLAGS.window,
+        'max_episodes': FLAGS.max_episodes,
+        'learning_rate': FLAGS.learning_rate,
+        'n_steps': FLAGS.n_steps,
+        'trace_decay': FLAGS.trace_decay,
+        'linear_learning_rate': FLAGS.linear_learning_rate,
+        'memory_size': FLAGS.memory_size,
+        'n_tilings': FLAGS.n_tilings,
+    }
+    results = run(config)
+    with open(FLAGS.output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    report(results)
+
+
+if __name__ == "__main__":
+    app.run(main)
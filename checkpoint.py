@@ -0,0 +1,160 @@
+"""Append-only Q-table checkpoints.
+
+A checkpoint is a snapshot plus a log:
+
+    <path>.qtb        every row of the table in the qtable_file format,
+                      opened with np.memmap
+    <path>.log        frames of (keys, rows) appended by flush() - only the
+                      rows that changed since the previous flush
+
+Log records hold whole rows, not deltas, so replaying a record twice is
+harmless. Rows evicted by the table's retention policy only disappear with a
+new snapshot, so a flush after an eviction compacts right away. Once the log grows past the snapshot it is compacted: the log is
+renamed to <path>.log.old, new flushes go to a fresh log, and a background
+thread writes a new snapshot (temp file plus rename) from a copy of the table
+and then deletes the old log. A crash at any point leaves a snapshot and logs
+that replay to the last flushed state; a torn frame at the end of a log is
+ignored, and load() cuts it off so later flushes append after the last good
+frame instead of behind the broken bytes.
+"""
+import os
+import pickle
+import struct
+import threading
+import zlib
+
+import qtable_file
+
+_FRAME_HEADER = struct.Struct('<QI')     # payload length, crc32
+
+
+class CheckpointStore:
+    def __init__(self, path, compact_ratio=1.0):
+        self.path = path
+        self.snapshot_file = path + '.qtb'
+        self.log_file = path + '.log'
+        self.old_log_file = path + '.log.old'
+        self.compact_ratio = compact_ratio
+        self._compaction = None
+
+    def exists(self):
+        return any(os.path.isfile(f) for f in (self.snapshot_file, self.log_file, self.old_log_file))
+
+    # --- loading ---------------------------------------------------------
+
+    def load(self, qlearn, read_only=False):
+        """Memory-maps the snapshot into qlearn and replays the logs on top of it.
+
+        Unless read_only, an interrupted compaction is finished on the way.
+        """
+        if os.path.isfile(self.snapshot_file):
+            qtable_file.read(self.snapshot_file, qlearn)
+        else:
+            qlearn.load_snapshot([], [])
+
+        for log_file in (self.old_log_file, self.log_file):
+            good_end = 0
+            for (keys, rows), good_end in self._read_log(log_file):
+                qlearn.load_rows(keys, rows)
+            if (not read_only and log_file == self.log_file and os.path.isfile(log_file) and
+                    os.path.getsize(log_file) > good_end):
+                # crash 로 잘린 frame 은 잘라냄 - 그 뒤에 append 하면 다음 load 가 거기서 멈춤
+                with open(log_file, 'r+b') as f:
+                    f.truncate(good_end)
+        qlearn.take_dirty()
+
+        if os.path.isfile(self.old_log_file) and not read_only:
+            # 이전 실행이 compaction 도중에 종료됨 - 지금 마무리
+            self._write_snapshot(*qlearn.snapshot())
+            os.remove(self.old_log_file)
+
+    def _read_log(self, log_file):
+        """Yields (frame, end offset) for every intact frame up to the first torn one."""
+        if not os.path.isfile(log_file):
+            return
+        size = os.path.getsize(log_file)
+        with open(log_file, 'rb') as f:
+            while True:
+                header = f.read(_FRAME_HEADER.size)
+                if len(header) < _FRAME_HEADER.size:
+                    return
+                length, crc = _FRAME_HEADER.unpack(header)
+                if length > size - f.tell():
+                    return
+                payload = f.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    return
+                yield pickle.loads(payload), f.tell()
+
+    # --- writing ---------------------------------------------------------
+
+    def flush(self, qlearn):
+        """Appends the rows changed since the last flush, compacting the log when it gets large."""
+        keys, rows = qlearn.take_dirty()
+        if len(keys):
+            payload = pickle.dumps((keys, rows), protocol=pickle.HIGHEST_PROTOCOL)
+            with open(self.log_file, 'ab') as f:
+                f.write(_FRAME_HEADER.pack(len(payload), zlib.crc32(payload)))
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+
+        # 행이 지워졌으면 로그를 재생해도 되살아나지 않도록 snapshot 을 새로 씀
+        if qlearn.take_evicted() or self._should_compact():
+            self.compact(qlearn)
+
+    def _should_compact(self):
+        if self._compaction is not None and self._compaction.is_alive():
+            return False
+        if not os.path.isfile(self.log_file):
+            return False
+        snapshot_size = os.path.getsize(self.snapshot_file) if os.path.isfile(self.snapshot_file) else 0
+        return os.path.getsize(self.log_file) > self.compact_ratio * snapshot_size
+
+    def compact(self, qlearn, background=True):
+        """Folds the log into a new snapshot of qlearn, which must have been flushed."""
+        self.wait()
+        if os.path.isfile(self.log_file):
+            os.replace(self.log_file, self.old_log_file)
+        states, values = qlearn.snapshot()
+
+        if background:
+            self._compaction = threading.Thread(target=self._finish_compaction, args=(states, values))
+            self._compaction.start()
+        else:
+            self._finish_compaction(states, values)
+
+    def _finish_compaction(self, states, values):
+        self._write_snapshot(states, values)
+        if os.path.isfile(self.old_log_file):
+            os.remove(self.old_log_file)
+
+    def _write_snapshot(self, states, values):
+        qtable_file.write(self.snapshot_file, states, values)
+
+    def save(self, qlearn):
+        """Writes a full snapshot synchronously and drops the logs."""
+        self.wait()
+        qlearn.take_dirty()
+        self._write_snapshot(*qlearn.snapshot())
+        for log_file in (self.old_log_file, self.log_file):
+            if os.path.isfile(log_file):
+                os.remove(log_file)
+
+    def wait(self):
+        if self._compaction is not None:
+            self._compaction.join()
+            self._compaction = None
+
+
+if __name__ == '__main__':
+    import sys
+
+    from q_table import QLearningTable
+    from terran_agent_alpha import DATA_FILE, Q_actions
+
+    # python checkpoint.py export Terran_Agent_data.gz
+    if len(sys.argv) == 3 and sys.argv[1] == 'export':
+        qlearn = QLearningTable(actions=list(range(len(Q_actions))))
+        CheckpointStore(DATA_FILE).load(qlearn)
+        qlearn.to_pickle(sys.argv[2])
@@ -0,0 +1,127 @@
+"""One long-lived env for many games.
+
+Launching StarCraft II, loading the map and joining the game takes longer
+than a short Simple64 game, so instead of a fresh SC2Env per episode the
+runners keep an EnvSession: reset() starts the next game on the running env
+(SC2Env.reset restarts the game in place) and only launches a new one
+
+    - the first time it is needed,
+    - every --env_restart_every games, to bound the memory growth of a
+      long-running game process,
+    - after the game process crashed or the connection to it broke.
+
+A crash surfaces from reset() or step() as EnvCrashed once the broken env has
+been closed; the runner drops the interrupted game and calls reset() again,
+which launches a new env. More than max_failures crashes in a row without a
+finished reset are re-raised.
+
+Launch and reset latency are logged and, with --instrument, reported as the
+env_launch_s / env_reset_ms gauges.
+"""
+from absl import flags, logging
+
+import time
+
+from pysc2.lib import protocol, remote_controller, sc_process
+
+import instrumentation
+
+FLAGS = flags.FLAGS
+flags.DEFINE_integer('env_restart_every', 50, 'Relaunch the game after this many episodes (0 = never).')
+
+# 게임 프로세스가 죽었거나 연결이 끊긴 경우
+CRASH_ERRORS = (protocol.ConnectionError, protocol.ProtocolError, remote_controller.ConnectError,
+                sc_process.SC2LaunchError)
+
+
+class EnvCrashed(Exception):
+    """The env died during reset or step; the current game is lost."""
+
+
+class EnvSession:
+    def __init__(self, make_env, restart_every=0, max_failures=3):
+        self.make_env = make_env
+        self.restart_every = restart_every
+        self.max_failures = max_failures
+        self.env = None
+        self.env_episodes = 0       # 현재 env 에서 시작한 게임 수
+        self.launches = 0
+        self.crashes = 0
+        self.failures = 0           # reset 성공 없이 연속으로 난 crash
+        self.launch_seconds = None
+        self.reset_seconds = None
+
+    def _launch(self):
+        start = time.time()
+        self.env = self.make_env()
+        self.env_episodes = 0
+        self.launches += 1
+        self.launch_seconds = time.time() - start
+        instrumentation.gauge('env_launch_s', round(self.launch_seconds, 2))
+        instrumentation.gauge('env_launches', self.launches)
+        logging.info('env launch %d took %.1fs', self.launches, self.launch_seconds)
+
+    def _close_env(self):
+        env, self.env = self.env, None
+        if env is None:
+            return
+        try:
+            env.close()
+        except Exception as e:     # 이미 죽은 프로세스는 닫다가도 실패할 수 있음
+            logging.warning('closing the env failed: %s', e)
+
+    def _crashed(self, error):
+        self.crashes += 1
+        self.failures += 1
+        instrumentation.count('env_crashes')
+        logging.warning('env crashed after %d games (%s: %s)', self.env_episodes, type(error).__name__, error)
+        self._close_env()
+        if self.failures > self.max_failures:
+            raise error
+        raise EnvCrashed(str(error))
+
+    def _ensure_env(self):
+        if self.env is None:
+            try:
+                self._launch()
+            except CRASH_ERRORS as e:
+                self._crashed(e)
+        return self.env
+
+    def observation_spec(self):
+        return self._ensure_env().observation_spec()
+
+    def action_spec(self):
+        return self._ensure_env().action_spec()
+
+    def reset(self):
+        if self.env is not None and self.restart_every and self.env_episodes >= self.restart_every:
+            logging.info('relaunching the env after %d games', self.env_episodes)
+            self._close_env()
+        env = self._ensure_env()
+
+        start = time.time()
+        try:
+            timesteps = env.reset()
+        except CRASH_ERRORS as e:
+            self._crashed(e)
+        self.reset_seconds = time.time() - start
+        self.env_episodes += 1
+        self.failures = 0
+        instrumentation.gauge('env_reset_ms', round(self.reset_seconds * 1000, 1))
+        return timesteps
+
+    def step(self, actions):
+        try:
+            return self.env.step(actions)
+        except CRASH_ERRORS as e:
+            self._crashed(e)
+
+    def close(self):
+        self._close_env()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
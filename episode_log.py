@@ -0,0 +1,158 @@
+"""Append-only episode metrics log (JSON lines).
+
+One line per finished game:
+
+    {"episode": 812, "reward": 1, "steps": 1250, "seconds": 41.2,
+     "steps_per_sec": 30.3, "table_size": 5120, "time": 1700000000.0}
+
+EpisodeLog.record only queues the line; a background thread appends queued
+lines to the file in batches, so ending an episode costs the same no matter
+how long the history is. The readers only look at the end of the file:
+
+    python episode_log.py Terran_Agent_episodes.jsonl [window]
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+_BLOCK_SIZE = 64 * 1024
+
+
+def read_tail(path, n):
+    """The last n records of the log, oldest first, reading the file backwards."""
+    if n <= 0 or not os.path.isfile(path):
+        return []
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        # 마지막 줄이 끊겨 있을 수 있으므로 n + 1 줄을 확보
+        while position > 0 and data.count(b'\n') <= n:
+            size = min(_BLOCK_SIZE, position)
+            position -= size
+            f.seek(position)
+            data = f.read(size) + data
+
+    records = []
+    for line in data.split(b'\n')[-(n + 1):]:
+        try:
+            records.append(json.loads(line.decode('utf-8')))
+        except ValueError:
+            continue
+    return records[-n:]
+
+
+def rolling_stats(path, window=100, history=1000):
+    """Windowed statistics over the last `history` episodes.
+
+    Returns a dict of NumPy arrays aligned with `episode`: reward, steps_per_sec,
+    and winrate, the fraction of wins in the `window` games ending at each
+    episode (over fewer games at the start of the history).
+    """
+    records = read_tail(path, history)
+    episode = np.array([record['episode'] for record in records], dtype=np.int64)
+    reward = np.array([record['reward'] for record in records], dtype=np.float64)
+    steps_per_sec = np.array([record.get('steps_per_sec', np.nan) for record in records], dtype=np.float64)
+
+    wins = np.concatenate([[0], np.cumsum(reward == 1)])
+    end = np.arange(1, len(reward) + 1)
+    start = np.maximum(end - window, 0)
+    winrate = (wins[end] - wins[start]) / np.maximum(end - start, 1).astype(np.float64)
+    return {
+        'episode': episode,
+        'reward': reward,
+        'steps_per_sec': steps_per_sec,
+        'winrate': winrate,
+    }
+
+
+def winrate(path, window=100):
+    """Win rate over the last window episodes, or None if the log is empty."""
+    reward = np.array([record['reward'] for record in read_tail(path, window)], dtype=np.float64)
+    if len(reward) == 0:
+        return None
+    return float(np.mean(reward == 1))
+
+
+def migrate_winrate(txt_path, path):
+    """Writes the rewards of an old Winrate.txt (one reward per line) as log records."""
+    with open(txt_path) as f, open(path, 'a') as out:
+        episode = 0
+        for line in f:
+            line = line.strip()
+            if line:
+                episode += 1
+                out.write(json.dumps({'episode': episode, 'reward': int(line)}) + '\n')
+
+
+class EpisodeLog:
+    def __init__(self, path, flush_interval=5.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        last = read_tail(path, 1)
+        self.episodes = last[0]['episode'] if last else 0
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, reward, steps=None, seconds=None, table_size=None, **extra):
+        """Queues one episode; returns its episode id."""
+        self.episodes += 1
+        record = {'episode': self.episodes, 'reward': reward, 'time': round(time.time(), 3)}
+        if steps is not None:
+            record['steps'] = steps
+        if seconds is not None:
+            record['seconds'] = round(seconds, 3)
+            if steps is not None and seconds > 0:
+                record['steps_per_sec'] = round(steps / seconds, 1)
+        if table_size is not None:
+            record['table_size'] = table_size
+        record.update(extra)
+        self._queue.put(json.dumps(record, sort_keys=True) + '\n')
+        return self.episodes
+
+    def _run(self):
+        while True:
+            lines = [self._queue.get()]
+            deadline = time.time() + self.flush_interval
+            while lines[-1] is not None:
+                try:
+                    lines.append(self._queue.get(timeout=max(deadline - time.time(), 0)))
+                except queue.Empty:
+                    break
+            closing = lines[-1] is None
+            if closing:
+                lines.pop()
+            if lines:
+                with open(self.path, 'a') as f:
+                    f.writelines(lines)
+            if closing:
+                return
+
+    def close(self):
+        """Writes everything still queued and stops the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) not in (2, 3):
+        sys.exit('usage: episode_log.py LOG [WINDOW]')
+    window = int(sys.argv[2]) if len(sys.argv) == 3 else 100
+    stats = rolling_stats(sys.argv[1], window, history=window)
+    if len(stats['episode']) == 0:
+        sys.exit('no episodes in %s' % sys.argv[1])
+    print('episodes %d-%d: win rate %.3f, mean reward %.3f, %.1f steps/s' % (
+        stats['episode'][0], stats['episode'][-1], stats['winrate'][-1],
+        stats['reward'].mean(), np.nanmean(stats['steps_per_sec'])))
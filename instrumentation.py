@@ -0,0 +1,184 @@
+"""Toggleable timers and counters for the training loop.
+
+Off by default; while off, timer() returns a shared no-op context manager and
+count() returns immediately, so the hooks can stay in the hot path. Turn it
+on with --instrument (see enable_from_flags) or enable():
+
+    python terran_agent_alpha.py --instrument --instrument_interval 30
+    python terran_agent_alpha.py --instrument --instrument_output stats.jsonl
+
+Every --instrument_interval seconds (checked at episode ends and in
+run_episode) a summary of the window is written: env steps/s, decisions/s,
+mean and max ms per timed phase, counters, gauges such as the Q-table size,
+and the peak RSS. Without --instrument_output it goes to the absl log as
+text, otherwise it is appended to the file as one JSON line.
+"""
+from absl import flags, logging
+
+import functools
+import json
+import time
+
+try:
+    import resource
+except ImportError:     # Windows
+    resource = None
+
+FLAGS = flags.FLAGS
+flags.DEFINE_bool('instrument', False, 'Time env.step, agent phases, learning and checkpoint I/O.')
+flags.DEFINE_float('instrument_interval', 60.0, 'Seconds between instrumentation summaries.')
+flags.DEFINE_string('instrument_output', None, 'Append summaries as JSON lines to this file instead of logging them.')
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('stats', 'start')
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        stats = self.stats
+        stats[0] += 1
+        stats[1] += elapsed
+        if elapsed > stats[2]:
+            stats[2] = elapsed
+        return False
+
+
+class Instrumentation:
+    def __init__(self):
+        self.enabled = False
+        self.interval = 60.0
+        self.output = None
+        self.gauges = {}        # last value, kept across windows
+        self._reset_window(time.time())
+
+    def _reset_window(self, now):
+        self.window_start = now
+        self.timers = {}        # name -> [count, total seconds, max seconds]
+        self.counters = {}
+        self.episodes = 0
+
+    def enable(self, interval=60.0, output=None):
+        self.enabled = True
+        self.interval = interval
+        self.output = output
+        self._reset_window(time.time())
+
+    def disable(self):
+        self.enabled = False
+
+    def timer(self, name):
+        if not self.enabled:
+            return _NULL_TIMER
+        stats = self.timers.get(name)
+        if stats is None:
+            stats = self.timers[name] = [0, 0.0, 0.0]
+        return _Timer(stats)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        if self.enabled:
+            self.gauges[name] = value
+
+    def end_episode(self):
+        if self.enabled:
+            self.episodes += 1
+            self.maybe_report()
+
+    def maybe_report(self):
+        if self.enabled and time.time() - self.window_start >= self.interval:
+            self.report()
+
+    def summary(self):
+        now = time.time()
+        seconds = max(now - self.window_start, 1e-9)
+        summary = {
+            'time': round(now, 3),
+            'seconds': round(seconds, 3),
+            'episodes': self.episodes,
+            'env_steps_per_sec': round(self.counters.get('env_steps', 0) / seconds, 2),
+            'decisions_per_sec': round(self.counters.get('decisions', 0) / seconds, 2),
+            'phases': {name: {'count': count,
+                              'ms_mean': round(total / count * 1000, 4),
+                              'ms_max': round(longest * 1000, 4),
+                              'share': round(total / seconds, 4)}
+                       for name, (count, total, longest) in sorted(self.timers.items()) if count},
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+        }
+        if resource is not None:
+            # ru_maxrss 는 Linux 에서 KB 단위
+            summary['max_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1)
+        return summary
+
+    def report(self):
+        """Writes the summary of the current window and starts a new one."""
+        summary = self.summary()
+        if self.output:
+            with open(self.output, 'a') as f:
+                f.write(json.dumps(summary, sort_keys=True) + '\n')
+        else:
+            logging.info('%.0fs, %d episodes: %.1f env steps/s, %.1f decisions/s, %s',
+                         summary['seconds'], summary['episodes'], summary['env_steps_per_sec'],
+                         summary['decisions_per_sec'],
+                         ', '.join('%s=%s' % item for item in sorted(summary['gauges'].items())))
+            for name, phase in summary['phases'].items():
+                logging.info('  %-12s n=%7d  mean %8.3f ms  max %8.3f ms  %5.1f%%',
+                             name, phase['count'], phase['ms_mean'], phase['ms_max'], phase['share'] * 100)
+        self._reset_window(time.time())
+        return summary
+
+
+_instrumentation = Instrumentation()
+
+enable = _instrumentation.enable
+disable = _instrumentation.disable
+timer = _instrumentation.timer
+count = _instrumentation.count
+gauge = _instrumentation.gauge
+end_episode = _instrumentation.end_episode
+maybe_report = _instrumentation.maybe_report
+summary = _instrumentation.summary
+report = _instrumentation.report
+
+
+def enabled():
+    return _instrumentation.enabled
+
+
+def enable_from_flags():
+    if FLAGS.instrument:
+        enable(FLAGS.instrument_interval, FLAGS.instrument_output)
+
+
+def timed(name):
+    """Decorator form of timer(name)."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _instrumentation.enabled:
+                return function(*args, **kwargs)
+            with _instrumentation.timer(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,187 @@
+"""Tile-coded linear Q-function with a fixed memory footprint.
+
+QLearningTable adds a row for every state key it sees, and with the time,
+mineral and vespene buckets in the key most rows are visited once. LinearQ
+has the same choose_action / learn interface, but it represents Q(s, a) as
+the sum of the weights of a fixed number of active tiles:
+
+    - the 14 bucket indices are unpacked from the state key (state_codec);
+    - every feature group in GROUPS is covered by n_tilings grids, each
+      offset by a fraction of a tile; a tile spans TILE_WIDTHS buckets of
+      every feature in the group;
+    - the tile coordinates of each (group, tiling) are hashed into one of
+      memory_size weight rows, one weight per action.
+
+So a state activates len(GROUPS) * n_tilings rows, memory is memory_size x
+actions floats however many states are visited, and an update touches only
+the active rows of one column. Nearby states share tiles, so a state seen
+for the first time already has a useful estimate.
+
+As with QLearningTable, choose_action records the exclusion mask of each
+state in disallowed_actions and learn bootstraps only from the actions
+allowed in the next state. The masks of the memory_size most recently
+chosen states are kept, so memory stays bounded.
+
+The snapshot / take_dirty interface treats the weight rows as the table's
+rows (keyed by row index), so CheckpointStore can save a LinearQ as well.
+"""
+import numpy as np
+
+import state_codec
+from q_table import excluded_mask, masked_argmax, masked_argmax_batch, random_allowed, random_allowed_batch
+from state_codec import TERMINAL
+
+# 함께 타일링하는 특징 묶음 (state_codec.STATE_FIELDS 의 인덱스)
+GROUPS = [(i,) for i in range(state_codec.STATE_SIZE)] + [
+    (0, 5),                 # time x army
+    (1, 2),                 # minerals x vespene
+    (3, 4, 5),              # barracks x factories x army
+    tuple(range(6, 14)),    # enemy / friendly quadrants
+]
+
+# 타일 하나가 덮는 bucket 수: 값이 많은 특징은 8 칸 정도로 거칠게
+TILE_WIDTHS = np.maximum((state_codec.MAXES + 1) // 8, 1)
+
+_HASH_RNG = np.random.RandomState(0x5eed)
+
+
+class LinearQ:
+    def __init__(self, actions, learning_rate=0.1, reward_decay=0.9, e_greedy=0.9, memory_size=4096, n_tilings=8):
+        self.actions = actions
+        self.lr = learning_rate
+        self.gamma = reward_decay
+        self.epsilon = e_greedy
+        self.memory_size = memory_size
+        self.n_tilings = n_tilings
+        self.n_active = len(GROUPS) * n_tilings
+        self.alpha = learning_rate / self.n_active     # step size per active tile
+
+        self.action_index = {action: i for i, action in enumerate(self.actions)}
+        self.weights = np.zeros((memory_size, len(self.actions)), dtype=np.float64)
+        self.dirty = np.zeros(memory_size, dtype=bool)
+        self.disallowed_actions = {}        # state -> mask, the memory_size most recently chosen states
+        self.last_choice = None
+
+        # 타일 좌표 -> 해시: 묶음에 없는 특징은 계수 0
+        coefficients = np.zeros((len(GROUPS), state_codec.STATE_SIZE), dtype=np.int64)
+        for g, group in enumerate(GROUPS):
+            coefficients[g, list(group)] = _HASH_RNG.randint(1, 1 << 30, size=len(group), dtype=np.int64) | 1
+        self.coefficients = coefficients.T                                      # (features, groups)
+        self.salt = _HASH_RNG.randint(0, 1 << 40, size=(n_tilings, len(GROUPS)), dtype=np.int64)  # (tilings, groups)
+        # 타일링 t 는 각 특징을 t / n_tilings 타일만큼 밀어 놓음
+        self.offsets = np.arange(n_tilings)[:, None] * TILE_WIDTHS[None, :]     # (tilings, features)
+
+    def __len__(self):
+        return self.memory_size
+
+    def active_tiles(self, states):
+        """(n, n_active) weight rows of n state keys."""
+        buckets = state_codec.unpack(np.asarray(states, dtype=np.int64).reshape(-1))     # (n, features)
+        coords = (buckets[:, None, :] * self.n_tilings + self.offsets) // (TILE_WIDTHS * self.n_tilings)
+        hashes = coords.dot(self.coefficients) + self.salt                             # (n, tilings, groups)
+        return (hashes % self.memory_size).reshape(len(buckets), -1)
+
+    def q_values(self, states):
+        """(n, actions) Q-values of the given states."""
+        return self.weights[self.active_tiles(states)].sum(axis=1)
+
+    def _q(self, state):
+        tiles = self.active_tiles([state])[0]
+        return tiles, self.weights[tiles].sum(axis=0)
+
+    def excluded_mask(self, excluded_actions):
+        return excluded_mask(excluded_actions, self.action_index)
+
+    def choose_action(self, observation, excluded_actions=[]):
+        """excluded_actions is a list of actions or a bool mask over self.actions."""
+        mask = self.excluded_mask(excluded_actions)
+        # 다시 넣어서 가장 최근에 고른 state 가 dict 끝에 오도록
+        self.disallowed_actions.pop(observation, None)
+        self.disallowed_actions[observation] = mask
+        if len(self.disallowed_actions) > self.memory_size:
+            del self.disallowed_actions[next(iter(self.disallowed_actions))]
+
+        if np.random.uniform() < self.epsilon:
+            column = masked_argmax(self._q(observation)[1], mask)
+        else:
+            column = random_allowed(mask)
+        return self.actions[column]
+
+    def choose_actions(self, states, masks=None, epsilon=None):
+        """Epsilon-greedy actions for many states at once."""
+        q_values = self.q_values(states)
+        if masks is None:
+            masks = np.zeros(q_values.shape, dtype=bool)
+        epsilon = self.epsilon if epsilon is None else epsilon
+
+        columns = masked_argmax_batch(q_values, masks)
+        explore = np.random.uniform(size=len(columns)) >= epsilon
+        if explore.any():
+            columns[explore] = random_allowed_batch(masks[explore])
+        return [self.actions[column] for column in columns]
+
+    def learn(self, s, a, r, s_):
+        if s == s_:
+            return
+        q_next = self._next_value(s_)
+        tiles, q_values = self._q(s)
+        column = self.action_index[a]
+        # 같은 행에 여러 타일이 해시될 수 있으므로 add.at
+        np.add.at(self.weights[:, column], tiles, self.alpha * (r + self.gamma * q_next - q_values[column]))
+        self.dirty[tiles] = True
+
+    def _next_value(self, s_):
+        """max Q(s_, .) over the actions allowed in s_, 0 for TERMINAL."""
+        if s_ == TERMINAL:
+            return 0.0
+        q_next = self._q(s_)[1]
+        mask = self.disallowed_actions.get(s_)
+        if mask is None or mask.all():
+            return q_next.max()
+        return np.where(mask, -np.inf, q_next).max()
+
+    def learn_batch(self, states, actions, rewards, next_states, next_masks=None, terminal=None):
+        """Vectorised learn over a minibatch of transitions (same arguments as QLearningTable.learn_batch)."""
+        next_states = np.asarray(next_states, dtype=np.int64)
+        terminal = next_states == TERMINAL if terminal is None else np.asarray(terminal, dtype=bool)
+        columns = np.array([self.action_index[a] for a in actions], dtype=np.intp)
+        rewards = np.asarray(rewards, dtype=np.float64)
+
+        tiles = self.active_tiles(states)
+        q_predict = self.weights[tiles, columns[:, None]].sum(axis=1)
+        q_next = self.q_values(np.where(terminal, 0, next_states))
+        if next_masks is not None:
+            # 모든 행동이 제외된 경우에는 마스크를 적용하지 않음
+            next_masks = np.asarray(next_masks, dtype=bool)
+            next_masks = next_masks & ~next_masks.all(axis=1, keepdims=True)
+            q_next = np.where(next_masks, -np.inf, q_next)
+        q_target = np.where(terminal, rewards, rewards + self.gamma * q_next.max(axis=1))
+
+        delta = np.repeat(self.alpha * (q_target - q_predict), tiles.shape[1])
+        np.add.at(self.weights, (tiles.reshape(-1), np.repeat(columns, tiles.shape[1])), delta)
+        self.dirty[tiles.reshape(-1)] = True
+
+    def reset_traces(self):
+        pass
+
+    # --- checkpoint interface (weight rows keyed by row index) -------------
+
+    def snapshot(self):
+        return list(range(self.memory_size)), self.weights.copy()
+
+    def load_snapshot(self, states, values):
+        self.weights[:] = 0
+        self.load_rows(states, values)
+        self.dirty[:] = False
+
+    def load_rows(self, states, rows):
+        if len(states):
+            self.weights[np.asarray(states, dtype=np.intp)] = rows
+
+    def take_dirty(self):
+        rows = np.flatnonzero(self.dirty)
+        self.dirty[:] = False
+        return rows.tolist(), self.weights[rows].copy()
+
+    def take_evicted(self):
+        return 0
@@ -0,0 +1,83 @@
+"""Runs a Q action as a macro of PySC2 calls instead of a fixed 3-step cycle.
+
+The agent used to spend exactly three env steps on every decision - select
+at move_number 0, order at 1, follow-up at 2 - and sent no_op whenever a
+step had nothing to do. MacroExecutor plans only the phases the action
+needs (from its action_registry modes) and hands out one call per env step,
+since PySC2 takes a single function call per agent per step:
+
+    select      skipped when the unit type is already selected
+    order       skipped for actions without a function (no_op)
+    follow-up   only for FOLLOWUP_HARVEST / FOLLOWUP_RALLY, issued as a
+                queued command where the game allows it
+
+A phase handler returns None when its precondition fails (nothing to select,
+the order is not available, no free spot, ...); the rest of the macro is
+dropped and next_call returns None, so the agent makes its next decision on
+the same observation instead of idling through the remaining steps.
+"""
+import action_registry
+import instrumentation
+from action_registry import REGISTRY
+
+SELECT = 0
+ORDER = 1
+FOLLOWUP = 2
+
+# 이미 같은 종류가 선택되어 있으면 선택 단계를 건너뛸 수 있는 모드
+_SKIPPABLE_SELECT = (
+    action_registry.SELECT_WORKER,
+    action_registry.SELECT_ALL_TYPE,
+    action_registry.SELECT_ALL_ON_SCREEN,
+)
+
+
+class MacroExecutor:
+    def __init__(self, agent):
+        self.agent = agent
+        self.reset()
+
+    def reset(self):
+        self.action = None
+        self.phases = []        # phases still to run, in order
+
+    @property
+    def active(self):
+        return len(self.phases) > 0
+
+    def start(self, action):
+        """Plans the phases of a freshly chosen action."""
+        self.action = action
+        phases = []
+        if REGISTRY.select_mode[action] != action_registry.SELECT_NONE:
+            phases.append(SELECT)
+        if REGISTRY.function[action] is not None:
+            phases.append(ORDER)
+        if REGISTRY.followup[action] != action_registry.FOLLOWUP_NONE:
+            phases.append(FOLLOWUP)
+        self.phases = phases
+
+    def next_call(self, view, unit_index):
+        """The next function call of the running macro, or None once it is done or aborted."""
+        agent = self.agent
+        action = self.action
+        while self.phases:
+            phase = self.phases.pop(0)
+            if phase == SELECT:
+                if (REGISTRY.select_mode[action] in _SKIPPABLE_SELECT and
+                        agent.unit_type_is_selected(view, REGISTRY.selector[action])):
+                    instrumentation.count('macro_select_skipped')
+                    continue
+                call = agent.select_step(view, unit_index, action)
+            elif phase == ORDER:
+                call = agent.order_step(view, unit_index, action)
+            else:
+                call = agent.return_step(view, unit_index, action)
+
+            if call is None:
+                if phase != FOLLOWUP:
+                    instrumentation.count('macro_aborts')
+                self.phases = []
+                return None
+            return call
+        return None
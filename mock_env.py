@@ -0,0 +1,524 @@
+"""A deterministic, headless stand-in for sc2_env.SC2Env.
+
+MockSC2Env implements the part of the SC2Env surface that main() and
+TerranAgent.step use - observation_spec, action_spec, reset, step and close -
+and produces TimeSteps with feature_minimap.player_relative, feature_units,
+feature_screen (buildable, pathable and unit_density; the other layers are
+zero), player, available_actions, single_select and multi_select.
+
+The game underneath is a small scripted economy: workers mine, buildings and
+units cost resources and finish after their build time, and a built-in enemy
+grows stronger over time, attacks in waves and can be attacked on the
+minimap. Structures occupy a square footprint on the screen and a build
+order whose footprint is not buildable and free does nothing. Everything random is drawn from a RandomState seeded from the env
+seed and the episode number, so the same seed replays the same games for the
+same actions. It runs thousands of steps per second, which makes it suitable
+for benchmarking and testing the agent and the Q-learner in isolation.
+"""
+from pysc2.env import environment
+from pysc2.lib import actions, features, named_array, point, units
+
+import numpy as np
+
+FUNCTIONS = actions.FUNCTIONS
+
+GAME_LOOPS_PER_SECOND = 22.4
+
+SCREEN_SIZE = 84
+MINIMAP_SIZE = 64
+
+# unit type -> (minerals, vespene, build time in game loops, supply)
+COSTS = {
+    units.Terran.SupplyDepot: (100, 0, 470, 0),
+    units.Terran.Refinery: (75, 0, 470, 0),
+    units.Terran.Barracks: (150, 0, 1030, 0),
+    units.Terran.EngineeringBay: (125, 0, 560, 0),
+    units.Terran.Factory: (150, 100, 960, 0),
+    units.Terran.Armory: (150, 100, 1030, 0),
+    units.Terran.BarracksReactor: (50, 50, 806, 0),
+    units.Terran.BarracksTechLab: (50, 25, 403, 0),
+    units.Terran.SCV: (50, 0, 269, 1),
+    units.Terran.Marine: (50, 0, 403, 1),
+    units.Terran.Marauder: (100, 25, 470, 2),
+    units.Terran.Hellion: (100, 0, 470, 2),
+    units.Terran.Cyclone: (150, 100, 717, 3),
+}
+
+ARMY_STRENGTH = {
+    units.Terran.Marine: 1.0,
+    units.Terran.Marauder: 2.0,
+    units.Terran.Hellion: 1.5,
+    units.Terran.Cyclone: 3.0,
+}
+
+RESEARCH_COST = (100, 100, 2200)
+
+# footprint side in screen pixels; structures not listed (add-ons, refineries) are not placed
+STRUCTURE_SIZE = {
+    units.Terran.CommandCenter: 13,
+    units.Terran.SupplyDepot: 6,
+    units.Terran.Barracks: 9,
+    units.Terran.EngineeringBay: 9,
+    units.Terran.Factory: 9,
+    units.Terran.Armory: 9,
+    units.Neutral.MineralField: 3,
+    units.Neutral.VespeneGeyser: 9,
+}
+
+# enemy strength gained per game minute, by sc2_env.Difficulty value
+DIFFICULTY_GROWTH = {
+    1: 2.0,     # very_easy
+    2: 3.0,     # easy
+    3: 4.0,     # medium
+    4: 5.0,     # medium_hard
+    5: 6.5,     # hard
+    6: 8.0,     # harder
+    7: 10.0,    # very_hard
+}
+
+# function id -> (unit type built or trained, producer unit type that has to be selected)
+BUILD_FUNCTIONS = {
+    FUNCTIONS.Build_SupplyDepot_screen.id: (units.Terran.SupplyDepot, units.Terran.SCV),
+    FUNCTIONS.Build_Refinery_screen.id: (units.Terran.Refinery, units.Terran.SCV),
+    FUNCTIONS.Build_Barracks_screen.id: (units.Terran.Barracks, units.Terran.SCV),
+    FUNCTIONS.Build_EngineeringBay_screen.id: (units.Terran.EngineeringBay, units.Terran.SCV),
+    FUNCTIONS.Build_Factory_screen.id: (units.Terran.Factory, units.Terran.SCV),
+    FUNCTIONS.Build_Armory_screen.id: (units.Terran.Armory, units.Terran.SCV),
+    FUNCTIONS.Build_Reactor_screen.id: (units.Terran.BarracksReactor, units.Terran.Barracks),
+    FUNCTIONS.Build_TechLab_screen.id: (units.Terran.BarracksTechLab, units.Terran.Barracks),
+}
+
+TRAIN_FUNCTIONS = {
+    FUNCTIONS.Train_SCV_quick.id: (units.Terran.SCV, units.Terran.CommandCenter),
+    FUNCTIONS.Train_Marine_quick.id: (units.Terran.Marine, units.Terran.Barracks),
+    FUNCTIONS.Train_Marauder_quick.id: (units.Terran.Marauder, units.Terran.Barracks),
+    FUNCTIONS.Train_Hellion_quick.id: (units.Terran.Hellion, units.Terran.Factory),
+    FUNCTIONS.Train_Cyclone_quick.id: (units.Terran.Cyclone, units.Terran.Factory),
+}
+
+RESEARCH_FUNCTIONS = {
+    FUNCTIONS.Research_CombatShield_quick.id: units.Terran.BarracksTechLab,
+    FUNCTIONS.Research_TerranInfantryWeapons_quick.id: units.Terran.EngineeringBay,
+    FUNCTIONS.Research_TerranInfantryArmor_quick.id: units.Terran.EngineeringBay,
+    FUNCTIONS.Research_TerranVehicleWeapons_quick.id: units.Terran.Armory,
+}
+
+# what has to be finished before a unit type can be built
+REQUIREMENTS = {
+    units.Terran.Barracks: units.Terran.SupplyDepot,
+    units.Terran.Factory: units.Terran.Barracks,
+    units.Terran.Armory: units.Terran.Factory,
+    units.Terran.Marauder: units.Terran.BarracksTechLab,
+    units.Terran.Cyclone: units.Terran.Factory,
+}
+
+_N_UNIT_FIELDS = len(features.FeatureUnit)
+_N_SCREEN_LAYERS = len(features.SCREEN_FEATURES)
+_N_SELECT_FIELDS = len(features.UnitLayer)
+
+
+class MockSC2Env(object):
+    def __init__(self, seed=0, step_mul=16, game_steps_per_episode=20000, difficulty=2,
+                 screen_size=SCREEN_SIZE, minimap_size=MINIMAP_SIZE):
+        self._seed = seed
+        self._step_mul = step_mul
+        self._game_steps_per_episode = game_steps_per_episode
+        self._growth = DIFFICULTY_GROWTH[int(difficulty)]
+        self._screen_size = screen_size
+        self._minimap_size = minimap_size
+        self._episode = 0
+
+        self._features = features.Features(
+            agent_interface_format=features.AgentInterfaceFormat(
+                feature_dimensions=features.Dimensions(screen=screen_size, minimap=minimap_size),
+                use_feature_units=True),
+            map_size=point.Point(minimap_size, minimap_size))
+
+    def observation_spec(self):
+        return (self._features.observation_spec(),)
+
+    def action_spec(self):
+        return (self._features.action_spec(),)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        pass
+
+    # --- episode ---------------------------------------------------------
+
+    def reset(self):
+        self._rng = np.random.RandomState((self._seed * 1000003 + self._episode) % (2 ** 32))
+        self._episode += 1
+
+        self._game_loop = 0
+        self._done = False
+        self._reward = 0
+        self._base_top_left = bool(self._rng.randint(2))
+
+        self._minerals = 50.0
+        self._vespene = 0.0
+        self._food_cap = 15
+        self._gas_workers = 0
+        self._army = {unit_type: 0 for unit_type in ARMY_STRENGTH}
+        self._upgrades = 0
+        self._researched = set()
+        self._pending = []      # (finish game loop, kind, payload)
+
+        self._enemy_strength = 8.0
+        self._next_wave = self._wave_interval()
+        self._enemy_near_base = False
+
+        self._units = []        # [unit_type, alliance, x, y, build_progress]
+        self._add_unit(units.Terran.CommandCenter, 22, 22)
+        for i in range(8):
+            self._add_unit(units.Neutral.MineralField, 6 + (i % 2) * 3, 6 + i * 4, features.PlayerRelative.NEUTRAL)
+        self._add_unit(units.Neutral.VespeneGeyser, 34, 6, features.PlayerRelative.NEUTRAL)
+        self._add_unit(units.Neutral.VespeneGeyser, 6, 40, features.PlayerRelative.NEUTRAL)
+        for i in range(12):
+            self._add_unit(units.Terran.SCV, 14 + (i % 4) * 2, 12 + (i // 4) * 3)
+
+        self._selection = []
+        self._minimap_cache = None
+        self._terrain = None
+        self._screen_cache = None
+
+        return [self._timestep(environment.StepType.FIRST)]
+
+    def step(self, step_actions):
+        if self._done:
+            return self.reset()
+
+        action = step_actions[0]
+        function = int(action.function)
+        if function not in self._available_actions():
+            raise ValueError('Function %s is currently not available' % FUNCTIONS[function].name)
+        self._apply(function, action.arguments)
+
+        self._advance(self._step_mul)
+
+        if self._done:
+            return [self._timestep(environment.StepType.LAST)]
+        return [self._timestep(environment.StepType.MID)]
+
+    # --- dynamics --------------------------------------------------------
+
+    def _add_unit(self, unit_type, x, y, alliance=features.PlayerRelative.SELF, build_progress=100):
+        if not self._base_top_left:
+            x, y = self._screen_size - x, self._screen_size - y
+        unit = [int(unit_type), int(alliance), int(x), int(y), build_progress]
+        self._units.append(unit)
+        self._feature_units_cache = None
+        self._screen_cache = None
+        return unit
+
+    def _count(self, unit_type, finished=False):
+        return sum(1 for unit in self._units
+                   if unit[0] == unit_type and (not finished or unit[4] == 100))
+
+    def _food_used(self):
+        return self._count(units.Terran.SCV) + sum(
+            count * COSTS[unit_type][3] for unit_type, count in self._army.items())
+
+    def _army_strength(self):
+        strength = sum(count * ARMY_STRENGTH[unit_type] for unit_type, count in self._army.items())
+        return strength * (1 + 0.1 * self._upgrades)
+
+    def _wave_interval(self):
+        return int(GAME_LOOPS_PER_SECOND * 60 * self._rng.uniform(3, 5))
+
+    def _can_afford(self, minerals, vespene):
+        return self._minerals >= minerals and self._vespene >= vespene
+
+    def _pay(self, minerals, vespene):
+        self._minerals -= minerals
+        self._vespene -= vespene
+
+    def _apply(self, function, arguments):
+        if function == FUNCTIONS.select_point.id:
+            self._select_point(int(arguments[0][0]), arguments[1])
+        elif function == FUNCTIONS.select_army.id:
+            self._selection = [[unit_type, 1, 100] for unit_type, count in self._army.items()
+                               for _ in range(min(count, 50))]
+        elif function in BUILD_FUNCTIONS:
+            unit_type, _ = BUILD_FUNCTIONS[function]
+            minerals, vespene, build_time, _ = COSTS[unit_type]
+            x, y = arguments[1]
+            if unit_type in STRUCTURE_SIZE and not self._placeable(x, y, STRUCTURE_SIZE[unit_type]):
+                return
+            if not self._base_top_left:
+                x, y = self._screen_size - x, self._screen_size - y
+            self._pay(minerals, vespene)
+            unit = self._add_unit(unit_type, x, y, build_progress=0)
+            self._pending.append((self._game_loop + build_time, 'unit', unit))
+        elif function in TRAIN_FUNCTIONS:
+            unit_type, _ = TRAIN_FUNCTIONS[function]
+            minerals, vespene, build_time, _ = COSTS[unit_type]
+            self._pay(minerals, vespene)
+            self._pending.append((self._game_loop + build_time, 'train', unit_type))
+        elif function in RESEARCH_FUNCTIONS:
+            minerals, vespene, research_time = RESEARCH_COST
+            self._pay(minerals, vespene)
+            self._researched.add(function)
+            self._pending.append((self._game_loop + research_time, 'upgrade', function))
+        elif function == FUNCTIONS.Harvest_Gather_screen.id:
+            x, y = arguments[1]
+            if self._unit_at(x, y, units.Terran.Refinery) is not None:
+                self._gas_workers = min(self._gas_workers + 1, 3 * self._count(units.Terran.Refinery, True))
+        elif function == FUNCTIONS.Attack_minimap.id:
+            self._attack(arguments[1])
+
+    def _footprint(self, x, y, size):
+        """Screen slices (rows, columns) of a size x size square centred on (x, y), clipped to the screen."""
+        top, left = int(y) - size // 2, int(x) - size // 2
+        return (slice(max(top, 0), max(top + size, 0)), slice(max(left, 0), max(left + size, 0)))
+
+    def _placeable(self, x, y, size):
+        top, left = int(y) - size // 2, int(x) - size // 2
+        if top < 0 or left < 0 or top + size > self._screen_size or left + size > self._screen_size:
+            return False
+        screen = self._feature_screen()
+        rows, columns = self._footprint(x, y, size)
+        return bool(screen[features.SCREEN_FEATURES.buildable.index][rows, columns].all() and
+                    screen[features.SCREEN_FEATURES.pathable.index][rows, columns].all())
+
+    def _unit_at(self, x, y, unit_type=None, radius=4):
+        best, best_distance = None, radius * radius
+        for unit in self._units:
+            if unit_type is not None and unit[0] != unit_type:
+                continue
+            distance = (unit[2] - x) ** 2 + (unit[3] - y) ** 2
+            if distance <= best_distance:
+                best, best_distance = unit, distance
+        return best
+
+    def _select_point(self, select_type, target):
+        unit = self._unit_at(target[0], target[1])
+        if unit is None or unit[1] != features.PlayerRelative.SELF:
+            self._selection = []
+        elif select_type == actions.SelectPointAct.select_all_type:
+            self._selection = [[u[0], u[1], u[4]] for u in self._units if u[0] == unit[0]]
+        else:
+            self._selection = [[unit[0], unit[1], unit[4]]]
+
+    def _attack(self, target):
+        enemy_base = 48 if self._base_top_left else 16
+        x, y = target
+        if abs(x - enemy_base) > 16 or abs(y - enemy_base) > 16:
+            return
+
+        strength = self._army_strength()
+        enemy = self._enemy_strength * self._rng.uniform(0.8, 1.2)
+        if strength > enemy:
+            self._done = True
+            self._reward = 1
+        else:
+            self._enemy_strength = max(self._enemy_strength - strength * 0.3, 1.0)
+            self._army = {unit_type: 0 for unit_type in self._army}
+            self._selection = []
+
+    def _advance(self, loops):
+        self._game_loop += loops
+        seconds = loops / GAME_LOOPS_PER_SECOND
+
+        mineral_workers = min(self._count(units.Terran.SCV) - self._gas_workers, 16)
+        self._minerals += max(mineral_workers, 0) * 0.95 * seconds
+        self._vespene += self._gas_workers * 0.9 * seconds
+
+        if self._pending:
+            finished = [item for item in self._pending if item[0] <= self._game_loop]
+            if finished:
+                self._pending = [item for item in self._pending if item[0] > self._game_loop]
+                for _, kind, payload in finished:
+                    self._finish(kind, payload)
+
+        self._enemy_strength += self._growth * seconds / 60
+        if self._enemy_near_base:
+            self._enemy_near_base = False
+            self._minimap_cache = None
+        if self._game_loop >= self._next_wave:
+            self._next_wave = self._game_loop + self._wave_interval()
+            self._enemy_wave()
+
+        if self._game_loop >= self._game_steps_per_episode:
+            self._done = True
+
+    def _finish(self, kind, payload):
+        if kind == 'unit':
+            payload[4] = 100
+            self._feature_units_cache = None
+            if payload[0] == units.Terran.SupplyDepot:
+                self._food_cap = min(self._food_cap + 8, 200)
+        elif kind == 'train':
+            if payload == units.Terran.SCV:
+                index = self._count(units.Terran.SCV)
+                self._add_unit(units.Terran.SCV, 14 + (index % 4) * 2, 12 + (index // 4) % 10 * 3)
+            else:
+                self._army[payload] += 1
+        elif kind == 'upgrade':
+            self._upgrades += 1
+
+    def _enemy_wave(self):
+        self._enemy_near_base = True
+        self._minimap_cache = None
+        wave = self._enemy_strength * self._rng.uniform(0.3, 0.6)
+        defence = self._army_strength() + 2 * self._count(units.Terran.Barracks, True)
+        if wave > 1.5 * defence + 4:
+            self._done = True
+            self._reward = -1
+            return
+
+        # 방어 성공 - 병력 일부 손실
+        losses = min(wave / max(defence, 1), 1.0) * 0.5
+        for unit_type in self._army:
+            self._army[unit_type] = int(self._army[unit_type] * (1 - losses))
+        self._enemy_strength = max(self._enemy_strength - wave * 0.2, 1.0)
+
+    # --- observation -----------------------------------------------------
+
+    def _available_actions(self):
+        available = {FUNCTIONS.no_op.id, FUNCTIONS.select_point.id}
+        if any(self._army.values()):
+            available.add(FUNCTIONS.select_army.id)
+        if not self._selection:
+            return available
+
+        selected, _, build_progress = self._selection[0]
+        if build_progress < 100:
+            return available
+        if selected in ARMY_STRENGTH:
+            available.add(FUNCTIONS.Attack_minimap.id)
+
+        for function, (unit_type, producer) in BUILD_FUNCTIONS.items():
+            if producer == selected and self._buildable(unit_type):
+                available.add(function)
+        for function, (unit_type, producer) in TRAIN_FUNCTIONS.items():
+            if producer == selected and self._buildable(unit_type) and (
+                    self._food_used() + COSTS[unit_type][3] <= self._food_cap):
+                available.add(function)
+        for function, producer in RESEARCH_FUNCTIONS.items():
+            if (producer == selected and function not in self._researched and
+                    self._can_afford(*RESEARCH_COST[:2])):
+                available.add(function)
+
+        if selected == units.Terran.SCV:
+            available.add(FUNCTIONS.Harvest_Gather_screen.id)
+        if selected == units.Terran.CommandCenter:
+            available.add(FUNCTIONS.Rally_Workers_screen.id)
+        return available
+
+    def _buildable(self, unit_type):
+        minerals, vespene, _, _ = COSTS[unit_type]
+        required = REQUIREMENTS.get(unit_type)
+        if required is not None and self._count(required, finished=True) == 0:
+            return False
+        return self._can_afford(minerals, vespene)
+
+    def _feature_units(self):
+        if self._feature_units_cache is None:
+            feature_units = np.zeros((len(self._units), _N_UNIT_FIELDS), dtype=np.int64)
+            if self._units:
+                rows = np.array(self._units, dtype=np.int64)
+                feature_units[:, features.FeatureUnit.unit_type] = rows[:, 0]
+                feature_units[:, features.FeatureUnit.alliance] = rows[:, 1]
+                feature_units[:, features.FeatureUnit.owner] = np.where(rows[:, 1] == features.PlayerRelative.SELF, 1, 16)
+                feature_units[:, features.FeatureUnit.x] = rows[:, 2]
+                feature_units[:, features.FeatureUnit.y] = rows[:, 3]
+                feature_units[:, features.FeatureUnit.build_progress] = rows[:, 4]
+                feature_units[:, features.FeatureUnit.health] = 100
+                feature_units[:, features.FeatureUnit.is_on_screen] = 1
+            self._feature_units_cache = named_array.NamedNumpyArray(feature_units, [None, features.FeatureUnit])
+        return self._feature_units_cache
+
+    def _player_relative(self):
+        if self._minimap_cache is None:
+            size = self._minimap_size
+            minimap = np.zeros((size, size), dtype=np.int32)
+            own, enemy = (16, 48) if self._base_top_left else (48, 16)
+            minimap[own - 4:own + 4, own - 4:own + 4] = features.PlayerRelative.SELF
+            minimap[enemy - 4:enemy + 4, enemy - 4:enemy + 4] = features.PlayerRelative.ENEMY
+            if self._enemy_near_base:
+                minimap[own + 6:own + 9, own - 2:own + 2] = features.PlayerRelative.ENEMY
+            self._minimap_cache = minimap
+        return self._minimap_cache
+
+    def _terrain_layers(self):
+        """(buildable, pathable) terrain of the map, before any unit is placed."""
+        if self._terrain is None:
+            size = self._screen_size
+            ys, xs = np.mgrid[0:size, 0:size]
+            if not self._base_top_left:
+                ys, xs = size - ys, size - xs
+            pathable = (xs >= 1) & (ys >= 1) & (xs < size - 1) & (ys < size - 1)
+            # 기지 앞의 절벽 - 지나갈 수는 있지만 건설 불가
+            cliff = (ys >= 44) & (ys < 50) & (xs >= 30)
+            self._terrain = (pathable & ~cliff, pathable)
+        return self._terrain
+
+    def _feature_screen(self):
+        if self._screen_cache is None:
+            size = self._screen_size
+            buildable, pathable = self._terrain_layers()
+            pathable = pathable.copy()
+            density = np.zeros((size, size), dtype=np.int32)
+            for unit in self._units:
+                footprint = STRUCTURE_SIZE.get(unit[0])
+                if footprint is None:
+                    if 0 <= unit[2] < size and 0 <= unit[3] < size:
+                        density[unit[3], unit[2]] += 1
+                    continue
+                rows, columns = self._footprint(unit[2], unit[3], footprint)
+                pathable[rows, columns] = False
+                density[rows, columns] += 1
+
+            screen = np.zeros((_N_SCREEN_LAYERS, size, size), dtype=np.int32)
+            screen[features.SCREEN_FEATURES.buildable.index] = buildable
+            screen[features.SCREEN_FEATURES.pathable.index] = pathable
+            screen[features.SCREEN_FEATURES.unit_density.index] = density
+            self._screen_cache = named_array.NamedNumpyArray(screen, [features.ScreenFeatures, None, None])
+        return self._screen_cache
+
+    def _selection_array(self, rows):
+        array = np.zeros((len(rows), _N_SELECT_FIELDS), dtype=np.int64)
+        if rows:
+            array[:, features.UnitLayer.unit_type] = [row[0] for row in rows]
+            array[:, features.UnitLayer.player_relative] = [row[1] for row in rows]
+            array[:, features.UnitLayer.health] = 100
+            array[:, features.UnitLayer.build_progress] = [row[2] for row in rows]
+        return named_array.NamedNumpyArray(array, [None, features.UnitLayer])
+
+    def _timestep(self, step_type):
+        player = np.zeros(len(features.Player), dtype=np.int64)
+        player[features.Player.player_id] = 1
+        player[features.Player.minerals] = int(self._minerals)
+        player[features.Player.vespene] = int(self._vespene)
+        player[features.Player.food_used] = self._food_used()
+        player[features.Player.food_cap] = self._food_cap
+        player[features.Player.food_army] = self._food_used() - self._count(units.Terran.SCV)
+        player[features.Player.food_workers] = self._count(units.Terran.SCV)
+        player[features.Player.army_count] = sum(self._army.values())
+
+        if len(self._selection) == 1:
+            single_select, multi_select = self._selection, []
+        else:
+            single_select, multi_select = [], self._selection
+
+        observation = named_array.NamedDict(
+            feature_minimap=named_array.NamedDict(player_relative=self._player_relative()),
+            feature_screen=self._feature_screen(),
+            feature_units=self._feature_units(),
+            player=named_array.NamedNumpyArray(player, features.Player),
+            available_actions=np.array(sorted(self._available_actions()), dtype=np.int32),
+            single_select=self._selection_array(single_select),
+            multi_select=self._selection_array(multi_select),
+            game_loop=np.array([self._game_loop], dtype=np.int32),
+        )
+
+        reward = self._reward if step_type == environment.StepType.LAST else 0
+        discount = 0.0 if step_type == environment.StepType.LAST else 1.0
+        return environment.TimeStep(step_type=step_type, reward=reward, discount=discount,
+                                    observation=observation)
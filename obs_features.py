@@ -0,0 +1,92 @@
+"""Vectorised minimap features for the agent state."""
+from pysc2.lib import features
+
+import math
+import numpy as np
+
+N_PLAYER_RELATIVE = len(features.PlayerRelative)
+
+_cell_maps = {}
+
+
+def _cell_map(shape, grid):
+    key = (shape, grid)
+    cell_map = _cell_maps.get(key)
+    if cell_map is None:
+        height, width = shape
+        rows, cols = grid
+        cell_y = np.arange(height) * rows // height
+        cell_x = np.arange(width) * cols // width
+        cell_map = (cell_y[:, None] * cols + cell_x[None, :]).ravel().astype(np.intp)
+        _cell_maps[key] = cell_map
+    return cell_map
+
+
+def grid_occupancy(player_relative, grid=(2, 2), flip=False):
+    """Which grid cells contain at least one pixel of each player_relative class.
+
+    Returns a (N_PLAYER_RELATIVE, rows * cols) bool array with cells in
+    row-major order. All classes are counted with a single bincount. With
+    flip=True the cells are reversed (the map rotated by 180 degrees), which is
+    how the agent views the map when its base is not top left.
+    """
+    player_relative = np.asarray(player_relative)
+    n_cells = grid[0] * grid[1]
+    cell_map = _cell_map(player_relative.shape, tuple(grid))
+
+    codes = player_relative.ravel().astype(np.intp) * n_cells + cell_map
+    counts = np.bincount(codes, minlength=N_PLAYER_RELATIVE * n_cells)
+    occupancy = counts[:N_PLAYER_RELATIVE * n_cells].reshape(N_PLAYER_RELATIVE, n_cells) > 0
+    if flip:
+        occupancy = occupancy[:, ::-1]
+    return occupancy
+
+
+def quadrant_features(player_relative, base_top_left):
+    """Enemy then friendly quadrant flags, as stored in current_state[6:14]."""
+    occupancy = grid_occupancy(player_relative, flip=not base_top_left)
+    return np.concatenate((occupancy[features.PlayerRelative.ENEMY],
+                           occupancy[features.PlayerRelative.SELF])).astype(np.float64)
+
+
+def _quadrant_features_loop(player_relative, base_top_left):
+    # 기존 TerranAgent.step 의 반복문 - 벤치마크와 검증용
+    result = []
+    for player in (features.PlayerRelative.ENEMY, features.PlayerRelative.SELF):
+        squares = np.zeros(4)
+        square_y, square_x = (player_relative == player).nonzero()
+        for i in range(0, len(square_y)):
+            y = int(math.ceil((square_y[i] + 1) / 32))
+            x = int(math.ceil((square_x[i] + 1) / 32))
+
+            squares[((y - 1) * 2) + (x - 1)] = 1
+        if not base_top_left:
+            squares = squares[::-1]
+        result.append(squares)
+    return np.concatenate(result)
+
+
+def benchmark(densities=(0.01, 0.1, 0.5), repeat=200, seed=0):
+    import timeit
+
+    rng = np.random.RandomState(seed)
+    results = []
+    for density in densities:
+        minimap = np.zeros((64, 64), dtype=np.int32)
+        occupied = rng.uniform(size=minimap.shape) < density
+        minimap[occupied] = rng.choice([features.PlayerRelative.SELF, features.PlayerRelative.ENEMY],
+                                       size=occupied.sum())
+        for base_top_left in (0, 1):
+            assert (quadrant_features(minimap, base_top_left) ==
+                    _quadrant_features_loop(minimap, base_top_left)).all()
+
+        loop = timeit.timeit(lambda: _quadrant_features_loop(minimap, 1), number=repeat) / repeat
+        vectorised = timeit.timeit(lambda: quadrant_features(minimap, 1), number=repeat) / repeat
+        results.append((density, loop, vectorised))
+    return results
+
+
+if __name__ == '__main__':
+    for density, loop, vectorised in benchmark():
+        print('density %.2f  loop %8.1f us  vectorised %6.1f us  x%.0f' %
+              (density, loop * 1e6, vectorised * 1e6, loop / vectorised))
@@ -0,0 +1,97 @@
+"""Per-timestep view of the observation fields the agent reads.
+
+A TimeStep observation is a NamedDict of NamedNumpyArrays, so every
+obs.observation.player.minerals goes through two __getattr__ lookups and
+returns a NumPy scalar, and `x in available_actions` scans the array.
+TerranAgent reads the same fields many times per step (state, exclusion
+context, select / order / follow-up phases), so it wraps each TimeStep in an
+ObsView once and hands that to every phase. Each field is extracted on first
+use and cached:
+
+    player          namedtuple of plain ints (features.Player order)
+    can_do(id)      O(1) lookup in a bool bitmap over all FUNCTIONS
+    selected_types  unit types of the first single / multi selected unit
+    units           UnitIndex over feature_units
+    player_relative, feature_screen
+                    the raw ndarrays (np.asarray strips the NamedNumpyArray
+                    wrapper without copying)
+"""
+import collections
+
+import numpy as np
+from pysc2.lib import actions, features
+
+from unit_index import UnitIndex
+
+Player = collections.namedtuple('Player', [field.name for field in features.Player])
+
+_N_FUNCTIONS = len(actions.FUNCTIONS)
+_UNIT_TYPE = features.UnitLayer.unit_type
+
+
+def _first_unit_type(selection):
+    selection = np.asarray(selection)
+    if selection.ndim != 2 or len(selection) == 0:
+        return -1
+    return int(selection[0, _UNIT_TYPE])
+
+
+class ObsView:
+    __slots__ = ('timestep', 'observation', '_player', '_available', '_selected_types', '_units',
+                 '_player_relative', '_feature_screen')
+
+    def __init__(self, timestep):
+        self.timestep = timestep
+        self.observation = timestep.observation
+        self._player = None
+        self._available = None
+        self._selected_types = None
+        self._units = None
+        self._player_relative = None
+        self._feature_screen = False    # None 은 "feature_screen 없음" 이라 False 로 미계산 표시
+
+    @property
+    def player(self):
+        if self._player is None:
+            self._player = Player(*np.asarray(self.observation['player']).tolist())
+        return self._player
+
+    @property
+    def available(self):
+        """Bool bitmap over actions.FUNCTIONS of the functions available this step."""
+        if self._available is None:
+            available = np.zeros(_N_FUNCTIONS, dtype=bool)
+            available[np.asarray(self.observation['available_actions'], dtype=np.intp)] = True
+            self._available = available
+        return self._available
+
+    def can_do(self, function_id):
+        return bool(self.available[function_id])
+
+    @property
+    def selected_types(self):
+        """(single_select, multi_select) unit type of the first selected unit, -1 for none."""
+        if self._selected_types is None:
+            self._selected_types = (_first_unit_type(self.observation['single_select']),
+                                    _first_unit_type(self.observation['multi_select']))
+        return self._selected_types
+
+    @property
+    def units(self):
+        if self._units is None:
+            self._units = UnitIndex(self.observation['feature_units'])
+        return self._units
+
+    @property
+    def player_relative(self):
+        if self._player_relative is None:
+            self._player_relative = np.asarray(self.observation['feature_minimap']['player_relative'])
+        return self._player_relative
+
+    @property
+    def feature_screen(self):
+        """Raw feature_screen array, or None if the observation has none."""
+        if self._feature_screen is False:
+            feature_screen = self.observation.get('feature_screen')
+            self._feature_screen = None if feature_screen is None else np.asarray(feature_screen)
+        return self._feature_screen
@@ -0,0 +1,169 @@
+"""Free building spots on the screen.
+
+PlacementGrid keeps a per-episode occupancy grid built from the
+feature_screen layers: a pixel is blocked unless it is buildable and
+pathable (structures make their footprint unpathable), optionally also when
+unit_density is non-zero. For every footprint size it precomputes, with one
+integral image (summed-area table) over the grid, the centres whose whole
+k x k square is free, split into the left and right half of the screen.
+
+Each candidate set is an array of flat positions plus a position -> slot
+index, so sample() is O(1) and removing a position is an O(1) swap with the
+last slot. observe() compares the new layers with the grid; newly blocked
+pixels only re-check the centres around them, and only a freed pixel (a
+structure destroyed) triggers a full rebuild. reserve() blocks a footprint
+as soon as the build order is issued, before the structure shows up in the
+layers.
+"""
+import numpy as np
+from pysc2.lib import features, units
+
+# footprint side in screen pixels (84x84 screen) of the structures the agent places
+BUILDING_SIZE = {
+    units.Terran.SupplyDepot: 6,
+    units.Terran.Barracks: 9,
+    units.Terran.EngineeringBay: 9,
+    units.Terran.Factory: 9,
+    units.Terran.Armory: 9,
+}
+
+LEFT = 0
+RIGHT = 1
+
+
+def window_sums(blocked, size):
+    """Number of blocked pixels in every size x size window, indexed by the window's top-left corner."""
+    table = np.zeros((blocked.shape[0] + 1, blocked.shape[1] + 1), dtype=np.int32)
+    np.cumsum(np.cumsum(blocked, axis=0, dtype=np.int32), axis=1, out=table[1:, 1:])
+    return table[size:, size:] - table[:-size, size:] - table[size:, :-size] + table[:-size, :-size]
+
+
+class _Candidates:
+    """Set of flat positions with O(1) add, remove and uniform sampling."""
+
+    def __init__(self, positions, n_cells):
+        self.positions = np.array(positions, dtype=np.intp)
+        self.count = len(self.positions)
+        self.slot_of = np.full(n_cells, -1, dtype=np.intp)
+        self.slot_of[self.positions] = np.arange(self.count)
+
+    def __len__(self):
+        return self.count
+
+    def remove(self, position):
+        slot = self.slot_of[position]
+        if slot < 0:
+            return
+        last = self.positions[self.count - 1]
+        self.positions[slot] = last
+        self.slot_of[last] = slot
+        self.slot_of[position] = -1
+        self.count -= 1
+
+    def sample(self, rng):
+        if self.count == 0:
+            return None
+        return self.positions[rng.randint(self.count)]
+
+
+class PlacementGrid:
+    def __init__(self, sizes=None, screen_size=84, use_density=False, rng=np.random):
+        self.sizes = sorted(set(BUILDING_SIZE.values() if sizes is None else sizes))
+        self.screen_size = screen_size
+        self.use_density = use_density
+        self.rng = rng
+        self.reset()
+
+    def reset(self):
+        self.blocked = None         # layer occupancy of the last observe()
+        self.reserved = np.zeros((self.screen_size, self.screen_size), dtype=bool)
+        self.candidates = {}        # (size, half) -> _Candidates of flat centre positions
+        self.rebuilds = 0
+
+    @property
+    def ready(self):
+        return self.blocked is not None
+
+    def _layer_blocked(self, feature_screen):
+        blocked = ~((feature_screen[features.SCREEN_FEATURES.buildable.index] > 0) &
+                    (feature_screen[features.SCREEN_FEATURES.pathable.index] > 0))
+        if self.use_density:
+            blocked |= feature_screen[features.SCREEN_FEATURES.unit_density.index] > 0
+        return blocked
+
+    def observe(self, feature_screen):
+        """Updates the grid from a feature_screen observation; False if the layers are missing."""
+        if feature_screen is None or len(feature_screen) <= features.SCREEN_FEATURES.unit_density.index:
+            return False
+        blocked = self._layer_blocked(feature_screen)
+        if self.blocked is None or (self.blocked & ~blocked).any():
+            self.blocked = blocked
+            self._rebuild()
+            return True
+
+        newly = blocked & ~self.blocked & ~self.reserved
+        self.blocked = blocked
+        if newly.any():
+            ys, xs = np.nonzero(newly)
+            self._block_region(ys.min(), ys.max(), xs.min(), xs.max())
+        return True
+
+    def _occupied(self):
+        return self.blocked | self.reserved
+
+    def _rebuild(self):
+        self.rebuilds += 1
+        occupied = self._occupied()
+        n = self.screen_size
+        for size in self.sizes:
+            free = window_sums(occupied, size) == 0
+            tops, lefts = np.nonzero(free)
+            ys, xs = tops + size // 2, lefts + size // 2
+            flat = ys * n + xs
+            right = xs >= n // 2
+            self.candidates[(size, LEFT)] = _Candidates(flat[~right], n * n)
+            self.candidates[(size, RIGHT)] = _Candidates(flat[right], n * n)
+
+    def _block_region(self, y0, y1, x0, x1):
+        """Re-checks the candidates whose footprint can overlap the box [y0, y1] x [x0, x1]."""
+        n = self.screen_size
+        occupied = self._occupied()
+        for size in self.sizes:
+            # 좌상단이 이 범위에 있는 footprint 만 상자와 겹칠 수 있음
+            top0, top1 = max(y0 - size + 1, 0), min(y1, n - size)
+            left0, left1 = max(x0 - size + 1, 0), min(x1, n - size)
+            if top0 > top1 or left0 > left1:
+                continue
+            window = occupied[top0:top1 + size, left0:left1 + size]
+            tops, lefts = np.nonzero(window_sums(window, size) > 0)
+            half = size // 2
+            for y, x in zip((tops + top0 + half).tolist(), (lefts + left0 + half).tolist()):
+                side = RIGHT if x >= n // 2 else LEFT
+                self.candidates[(size, side)].remove(y * n + x)
+
+    def reserve(self, x, y, size):
+        """Marks the footprint of a structure ordered at screen (x, y) as taken."""
+        n = self.screen_size
+        top, left = y - size // 2, x - size // 2
+        y0, y1 = max(top, 0), min(top + size - 1, n - 1)
+        x0, x1 = max(left, 0), min(left + size - 1, n - 1)
+        if y0 > y1 or x0 > x1:
+            return
+        self.reserved[y0:y1 + 1, x0:x1 + 1] = True
+        if self.ready:
+            self._block_region(y0, y1, x0, x1)
+
+    def free_spots(self, size, side):
+        candidates = self.candidates.get((size, side))
+        return 0 if candidates is None else len(candidates)
+
+    def sample(self, size, side):
+        """Screen (x, y) of a random free centre for a size x size footprint in a screen half, or None."""
+        candidates = self.candidates.get((size, side))
+        if candidates is None:
+            return None
+        position = candidates.sample(self.rng)
+        if position is None:
+            return None
+        y, x = divmod(int(position), self.screen_size)
+        return x, y
@@ -0,0 +1,426 @@
+import collections
+
+import numpy as np
+import pandas as pd
+
+from state_codec import TERMINAL
+
+
+def excluded_mask(excluded_actions, action_index):
+    """Bool mask over the actions from a list of excluded actions (masks pass through)."""
+    if isinstance(excluded_actions, np.ndarray) and excluded_actions.dtype == bool:
+        return excluded_actions
+    mask = np.zeros(len(action_index), dtype=bool)
+    for excluded_action in excluded_actions:
+        mask[action_index[excluded_action]] = True
+    return mask
+
+
+def masked_argmax(q_values, mask):
+    """Column of the largest unmasked value, ties broken at random.
+
+    mask is True for excluded columns.
+    """
+    q_values = np.where(mask, -np.inf, q_values)
+    best = np.flatnonzero(q_values == q_values.max())
+    if len(best) == 1:
+        return best[0]
+    return best[np.random.randint(len(best))]
+
+
+def random_allowed(mask):
+    allowed = np.flatnonzero(~mask)
+    if len(allowed) == 0:
+        allowed = np.arange(len(mask))
+    return allowed[np.random.randint(len(allowed))]
+
+
+def masked_argmax_batch(q_values, masks):
+    """Row-wise masked_argmax of a (n, actions) matrix."""
+    q_values = np.where(masks, -np.inf, q_values)
+    ties = q_values == q_values.max(axis=1, keepdims=True)
+    return np.argmax(np.where(ties, np.random.uniform(size=q_values.shape), -1.0), axis=1)
+
+
+def random_allowed_batch(masks):
+    draws = np.random.uniform(size=masks.shape)
+    draws[masks & ~masks.all(axis=1, keepdims=True)] = -1.0
+    return np.argmax(draws, axis=1)
+
+
+LEARNERS = ('q', 'nstep', 'qlambda')
+EVICTIONS = ('lru', 'lfu')
+
+# 한도를 넘으면 max_rows 의 이 비율까지 줄임 (매 에피소드마다 정리하지 않도록)
+RETAIN_FRACTION = 0.9
+
+
+class QLearningTable:
+    """Q-table stored in a growable float64 matrix.
+
+    Rows are addressed through a dict from state key to row index, and the
+    matrix capacity doubles whenever it fills up, so adding a state is
+    amortised O(1) instead of copying a whole DataFrame.
+
+    learner picks the update rule of learn():
+
+        q        one-step Q-learning
+        nstep    n-step returns: each (s, a) is updated once n_steps rewards
+                 later (or at the end of the episode) with the discounted sum
+                 plus the bootstrapped value of the state reached
+        qlambda  Watkins Q(lambda) with replacing eligibility traces; traces
+                 are kept in a dict of the recently visited (row, column)
+                 pairs, dropped below trace_cutoff and cut after an
+                 exploratory action
+
+    The nstep and qlambda modes expect the transitions of one episode in order,
+    ending with s_ == TERMINAL.
+
+    Retention: every row keeps a visit count and the transition clock of its
+    last visit, both advanced by learn / learn_batch only (once per
+    transition), so a learner that never calls choose_action ages rows the
+    same way an acting agent does. With max_rows set, the table is pruned at the end of an
+    episode (and after learn_batch) once it holds more than max_rows states:
+    all-zero rows go first - they score the same as an unseen state - then
+    the least recently (eviction='lru') or least often ('lfu') visited rows,
+    down to RETAIN_FRACTION * max_rows. disallowed_actions entries go with
+    their rows, so it is bounded too.
+    """
+
+    def __init__(self, actions, learning_rate=0.01, reward_decay=0.9, e_greedy=0.9, capacity=1024,
+                 learner='q', n_steps=5, trace_decay=0.8, trace_cutoff=1e-3, max_rows=None, eviction='lru'):
+        if learner not in LEARNERS:
+            raise ValueError('Unknown learner %r, expected one of %s' % (learner, ', '.join(LEARNERS)))
+        if eviction not in EVICTIONS:
+            raise ValueError('Unknown eviction %r, expected one of %s' % (eviction, ', '.join(EVICTIONS)))
+        self.actions = actions
+        self.lr = learning_rate
+        self.gamma = reward_decay
+        self.epsilon = e_greedy
+        self.learner = learner
+        self.n_steps = n_steps
+        self.trace_decay = trace_decay
+        self.trace_cutoff = trace_cutoff
+        self.max_rows = max_rows
+        self.eviction = eviction
+
+        self.action_index = {action: i for i, action in enumerate(self.actions)}
+        self.state_index = {}
+        self.states = []
+        self.values = np.zeros((max(capacity, 1), len(self.actions)), dtype=np.float64)
+        self.disallowed_actions = {}
+        self.dirty = set()      # rows updated since the last take_dirty()
+
+        self.clock = 0          # learn 한 transition 수
+        self.visits = np.zeros(len(self.values), dtype=np.int64)
+        self.last_seen = np.zeros(len(self.values), dtype=np.int64)
+        self.evicted = 0        # rows removed since the last take_evicted()
+
+        self.pending = collections.deque()  # nstep: (row, column, reward) not yet updated
+        self.traces = {}                    # qlambda: (row, column) -> eligibility
+        self.last_choice = None             # qlambda: (state, column, greedy) of the last choose_action
+
+    def __len__(self):
+        return len(self.states)
+
+    def choose_action(self, observation, excluded_actions=[]):
+        """excluded_actions is a list of actions or a bool mask over self.actions."""
+        row = self.check_state_exist(observation)
+
+        mask = self.excluded_mask(excluded_actions)
+        self.disallowed_actions[observation] = mask
+
+        if np.random.uniform() < self.epsilon:
+            # 최댓값이 여러 개면 그 중 무작위로 선택
+            column = masked_argmax(self.values[row], mask)
+            greedy = True
+        else:
+            column = random_allowed(mask)
+            greedy = None
+
+        if self.learner == 'qlambda':
+            if greedy is None:
+                greedy = self.values[row, column] >= np.where(mask, -np.inf, self.values[row]).max()
+            self.last_choice = (observation, column, greedy)
+        return self.actions[column]
+
+    def choose_actions(self, states, masks=None, epsilon=None):
+        """Epsilon-greedy actions for many states at once, without adding rows.
+
+        masks is an optional (n, actions) bool array of excluded actions.
+        """
+        q_values = self.q_values(states)
+        if masks is None:
+            masks = np.zeros(q_values.shape, dtype=bool)
+        epsilon = self.epsilon if epsilon is None else epsilon
+
+        columns = masked_argmax_batch(q_values, masks)
+        explore = np.random.uniform(size=len(columns)) >= epsilon
+        if explore.any():
+            columns[explore] = random_allowed_batch(masks[explore])
+        return [self.actions[column] for column in columns]
+
+    def q_values(self, states):
+        """(n, actions) Q-values of the given states; unknown states score 0."""
+        rows = np.array([self.state_index.get(state, -1) for state in states], dtype=np.intp)
+        q_values = self.values[np.maximum(rows, 0)]
+        q_values[rows < 0] = 0
+        return q_values
+
+    def learn(self, s, a, r, s_, choice=None):
+        """choice is the (state, column, greedy) of the decision that took a in s, by default last_choice."""
+        if s == s_:
+            return
+
+        q_next = self._next_value(s_)
+        row = self.check_state_exist(s)
+        column = self.action_index[a]
+        self.clock += 1
+        self.visits[row] += 1
+        self.last_seen[row] = self.clock
+
+        if self.learner == 'nstep':
+            self._learn_nstep(row, column, r, s_, q_next)
+        elif self.learner == 'qlambda':
+            self._learn_qlambda(s, row, column, r, s_, q_next, self.last_choice if choice is None else choice)
+        else:
+            q_predict = self.values[row, column] # 현재 state
+            q_target = r + self.gamma * q_next # 다음 state
+
+            # update
+            self.values[row, column] += self.lr * (q_target - q_predict)
+            self.dirty.add(row)
+
+        if s_ == TERMINAL:
+            self._enforce_max_rows()
+
+    def _next_value(self, s_):
+        """max Q(s_, .) over the actions allowed in s_, 0 for TERMINAL."""
+        next_row = self.check_state_exist(s_)
+        if s_ == TERMINAL:
+            return 0.0
+        mask = self.disallowed_actions.get(s_)
+        if mask is None:
+            return self.values[next_row].max()
+        return np.where(self.excluded_mask(mask), -np.inf, self.values[next_row]).max()
+
+    def _update(self, row, column, q_target):
+        self.values[row, column] += self.lr * (q_target - self.values[row, column])
+        self.dirty.add(row)
+
+    def _learn_nstep(self, row, column, r, s_, q_next):
+        self.pending.append((row, column, r))
+        if s_ == TERMINAL:
+            # 에피소드 끝: 남은 (s, a) 를 부트스트랩 없이 모두 갱신
+            q_target = 0.0
+            while self.pending:
+                row, column, r = self.pending.pop()
+                q_target = r + self.gamma * q_target
+                self._update(row, column, q_target)
+        elif len(self.pending) >= self.n_steps:
+            q_target = q_next
+            for _, _, r in reversed(self.pending):
+                q_target = r + self.gamma * q_target
+            row, column, _ = self.pending.popleft()
+            self._update(row, column, q_target)
+
+    def _learn_qlambda(self, s, row, column, r, s_, q_next, choice):
+        if choice is not None and choice[:2] == (s, column) and not choice[2]:
+            # 탐험 행동 이전의 trace 는 이 행동의 TD error 로 갱신하지 않음 (Watkins)
+            self.traces.clear()
+
+        delta = r + self.gamma * q_next - self.values[row, column]
+        self.traces[(row, column)] = 1.0
+
+        keys = list(self.traces)
+        rows = np.fromiter((key[0] for key in keys), dtype=np.intp, count=len(keys))
+        columns = np.fromiter((key[1] for key in keys), dtype=np.intp, count=len(keys))
+        eligibility = np.fromiter(self.traces.values(), dtype=np.float64, count=len(keys))
+        self.values[rows, columns] += self.lr * delta * eligibility
+        self.dirty.update(rows.tolist())
+
+        if s_ == TERMINAL:
+            self.traces = {}
+            return
+        eligibility *= self.gamma * self.trace_decay
+        self.traces = {key: e for key, e in zip(keys, eligibility.tolist()) if e >= self.trace_cutoff}
+
+    def reset_traces(self):
+        """Drops pending n-step updates and eligibility traces (e.g. after an interrupted episode)."""
+        self.pending.clear()
+        self.traces = {}
+        self.last_choice = None
+
+    def learn_batch(self, states, actions, rewards, next_states, next_masks=None, terminal=None):
+        """Vectorised learn over a minibatch of transitions.
+
+        actions are column indices; next_masks is an optional (n, actions) bool
+        array of the actions excluded in each next state, terminal a bool array
+        (by default next_states == TERMINAL). Repeated (state, action) pairs
+        all contribute, each computed from the Q-values before the batch.
+        """
+        states = np.asarray(states)
+        next_states = np.asarray(next_states)
+        actions = np.asarray(actions)
+        rewards = np.asarray(rewards, dtype=np.float64)
+        terminal = next_states == TERMINAL if terminal is None else np.asarray(terminal, dtype=bool)
+        if next_masks is not None:
+            next_masks = np.asarray(next_masks, dtype=bool)
+        keep = states != next_states
+        if not keep.all():
+            states, next_states, terminal = states[keep], next_states[keep], terminal[keep]
+            actions, rewards = actions[keep], rewards[keep]
+            if next_masks is not None:
+                next_masks = next_masks[keep]
+        if len(states) == 0:
+            return
+
+        next_rows = np.array([self.check_state_exist(s_) if not end else 0
+                              for s_, end in zip(next_states.tolist(), terminal.tolist())], dtype=np.intp)
+        rows = np.array([self.check_state_exist(s) for s in states.tolist()], dtype=np.intp)
+        columns = np.asarray(actions, dtype=np.intp)
+
+        q_next = self.values[next_rows]
+        if next_masks is not None:
+            # 모든 행동이 제외된 경우에는 마스크를 적용하지 않음
+            next_masks = next_masks & ~next_masks.all(axis=1, keepdims=True)
+            q_next = np.where(next_masks, -np.inf, q_next)
+        q_target = np.where(terminal, rewards, rewards + self.gamma * q_next.max(axis=1))
+
+        np.add.at(self.values, (rows, columns), self.lr * (q_target - self.values[rows, columns]))
+        self.dirty.update(rows.tolist())
+        np.add.at(self.visits, rows, 1)
+        # batch 안의 순서대로 clock 을 증가 - 같은 행이 여러 번 나오면 마지막 것
+        np.maximum.at(self.last_seen, rows, self.clock + np.arange(1, len(rows) + 1))
+        self.clock += len(rows)
+        self._enforce_max_rows()
+
+    def check_state_exist(self, state):
+        row = self.state_index.get(state)
+        if row is None:
+            row = len(self.states)
+            if row == len(self.values):
+                self._grow(row * 2)
+            self.state_index[state] = row
+            self.states.append(state)
+            self.visits[row] = 0
+            self.last_seen[row] = self.clock
+        return row
+
+    def _grow(self, capacity):
+        values = np.zeros((capacity, len(self.actions)), dtype=np.float64)
+        values[:len(self.values)] = self.values
+        self.values = values
+        for name in ('visits', 'last_seen'):
+            counts = np.zeros(capacity, dtype=np.int64)
+            counts[:len(getattr(self, name))] = getattr(self, name)
+            setattr(self, name, counts)
+
+    # --- retention ---------------------------------------------------------
+
+    def _enforce_max_rows(self):
+        if self.max_rows and len(self.states) > self.max_rows:
+            self.prune(int(self.max_rows * RETAIN_FRACTION))
+
+    def _protected_rows(self):
+        """Rows an unfinished n-step return or eligibility trace still points at."""
+        rows = [row for row, _, _ in self.pending]
+        rows.extend(row for row, _ in self.traces)
+        return np.array(rows, dtype=np.intp)
+
+    def prune(self, max_rows=None):
+        """Drops all-zero rows, then evicts rows until at most max_rows are left; returns the number removed."""
+        n = len(self.states)
+        removable = ~self.values[:n].any(axis=1)
+        protected = self._protected_rows()
+        removable[protected] = False
+
+        excess = n - int(removable.sum()) - (n if max_rows is None else max_rows)
+        if excess > 0:
+            candidates = np.flatnonzero(~removable)
+            candidates = candidates[~np.isin(candidates, protected)]
+            if self.eviction == 'lfu':
+                order = np.lexsort((self.last_seen[candidates], self.visits[candidates]))
+            else:
+                order = np.argsort(self.last_seen[candidates], kind='stable')
+            removable[candidates[order[:excess]]] = True
+
+        if removable.any():
+            self._remove_rows(removable)
+        return int(removable.sum())
+
+    def _remove_rows(self, removed):
+        """Compacts the table without the rows flagged in the bool array removed."""
+        n = len(self.states)
+        keep = np.flatnonzero(~removed)
+        new_row = np.full(n, -1, dtype=np.intp)
+        new_row[keep] = np.arange(len(keep))
+
+        for row in np.flatnonzero(removed).tolist():
+            self.disallowed_actions.pop(self.states[row], None)
+        m = len(keep)
+        self.values[:m] = self.values[keep]
+        self.values[m:n] = 0
+        self.visits[:m] = self.visits[keep]
+        self.last_seen[:m] = self.last_seen[keep]
+        self.states = [self.states[row] for row in keep.tolist()]
+        self.state_index = {state: row for row, state in enumerate(self.states)}
+
+        self.dirty = set(row for row in new_row[sorted(self.dirty)].tolist() if row >= 0)
+        self.pending = collections.deque((int(new_row[row]), column, r) for row, column, r in self.pending)
+        self.traces = {(int(new_row[row]), column): e for (row, column), e in self.traces.items()}
+        self.evicted += n - m
+
+    def take_evicted(self):
+        """Rows removed since the last call; the checkpoint rewrites its snapshot when this is non-zero."""
+        evicted, self.evicted = self.evicted, 0
+        return evicted
+
+    def excluded_mask(self, excluded_actions):
+        return excluded_mask(excluded_actions, self.action_index)
+
+    def to_dataframe(self):
+        n = len(self.states)
+        return pd.DataFrame(self.values[:n].copy(), index=list(self.states), columns=self.actions, dtype=np.float64)
+
+    def load_dataframe(self, q_table):
+        q_table = q_table.reindex(columns=self.actions, fill_value=0)
+        self.load_snapshot(list(q_table.index), q_table.values)
+
+    def snapshot(self):
+        """(states, values) copy of the table, cheap to pickle between processes."""
+        n = len(self.states)
+        return list(self.states), self.values[:n].copy()
+
+    def load_snapshot(self, states, values):
+        n = len(states)
+        self.state_index = {}
+        self.states = []
+        self.values = np.zeros((max(n, 1), len(self.actions)), dtype=np.float64)
+        self.visits = np.zeros(len(self.values), dtype=np.int64)
+        self.last_seen = np.zeros(len(self.values), dtype=np.int64)
+        if n:
+            self.values[:n] = values
+        for state in states:
+            self.state_index[state] = len(self.states)
+            self.states.append(state)
+        self.dirty = set()
+        self.reset_traces()
+
+    def load_rows(self, states, rows):
+        """Overwrites (or adds) the rows of the given states."""
+        for state, values in zip(states, rows):
+            row = self.check_state_exist(state)
+            self.values[row] = values
+
+    def take_dirty(self):
+        """(states, rows) updated since the last call, for incremental checkpoints."""
+        dirty = sorted(self.dirty)
+        self.dirty = set()
+        return [self.states[row] for row in dirty], self.values[dirty].copy()
+
+    def to_pickle(self, path, compression='gzip'):
+        self.to_dataframe().to_pickle(path, compression=compression)
+
+    def read_pickle(self, path, compression='gzip'):
+        self.load_dataframe(pd.read_pickle(path, compression=compression))
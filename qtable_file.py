@@ -0,0 +1,157 @@
+"""Binary, memory-mappable Q-table file format (.qtb).
+
+    offset 0    header, 64 bytes: magic, version, value itemsize (4 or 8),
+                number of rows, number of actions, keys offset, values offset
+    keys        int64 state keys, sorted ascending
+    values      float32 or float64 matrix, one row per key, same order
+
+Both arrays are opened with np.memmap, so opening a file costs a header read
+no matter how big the table is, and several evaluation processes that open
+the same file share its pages read-only through the OS page cache.
+
+    python qtable_file.py convert Terran_Agent_data.gz Terran_Agent_data.qtb [--float32]
+    python qtable_file.py convert Terran_Agent_data.qtb Terran_Agent_data.gz
+"""
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+import state_codec
+from q_table import excluded_mask, masked_argmax, random_allowed
+
+MAGIC = b'SC2QTBL\x00'
+VERSION = 1
+
+_HEADER = struct.Struct('<8sIIQQQQ')
+_HEADER_SIZE = 64
+_ALIGN = 64
+
+_DTYPES = {4: np.dtype('<f4'), 8: np.dtype('<f8')}
+
+
+def _aligned(offset):
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def write(path, states, values, dtype=np.float64):
+    """Writes (states, values) sorted by key. The file is replaced atomically."""
+    dtype = np.dtype(dtype).newbyteorder('<')
+    keys = np.asarray(states, dtype=np.int64).reshape(-1)
+    values = np.asarray(values)
+    order = np.argsort(keys, kind='stable')
+    n_rows, n_actions = values.shape
+
+    keys_offset = _HEADER_SIZE
+    values_offset = _aligned(keys_offset + n_rows * 8)
+
+    tmp_file = path + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, dtype.itemsize, n_rows, n_actions,
+                             keys_offset, values_offset).ljust(_HEADER_SIZE, b'\x00'))
+        f.write(keys[order].astype('<i8').tobytes())
+        f.write(b'\x00' * (values_offset - keys_offset - n_rows * 8))
+        f.write(np.ascontiguousarray(values[order], dtype=dtype).tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, path)
+
+
+class MappedQTable:
+    """Read-only Q-table backed by a memory-mapped .qtb file.
+
+    Has the choose_action/learn surface of QLearningTable so TerranAgent can
+    play from it directly; learn does nothing and unseen states score 0.
+    """
+
+    def __init__(self, path, actions=None, e_greedy=1.0):
+        with open(path, 'rb') as f:
+            header = f.read(_HEADER_SIZE)
+        if len(header) < _HEADER_SIZE:
+            raise ValueError('%s is not a Q-table file' % path)
+        magic, version, itemsize, n_rows, n_actions, keys_offset, values_offset = \
+            _HEADER.unpack(header[:_HEADER.size])
+        if magic != MAGIC or version != VERSION or itemsize not in _DTYPES:
+            raise ValueError('%s is not a Q-table file' % path)
+
+        self.path = path
+        self.actions = actions if actions is not None else list(range(n_actions))
+        self.epsilon = e_greedy
+        self.action_index = {action: i for i, action in enumerate(self.actions)}
+        self.disallowed_actions = {}
+
+        if n_rows:
+            self.keys = np.memmap(path, dtype='<i8', mode='r', offset=keys_offset, shape=(n_rows,))
+            self.values = np.memmap(path, dtype=_DTYPES[itemsize], mode='r', offset=values_offset,
+                                    shape=(n_rows, n_actions))
+        else:
+            self.keys = np.zeros(0, dtype=np.int64)
+            self.values = np.zeros((0, n_actions), dtype=_DTYPES[itemsize])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def find(self, state):
+        """Row index of state, or None."""
+        row = int(np.searchsorted(self.keys, state))
+        if row < len(self.keys) and self.keys[row] == state:
+            return row
+        return None
+
+    def q_values(self, state):
+        row = self.find(state)
+        if row is None:
+            return np.zeros(len(self.actions))
+        return np.asarray(self.values[row], dtype=np.float64)
+
+    def choose_action(self, observation, excluded_actions=[]):
+        mask = excluded_mask(excluded_actions, self.action_index)
+
+        if np.random.uniform() < self.epsilon:
+            column = masked_argmax(self.q_values(observation), mask)
+        else:
+            column = random_allowed(mask)
+        return self.actions[column]
+
+    def learn(self, s, a, r, s_):
+        pass
+
+    def reset_traces(self):
+        pass
+
+    def snapshot(self):
+        return self.keys.tolist(), np.asarray(self.values, dtype=np.float64)
+
+
+def read(path, qlearn):
+    """Loads a .qtb file into a writable QLearningTable."""
+    table = MappedQTable(path)
+    qlearn.load_snapshot(*table.snapshot())
+    return qlearn
+
+
+def from_pickle(pickle_path, path, dtype=np.float64):
+    """Converts a gzip DataFrame pickle (string or integer keys) to a .qtb file."""
+    q_table = state_codec.read_pickle(pickle_path)
+    write(path, list(q_table.index), q_table.values, dtype)
+
+
+def to_pickle(path, pickle_path):
+    """Converts a .qtb file to the gzip DataFrame pickle the agent used to save."""
+    table = MappedQTable(path)
+    states, values = table.snapshot()
+    pd.DataFrame(values, index=states, columns=table.actions).to_pickle(pickle_path, compression='gzip')
+
+
+if __name__ == '__main__':
+    import sys
+
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if len(args) != 3 or args[0] != 'convert':
+        sys.exit('usage: qtable_file.py convert SOURCE DEST [--float32]')
+    _, source, dest = args
+    if source.endswith('.qtb'):
+        to_pickle(source, dest)
+    else:
+        from_pickle(source, dest, np.float32 if '--float32' in sys.argv else np.float64)
@@ -0,0 +1,285 @@
+"""Record env observations to disk and replay them into an agent offline.
+
+RecordingEnv wraps an env and stores, for every TimeStep, the fields
+TerranAgent reads - step type, reward, player vector, feature_units,
+feature_minimap.player_relative, the feature_screen layers read by
+placement.py, available_actions, single/multi select and game_loop - plus
+the action the agent answered with. Steps are buffered and
+written as compressed chunks of --record_chunk_size steps:
+
+    <dir>/meta.json             screen/minimap size of the recording
+    <dir>/chunk_000000.npz      ragged fields (feature_units, available
+                                actions, selections) stored as one
+                                concatenated array plus row offsets
+
+    python terran_agent_alpha.py --record recordings/
+
+replay() rebuilds the TimeSteps chunk by chunk and feeds them to agent.step
+as fast as the CPU allows. The stream is open loop - the recorded game goes
+on whatever the agent answers - so it is meant for profiling and for
+checking that an optimisation keeps the decisions the same (compare the
+action digest of two replays with the same seed):
+
+    python replay.py replay recordings/ --seed 0
+    python replay.py record_mock recordings/ --episodes 20
+"""
+from absl import flags
+
+import glob
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+from pysc2.env import environment
+from pysc2.lib import features, named_array, point
+
+FLAGS = flags.FLAGS
+flags.DEFINE_string('record', None, 'Record the observations of every game into this directory.')
+flags.DEFINE_integer('record_chunk_size', 2000, 'Steps per recording chunk file.')
+
+META_FILE = 'meta.json'
+CHUNK_PATTERN = 'chunk_%06d.npz'
+
+_RAGGED = ('feature_units', 'available_actions', 'single_select', 'multi_select')
+_SCREEN_LAYERS = ('buildable', 'pathable', 'unit_density')
+
+
+def _screen_size(observation_spec):
+    try:
+        return int(observation_spec[0]['feature_screen'][-1])
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+class Recorder:
+    def __init__(self, directory, chunk_size=2000, screen_size=None):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.screen_size = screen_size
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.chunk = len(glob.glob(os.path.join(directory, 'chunk_*.npz')))
+        self._reset_buffers()
+
+    def _reset_buffers(self):
+        self.buffers = {name: [] for name in ('step_type', 'reward', 'discount', 'game_loop', 'player',
+                                              'player_relative', 'screen', 'action_function', 'action_args') + _RAGGED}
+
+    def __len__(self):
+        return len(self.buffers['step_type'])
+
+    def add(self, timestep, action=None):
+        observation = timestep.observation
+        buffers = self.buffers
+        buffers['step_type'].append(int(timestep.step_type))
+        buffers['reward'].append(timestep.reward or 0)
+        buffers['discount'].append(timestep.discount or 0.0)
+        buffers['game_loop'].append(int(np.asarray(observation.game_loop).reshape(-1)[0]))
+        buffers['player'].append(np.asarray(observation.player, dtype=np.int64))
+        buffers['player_relative'].append(np.asarray(observation.feature_minimap.player_relative, dtype=np.uint8))
+        for name in _RAGGED:
+            buffers[name].append(np.asarray(observation[name]))
+        feature_screen = observation.get('feature_screen')
+        if feature_screen is not None and len(feature_screen):
+            buffers['screen'].append(np.stack([np.minimum(feature_screen[getattr(features.SCREEN_FEATURES, name).index], 255)
+                                               for name in _SCREEN_LAYERS]).astype(np.uint8))
+        if action is None:
+            buffers['action_function'].append(-1)
+            buffers['action_args'].append('')
+        else:
+            buffers['action_function'].append(int(action.function))
+            buffers['action_args'].append(json.dumps([[int(value) for value in argument]
+                                                      for argument in action.arguments]))
+        if len(self) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered steps as the next chunk file."""
+        if len(self) == 0:
+            return
+        if self.chunk == 0 or not os.path.isfile(os.path.join(self.directory, META_FILE)):
+            minimap_size = self.buffers['player_relative'][0].shape[-1]
+            with open(os.path.join(self.directory, META_FILE), 'w') as f:
+                json.dump({'minimap_size': int(minimap_size), 'screen_size': self.screen_size}, f)
+
+        buffers = self.buffers
+        arrays = {
+            'step_type': np.array(buffers['step_type'], dtype=np.int8),
+            'reward': np.array(buffers['reward'], dtype=np.int64),
+            'discount': np.array(buffers['discount'], dtype=np.float32),
+            'game_loop': np.array(buffers['game_loop'], dtype=np.int64),
+            'player': np.stack(buffers['player']),
+            'player_relative': np.stack(buffers['player_relative']),
+            'action_function': np.array(buffers['action_function'], dtype=np.int32),
+            'action_args': np.array(buffers['action_args']),
+        }
+        if len(buffers['screen']) == len(self):
+            arrays['screen'] = np.stack(buffers['screen'])
+        for name in _RAGGED:
+            rows = buffers[name]
+            arrays[name + '_offsets'] = np.concatenate([[0], np.cumsum([len(row) for row in rows])]).astype(np.int64)
+            width = next((row.shape[1] for row in rows if row.ndim == 2), None)
+            if width is None:
+                arrays[name] = np.concatenate([row.reshape(-1) for row in rows]).astype(np.int64)
+            else:
+                arrays[name] = np.concatenate([row.reshape(-1, width) for row in rows]).astype(np.int64)
+
+        tmp_file = os.path.join(self.directory, 'chunk.tmp.npz')
+        np.savez_compressed(tmp_file, **arrays)
+        os.replace(tmp_file, os.path.join(self.directory, CHUNK_PATTERN % self.chunk))
+        self.chunk += 1
+        self._reset_buffers()
+
+
+class RecordingEnv:
+    """Env wrapper that records every TimeStep of the first player and the action taken on it."""
+
+    def __init__(self, env, directory, chunk_size=None):
+        self.env = env
+        self.recorder = Recorder(directory, chunk_size or FLAGS.record_chunk_size,
+                                 _screen_size(env.observation_spec()))
+        self._pending = None
+
+    def observation_spec(self):
+        return self.env.observation_spec()
+
+    def action_spec(self):
+        return self.env.action_spec()
+
+    def reset(self):
+        if self._pending is not None:
+            self.recorder.add(self._pending)
+        timesteps = self.env.reset()
+        self._pending = timesteps[0]
+        return timesteps
+
+    def step(self, actions):
+        self.recorder.add(self._pending, actions[0])
+        timesteps = self.env.step(actions)
+        self._pending = timesteps[0]
+        return timesteps
+
+    def close(self):
+        if self._pending is not None:
+            self.recorder.add(self._pending)
+            self._pending = None
+        self.recorder.flush()
+        self.env.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _rows(chunk, name, i):
+    offsets = chunk[name + '_offsets']
+    return chunk[name][offsets[i]:offsets[i + 1]]
+
+
+def iter_chunk(path):
+    """Yields (TimeStep, recorded action) for every step of a chunk file.
+
+    The recorded action is (function id, JSON arguments) or None. Observations
+    are built one at a time, since a full feature_screen per step would not
+    fit in memory for a whole chunk.
+    """
+    with np.load(path) as data:
+        chunk = {name: data[name] for name in data.files}
+    player_relative = chunk['player_relative'].astype(np.int32)
+    layers = chunk.get('screen')
+    layer_index = [getattr(features.SCREEN_FEATURES, name).index for name in _SCREEN_LAYERS]
+
+    for i in range(len(chunk['step_type'])):
+        observation = named_array.NamedDict(
+            feature_minimap=named_array.NamedDict(player_relative=player_relative[i]),
+            feature_units=named_array.NamedNumpyArray(_rows(chunk, 'feature_units', i).reshape(-1, len(features.FeatureUnit)),
+                                                      [None, features.FeatureUnit]),
+            player=named_array.NamedNumpyArray(chunk['player'][i], features.Player),
+            available_actions=_rows(chunk, 'available_actions', i).astype(np.int32),
+            single_select=named_array.NamedNumpyArray(_rows(chunk, 'single_select', i).reshape(-1, len(features.UnitLayer)),
+                                                      [None, features.UnitLayer]),
+            multi_select=named_array.NamedNumpyArray(_rows(chunk, 'multi_select', i).reshape(-1, len(features.UnitLayer)),
+                                                     [None, features.UnitLayer]),
+            game_loop=np.array([chunk['game_loop'][i]], dtype=np.int32),
+        )
+        if layers is not None:
+            screen = np.zeros((len(features.SCREEN_FEATURES),) + layers.shape[2:], dtype=np.int32)
+            screen[layer_index] = layers[i]
+            observation['feature_screen'] = named_array.NamedNumpyArray(screen, [features.ScreenFeatures, None, None])
+        timestep = environment.TimeStep(step_type=environment.StepType(int(chunk['step_type'][i])),
+                                        reward=int(chunk['reward'][i]),
+                                        discount=float(chunk['discount'][i]),
+                                        observation=observation)
+        function = int(chunk['action_function'][i])
+        yield timestep, (None if function < 0 else (function, str(chunk['action_args'][i])))
+
+
+def chunk_files(directory):
+    return sorted(glob.glob(os.path.join(directory, 'chunk_*.npz')))
+
+
+def specs(directory):
+    """(observation_spec, action_spec) matching the recording, for agent.setup."""
+    with open(os.path.join(directory, META_FILE)) as f:
+        meta = json.load(f)
+    minimap_size = meta['minimap_size']
+    interface = features.Features(
+        agent_interface_format=features.AgentInterfaceFormat(
+            feature_dimensions=features.Dimensions(screen=meta.get('screen_size') or 84, minimap=minimap_size),
+            use_feature_units=True),
+        map_size=point.Point(minimap_size, minimap_size))
+    return (interface.observation_spec(),), (interface.action_spec(),)
+
+
+def replay(directory, agent, max_steps=None):
+    """Feeds a recording to agent.step; returns throughput and a digest of the agent's actions.
+
+    Only the agent.step calls count as step_seconds; everything else (reading
+    and decoding chunks, comparing actions) is load_seconds.
+    """
+    agent.setup(*specs(directory))
+    digest = hashlib.sha1()
+    steps = 0
+    episodes = 0
+    step_seconds = 0.0
+    load_seconds = 0.0
+    matches = 0
+    compared = 0
+
+    for path in chunk_files(directory):
+        start = time.perf_counter()
+        for timestep, original in iter_chunk(path):
+            if timestep.first():
+                agent.reset()
+                episodes += 1
+            step_start = time.perf_counter()
+            action = agent.step(timestep)
+            step_seconds += time.perf_counter() - step_start
+            steps += 1
+
+            key = '%d:%s' % (int(action.function), json.dumps([[int(value) for value in argument]
+                                                                 for argument in action.arguments]))
+            digest.update(key.encode('utf-8'))
+            if original is not None:
+                compared += 1
+                matches += int(key == '%d:%s' % original)
+            if max_steps is not None and steps >= max_steps:
+                break
+        load_seconds += time.perf_counter() - start
+        if max_steps is not None and steps >= max_steps:
+            break
+    load_seconds -= step_seconds
+
+    return {
+        'steps': steps,
+        'episodes': episodes,
+        'step_seconds': step_seconds,
+        'load_seconds': load_seconds,
+        'steps_per_sec': steps / step_seconds if step_seconds else 0.0,
+        'same_as_recorded': matches / float(compared) if compared else None,
+        'digest': digest.hexdigest(),
+    }
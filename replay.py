@@ -0,0 +1,52 @@
+"""Replay recorded games into TerranAgent at full CPU speed (see recorder.py).
+
+    python replay.py replay recordings/ --seed 0
+    python replay.py record_mock recordings/ --episodes 20
+
+replay prints the agent steps/s and a digest of the agent's actions; two
+replays with the same seed and the same digest made the same decisions.
+record_mock records games against MockSC2Env, for profiling without the
+game binary.
+"""
+from absl import app, flags
+
+import random
+
+import numpy as np
+
+import recorder
+import terran_agent_alpha
+from mock_env import MockSC2Env
+
+FLAGS = flags.FLAGS
+flags.DEFINE_integer('seed', 0, 'Seed for random and np.random, and for the mock env of record_mock.')
+flags.DEFINE_integer('episodes', 10, 'Episodes to record with record_mock.')
+flags.DEFINE_integer('max_steps', None, 'Stop replaying after this many steps.')
+
+
+def main(argv):
+    if len(argv) != 3 or argv[1] not in ('replay', 'record_mock'):
+        raise app.UsageError('usage: replay.py replay|record_mock DIR')
+    command, directory = argv[1], argv[2]
+    random.seed(FLAGS.seed)
+    np.random.seed(FLAGS.seed)
+    agent = terran_agent_alpha.TerranAgent(persist=False)
+
+    if command == 'record_mock':
+        with recorder.RecordingEnv(MockSC2Env(seed=FLAGS.seed), directory) as env:
+            agent.setup(env.observation_spec(), env.action_spec())
+            for _ in range(FLAGS.episodes):
+                terran_agent_alpha.run_episode(env, agent)
+        print('%d chunks in %s' % (len(recorder.chunk_files(directory)), directory))
+        return
+
+    result = recorder.replay(directory, agent, FLAGS.max_steps)
+    print('%d steps, %d episodes: %.0f agent steps/s (%.2fs stepping, %.2fs loading)' % (
+        result['steps'], result['episodes'], result['steps_per_sec'], result['step_seconds'], result['load_seconds']))
+    if result['same_as_recorded'] is not None:
+        print('same action as recorded: %.1f%%' % (result['same_as_recorded'] * 100))
+    print('action digest %s' % result['digest'])
+
+
+if __name__ == '__main__':
+    app.run(main)
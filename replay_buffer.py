@@ -0,0 +1,179 @@
+"""Experience replay for the Q-table.
+
+ReplayBuffer keeps the last `capacity` transitions in preallocated NumPy
+arrays (a ring buffer), so recording a transition is a few array stores and
+old games can be learned from again. ReplayTrainer samples minibatches from
+it and applies them with QLearningTable.learn_batch, either between episodes
+(train) or continuously from a background thread (start/stop).
+
+States are stored as state keys rather than table rows, so a saved buffer can
+be replayed into a fresh table to warm-start it:
+
+    python replay_buffer.py warmstart Terran_Agent_replay.npz [epochs]
+"""
+import os
+import threading
+
+import numpy as np
+
+from state_codec import TERMINAL
+
+
+class ReplayBuffer:
+    def __init__(self, capacity, n_actions):
+        self.capacity = capacity
+        self.n_actions = n_actions
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.intp)
+        self.rewards = np.zeros(capacity, dtype=np.float64)
+        self.next_states = np.zeros(capacity, dtype=np.int64)
+        self.next_masks = np.zeros((capacity, n_actions), dtype=bool)
+        self.terminal = np.zeros(capacity, dtype=bool)
+        self.position = 0       # next slot to write
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, s, a, r, s_, next_mask=None):
+        """Records one transition; next_mask is the bool exclusion mask of s_."""
+        i = self.position
+        self.states[i] = s
+        self.actions[i] = a
+        self.rewards[i] = r
+        self.terminal[i] = s_ == TERMINAL
+        self.next_states[i] = s_
+        if next_mask is None:
+            self.next_masks[i] = False
+        else:
+            self.next_masks[i] = next_mask
+        self.position = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def sample(self, batch_size, rng=np.random):
+        """Indices of a uniform random minibatch (with replacement)."""
+        return rng.randint(0, self.size, size=batch_size)
+
+    def batch(self, indices):
+        """(states, actions, rewards, next_states, next_masks, terminal) at the given indices."""
+        return (self.states[indices], self.actions[indices], self.rewards[indices],
+                self.next_states[indices], self.next_masks[indices], self.terminal[indices])
+
+    def ordered(self):
+        """Indices of the stored transitions, oldest first."""
+        if self.size < self.capacity:
+            return np.arange(self.size)
+        return (np.arange(self.capacity) + self.position) % self.capacity
+
+    def save(self, path):
+        """Writes the transitions oldest first (temp file plus rename, so a crash keeps the old file)."""
+        order = self.ordered()
+        tmp_file = path + '.tmp'
+        with open(tmp_file, 'wb') as f:
+            np.savez_compressed(f, capacity=self.capacity, states=self.states[order],
+                                actions=self.actions[order], rewards=self.rewards[order],
+                                next_states=self.next_states[order], next_masks=self.next_masks[order],
+                                terminal=self.terminal[order])
+        os.replace(tmp_file, path)
+
+    @classmethod
+    def load(cls, path, capacity=None):
+        """Reads a buffer written by save(); keeps the newest transitions if capacity is smaller."""
+        with np.load(path) as data:
+            capacity = int(data['capacity']) if capacity is None else capacity
+            buffer = cls(capacity, data['next_masks'].shape[1])
+            start = max(len(data['states']) - capacity, 0)
+            n = len(data['states']) - start
+            for name in ('states', 'actions', 'rewards', 'next_states', 'next_masks', 'terminal'):
+                getattr(buffer, name)[:n] = data[name][start:]
+        buffer.size = n
+        buffer.position = n % capacity
+        return buffer
+
+
+class ReplayTrainer:
+    """Applies minibatch updates from a ReplayBuffer to a QLearningTable.
+
+    Everything that touches the table goes through `lock`, so an agent that
+    keeps acting while the background thread trains should hold it around
+    choose_action.
+    """
+
+    def __init__(self, qlearn, buffer, batch_size=32, updates_per_episode=200, rng=None):
+        self.qlearn = qlearn
+        self.buffer = buffer
+        self.batch_size = batch_size
+        self.updates_per_episode = updates_per_episode
+        self.rng = rng if rng is not None else np.random.RandomState()
+        self.lock = threading.Lock()
+        self.updates = 0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def add(self, s, a, r, s_, next_mask=None):
+        with self.lock:
+            self.buffer.add(s, a, r, s_, next_mask)
+
+    def train(self, updates=None):
+        """Runs `updates` minibatch updates (updates_per_episode by default)."""
+        updates = self.updates_per_episode if updates is None else updates
+        for _ in range(updates):
+            with self.lock:
+                if len(self.buffer) == 0:
+                    return
+                self.qlearn.learn_batch(*self.buffer.batch(self.buffer.sample(self.batch_size, self.rng)))
+                self.updates += 1
+
+    def warm_start(self, epochs=1):
+        """Replays every stored transition epochs times, in shuffled minibatches."""
+        for _ in range(epochs):
+            order = self.buffer.ordered()
+            self.rng.shuffle(order)
+            for start in range(0, len(order), self.batch_size):
+                with self.lock:
+                    self.qlearn.learn_batch(*self.buffer.batch(order[start:start + self.batch_size]))
+                    self.updates += 1
+
+    def start(self, interval=0.001):
+        """Trains from a background thread until stop(), pausing interval seconds between batches."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(interval,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, interval):
+        while not self._stop.is_set():
+            self.train(1)
+            self._stop.wait(interval)
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def background(self):
+        return self._thread is not None
+
+
+if __name__ == '__main__':
+    import sys
+
+    from checkpoint import CheckpointStore
+    from q_table import QLearningTable
+    from terran_agent_alpha import DATA_FILE, Q_actions
+
+    # python replay_buffer.py warmstart Terran_Agent_replay.npz [epochs]
+    if len(sys.argv) not in (3, 4) or sys.argv[1] != 'warmstart':
+        sys.exit('usage: replay_buffer.py warmstart BUFFER [EPOCHS]')
+    qlearn = QLearningTable(actions=list(range(len(Q_actions))))
+    checkpoint = CheckpointStore(DATA_FILE)
+    if checkpoint.exists():
+        checkpoint.load(qlearn)
+    trainer = ReplayTrainer(qlearn, ReplayBuffer.load(sys.argv[2]))
+    trainer.warm_start(int(sys.argv[3]) if len(sys.argv) == 4 else 1)
+    checkpoint.save(qlearn)
+    print('%d transitions, %d updates, %d states' % (len(trainer.buffer), trainer.updates, len(qlearn)))
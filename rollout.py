@@ -0,0 +1,219 @@
+"""Parallel rollouts: N worker processes play games, one learner owns the Q-table.
+
+Workers run their own env with visualize off and a local copy of the policy.
+Instead of learning they stream (s, a, r, s') transitions back to the learner,
+which applies them to the shared QLearningTable in arrival order, saves it and
+periodically sends a fresh policy snapshot to every worker.
+
+    python rollout.py --workers 8 --map Simple64 --difficulty easy --step_mul 16
+"""
+from pysc2.env import sc2_env
+from absl import app, flags, logging
+
+import multiprocessing
+import queue
+import time
+
+import env_session
+import instrumentation
+import mock_env
+import terran_agent_alpha
+from q_table import QLearningTable
+from terran_agent_alpha import Q_actions, TerranAgent
+
+FLAGS = flags.FLAGS
+flags.DEFINE_integer('workers', multiprocessing.cpu_count(), 'Number of rollout worker processes.')
+flags.DEFINE_string('map', 'Simple64', 'Map to play on.')
+flags.DEFINE_enum('difficulty', 'easy', [difficulty.name for difficulty in sc2_env.Difficulty],
+                  'Difficulty of the built-in bot.')
+flags.DEFINE_integer('step_mul', 16, 'Game steps per agent step.')
+flags.DEFINE_enum('env', 'sc2', ['sc2', 'mock'], 'Environment the workers play in.')
+flags.DEFINE_integer('episodes', 0, 'Stop after this many episodes in total (0 = run forever).')
+flags.DEFINE_integer('snapshot_every', 10, 'Send a policy snapshot to the workers every N episodes.')
+flags.DEFINE_integer('batch_size', 64, 'Transitions per message from a worker to the learner.')
+
+
+def _make_sc2_env(config, worker_id):
+    return terran_agent_alpha.make_env(map_name=config['map'],
+                                       difficulty=sc2_env.Difficulty[config['difficulty']],
+                                       step_mul=config['step_mul'],
+                                       visualize=False)
+
+
+def _make_mock_env(config, worker_id):
+    return mock_env.MockSC2Env(seed=worker_id,
+                               difficulty=sc2_env.Difficulty[config['difficulty']],
+                               step_mul=config['step_mul'])
+
+
+ENV_FACTORIES = {
+    'sc2': _make_sc2_env,
+    'mock': _make_mock_env,
+}
+
+
+class PolicyClient(QLearningTable):
+    """Worker-side table: chooses actions from the last snapshot, forwards learn calls."""
+
+    def __init__(self, actions, outbox, batch_size):
+        super(PolicyClient, self).__init__(actions)
+        self.outbox = outbox
+        self.batch_size = batch_size
+        self.outgoing = []      # 아직 learner 로 보내지 않은 transition (QLearningTable.pending 과 별개)
+
+    def learn(self, s, a, r, s_, choice=None):
+        # learner 가 transition 을 다시 학습하므로 choice 는 보내지 않음
+        self.outgoing.append((s, a, r, s_, self.disallowed_actions.get(s, [])))
+        if len(self.outgoing) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.outgoing:
+            self.outbox.put(('transitions', self.outgoing))
+            self.outgoing = []
+
+
+def _latest_snapshot(inbox):
+    snapshot = None
+    while True:
+        try:
+            snapshot = inbox.get_nowait()
+        except queue.Empty:
+            return snapshot
+
+
+def _worker(worker_id, config, outbox, inbox, stop):
+    if not FLAGS.is_parsed():
+        FLAGS.mark_as_parsed()
+    instrumentation.enable_from_flags()
+    instrumentation.gauge('worker', worker_id)
+
+    policy = PolicyClient(list(range(len(Q_actions))), outbox, config['batch_size'])
+    policy.load_snapshot(*inbox.get())
+    agent = TerranAgent(qlearn=policy, persist=False)
+
+    factory = ENV_FACTORIES[config['env']]
+    with env_session.EnvSession(lambda: factory(config, worker_id), config['env_restart_every']) as session:
+        while not stop.is_set():
+            start, steps = time.time(), agent.steps
+            try:
+                if agent.obs_spec is None:
+                    agent.setup(session.observation_spec(), session.action_spec())
+                last = terran_agent_alpha.run_episode(session, agent)
+            except env_session.EnvCrashed:
+                policy.flush()
+                agent.abort_episode()
+                continue
+            policy.flush()
+            outbox.put(('episode', worker_id, last.reward, agent.steps - steps, time.time() - start,
+                        session.reset_seconds))
+
+            snapshot = _latest_snapshot(inbox)
+            if snapshot is not None:
+                policy.load_snapshot(*snapshot)
+
+
+class Learner:
+    def __init__(self, qlearn, checkpoint, episode_log):
+        self.qlearn = qlearn
+        self.checkpoint = checkpoint
+        self.episode_log = episode_log
+        self.transitions = 0
+        self.episodes = 0
+
+    def apply(self, transitions):
+        for s, a, r, s_, excluded_actions in transitions:
+            self.qlearn.disallowed_actions[s] = excluded_actions
+            self.qlearn.learn(s, a, r, s_)
+        self.transitions += len(transitions)
+
+    def record(self, worker_id, reward, steps, duration, reset_seconds):
+        self.episodes += 1
+        self.episode_log.record(reward, steps=steps, seconds=duration, table_size=len(self.qlearn), worker=worker_id,
+                                reset_seconds=round(reset_seconds, 3))
+
+    def save(self):
+        self.checkpoint.flush(self.qlearn)
+
+
+def run(config):
+    learner_agent = TerranAgent(qlearn=terran_agent_alpha.table_from_flags())
+    learner = Learner(learner_agent.qlearn, learner_agent.checkpoint, learner_agent.episode_log)
+
+    outbox = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    inboxes = []
+    workers = []
+    for worker_id in range(config['workers']):
+        inbox = multiprocessing.Queue()
+        inbox.put(learner.qlearn.snapshot())
+        worker = multiprocessing.Process(target=_worker, args=(worker_id, config, outbox, inbox, stop))
+        worker.daemon = True
+        worker.start()
+        inboxes.append(inbox)
+        workers.append(worker)
+
+    start = time.time()
+    try:
+        while config['episodes'] <= 0 or learner.episodes < config['episodes']:
+            try:
+                message = outbox.get(timeout=1)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    break
+                continue
+
+            if message[0] == 'transitions':
+                with instrumentation.timer('learner_apply'):
+                    learner.apply(message[1])
+                instrumentation.count('transitions', len(message[1]))
+                continue
+
+            _, worker_id, reward, steps, duration, reset_seconds = message
+            learner.record(worker_id, reward, steps, duration, reset_seconds)
+            hours = (time.time() - start) / 3600
+            logging.info('episode %d (worker %d): reward %d, %d steps in %.1fs (reset %.2fs), %.1f episodes/hour, '
+                         '%d states', learner.episodes, worker_id, reward, steps, duration, reset_seconds,
+                         learner.episodes / hours, len(learner.qlearn))
+
+            instrumentation.gauge('qtable_rows', len(learner.qlearn))
+            instrumentation.end_episode()
+
+            if learner.episodes % config['snapshot_every'] == 0:
+                with instrumentation.timer('save'):
+                    learner.save()
+                snapshot = learner.qlearn.snapshot()
+                for inbox in inboxes:
+                    inbox.put(snapshot)
+
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        learner.save()
+        learner_agent.close()
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+
+    return learner
+
+
+def main(unused_argv):
+    instrumentation.enable_from_flags()
+    run({
+        'workers': FLAGS.workers,
+        'map': FLAGS.map,
+        'difficulty': FLAGS.difficulty,
+        'step_mul': FLAGS.step_mul,
+        'env': FLAGS.env,
+        'episodes': FLAGS.episodes,
+        'snapshot_every': FLAGS.snapshot_every,
+        'batch_size': FLAGS.batch_size,
+        'env_restart_every': FLAGS.env_restart_every,
+    })
+
+
+if __name__ == "__main__":
+    app.run(main)
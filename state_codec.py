@@ -0,0 +1,97 @@
+"""Packs the agent's 14 state features into a single integer key.
+
+Each field is divided by its bucket width, clipped to the number of bits it
+is given and shifted into place, so a state key is a plain int that is cheap
+to hash, compare and pickle.
+"""
+import numpy as np
+import pandas as pd
+
+# (name, bucket width, bits) - in the same order as current_state
+STATE_FIELDS = [
+    ('time', 10, 8),            # time_counter // 10
+    ('minerals', 100, 7),       # minerals // 100
+    ('vespene', 50, 6),         # vespene // 50
+    ('barracks', 1, 3),
+    ('factories', 1, 3),
+    ('army', 10, 5),            # food_army // 10
+    ('enemy_0', 1, 1),
+    ('enemy_1', 1, 1),
+    ('enemy_2', 1, 1),
+    ('enemy_3', 1, 1),
+    ('friendly_0', 1, 1),
+    ('friendly_1', 1, 1),
+    ('friendly_2', 1, 1),
+    ('friendly_3', 1, 1),
+]
+
+STATE_SIZE = len(STATE_FIELDS)
+
+WIDTHS = np.array([width for _, width, _ in STATE_FIELDS], dtype=np.int64)
+BITS = np.array([bits for _, _, bits in STATE_FIELDS], dtype=np.int64)
+MAXES = (np.int64(1) << BITS) - 1
+SHIFTS = np.concatenate(([0], np.cumsum(BITS)[:-1])).astype(np.int64)
+
+TERMINAL = -1
+
+
+def bucketize(raw):
+    """Raw feature values -> clipped bucket indices."""
+    raw = np.asarray(raw, dtype=np.int64)
+    return np.clip(raw // WIDTHS, 0, MAXES)
+
+
+def pack(buckets):
+    """Bucket indices -> integer key. Also accepts a (n, STATE_SIZE) matrix."""
+    buckets = np.clip(np.asarray(buckets, dtype=np.int64), 0, MAXES)
+    keys = (buckets << SHIFTS).sum(axis=-1)
+    if keys.ndim == 0:
+        return int(keys)
+    return keys
+
+
+def unpack(key):
+    """Integer key (or array of keys) -> bucket indices."""
+    keys = np.asarray(key, dtype=np.int64)
+    return (keys[..., None] >> SHIFTS) & MAXES
+
+
+def encode(raw):
+    return pack(bucketize(raw))
+
+
+def parse_legacy_key(key):
+    """Parses a str(np.ndarray) state key written by the old agent."""
+    if key == 'terminal':
+        return TERMINAL
+    values = key.strip().lstrip('[').rstrip(']').split()
+    return pack([int(float(value)) for value in values])
+
+
+def rekey_dataframe(q_table):
+    """Re-keys a DataFrame Q-table saved under string keys.
+
+    Rows already keyed by integers are kept as they are. Legacy keys that
+    fall into the same clipped bucket are merged by averaging their values.
+    """
+    keys = [parse_legacy_key(key) if isinstance(key, str) else int(key) for key in q_table.index]
+    q_table = q_table.copy()
+    q_table.index = pd.Index(keys, dtype=np.int64)
+    if q_table.index.has_duplicates:
+        q_table = q_table.groupby(level=0, sort=False).mean()
+    return q_table
+
+
+def read_pickle(path, compression='gzip'):
+    return rekey_dataframe(pd.read_pickle(path, compression=compression))
+
+
+def migrate_pickle(path, output=None, compression='gzip'):
+    """Rewrites a string-keyed table pickle with integer state keys."""
+    read_pickle(path, compression).to_pickle(output or path, compression=compression)
+
+
+if __name__ == '__main__':
+    import sys
+
+    migrate_pickle(*sys.argv[1:3])
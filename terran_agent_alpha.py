@@ -1,128 +1,155 @@
 from pysc2.agents import base_agent
 from pysc2.env import sc2_env
 from pysc2.lib import actions, features, units
-from absl import app
+from absl import app, flags, logging
 
+import contextlib
 import random
-import math
 import os
+import time
 import numpy as np
-import pandas as pd
+
+import action_registry
+import async_learner
+import env_session
+import instrumentation
+import macro
+import obs_features
+import placement
+import recorder
+from action_registry import REGISTRY
+from checkpoint import CheckpointStore
+from episode_log import EpisodeLog, migrate_winrate
+import state_codec
+from q_table import EVICTIONS, QLearningTable
+from obs_view import ObsView
+from replay_buffer import ReplayBuffer, ReplayTrainer
+
+FLAGS = flags.FLAGS
+flags.DEFINE_integer('max_rows', 0, 'Evict Q-table states beyond this many rows (0 = keep every state).')
+flags.DEFINE_enum('eviction', 'lru', list(EVICTIONS), 'Which states max_rows evicts first: least recently '
+                  'or least often visited.')
+flags.DEFINE_integer('replay_capacity', 0, 'Learn from a replay buffer of this many transitions, saved to '
+                     'REPLAY_FILE on exit (0 = learn online).')
+flags.DEFINE_integer('replay_batch_size', 32, 'Transitions per replay minibatch.')
+flags.DEFINE_integer('replay_updates', 200, 'Replay minibatches applied after every game.')
+flags.DEFINE_bool('replay_background', False, 'Apply replay minibatches continuously from a background thread '
+                  'instead of after every game.')
 
 DATA_FILE = 'Terran_Agent_data'
-RESULT_FILE = 'Winrate'
+RESULT_FILE = 'Winrate'             # 예전 승률 파일, EPISODE_FILE 로 옮겨짐
+EPISODE_FILE = 'Terran_Agent_episodes.jsonl'
+REPLAY_FILE = 'Terran_Agent_replay.npz'   # replay_buffer.py warmstart 의 입력
 
-Q_actions = [
-    'no_op',
-    
-    'Build_SupplyDepot', 
-    'Build_Refinery',    
-    'Build_Barracks',    
-    'Build_Reactor',     
-    'Build_TechLab',     
-    'Build_EngineeringBay',      
-    'Build_Factory',     
-    'Build_Armory',      
-
-    'Train_SCV',         
-    'Train_Marine',      
-    'Train_Marauder',    
-    'Train_Hellion',
-    'Train_Cyclone',
-
-    'Research_CombatShield',
-    'Research_TerranInfantryWeapons',
-    'Research_TerranInfantryArmor',
-    'Research_TerranVehicleWeapons',
-
-    'Move_Refinery',
-]
-
-
-
-for mm_x in range(0, 64):
-    for mm_y in range(0, 64):
-        if (mm_x + 1) % 32 == 0 and (mm_y + 1) % 32 == 0:
-            Q_actions.append('Attack' + '-' + str(mm_x - 16) + '-' + str(mm_y - 16))
-
-class QLearningTable:
-    def __init__(self, actions, learning_rate=0.01, reward_decay=0.9, e_greedy=0.9):
-        self.actions = actions
-        self.lr = learning_rate
-        self.gamma = reward_decay
-        self.epsilon = e_greedy
-        self.q_table = pd.DataFrame(columns=self.actions, dtype=np.float64)
-        self.disallowed_actions = {}
-
-    def choose_action(self, observation, excluded_actions=[]):
-        self.check_state_exist(observation)
-        
-        self.disallowed_actions[observation] = excluded_actions
-        
-        state_action = self.q_table.ix[observation, :]
-        
-        for excluded_action in excluded_actions:
-            del state_action[excluded_action]
+Q_actions = list(REGISTRY.names)
 
-        if np.random.uniform() < self.epsilon:
-            
-            state_action = state_action.reindex(np.random.permutation(state_action.index))
-            
-            action = state_action.idxmax()
-        else:
-            action = np.random.choice(state_action.index)
-            
-        return action
 
-    def learn(self, s, a, r, s_):
-        if s == s_:
-            return
-        
-        self.check_state_exist(s_)
-        self.check_state_exist(s)
-        
-        q_predict = self.q_table.ix[s, a] # 현재 state
-        
-        s_rewards = self.q_table.ix[s_, :]
-        
-        if s_ in self.disallowed_actions:
-            for excluded_action in self.disallowed_actions[s_]:
-                del s_rewards[excluded_action]
-        
-        if s_ != 'terminal':
-            q_target = r + self.gamma * s_rewards.max() # 다음 state
-        else:
-            q_target = r
-            
-        # update
-        self.q_table.ix[s, a] += self.lr * (q_target - q_predict)
+def table_from_flags():
+    """Q-table with the --max_rows / --eviction retention policy."""
+    return QLearningTable(actions=list(range(len(Q_actions))), max_rows=FLAGS.max_rows or None,
+                          eviction=FLAGS.eviction)
 
-    def check_state_exist(self, state):
-        if state not in self.q_table.index:
-            
-            self.q_table = self.q_table.append(pd.Series([0] * len(self.actions), index=self.q_table.columns, name=state))
+
+def replay_from_flags(qlearn):
+    """ReplayTrainer for --replay_capacity (continuing the saved REPLAY_FILE), or None."""
+    if not FLAGS.replay_capacity:
+        return None
+    if os.path.isfile(REPLAY_FILE):
+        buffer = ReplayBuffer.load(REPLAY_FILE, FLAGS.replay_capacity)
+    else:
+        buffer = ReplayBuffer(FLAGS.replay_capacity, len(Q_actions))
+    return ReplayTrainer(qlearn, buffer, batch_size=FLAGS.replay_batch_size,
+                         updates_per_episode=FLAGS.replay_updates)
 
 
 class TerranAgent(base_agent.BaseAgent):
-    def __init__(self):
+    def __init__(self, qlearn=None, persist=True, replay=None, async_learning=False):
         super(TerranAgent, self).__init__()
 
-        self.qlearn = QLearningTable(actions=list(range(len(Q_actions))))
+        if qlearn is None:
+            qlearn = QLearningTable(actions=list(range(len(Q_actions))))
+        self.qlearn = qlearn
+        # persist=False 이면 Q-table 과 승률 파일을 읽거나 쓰지 않음 (rollout worker 용)
+        self.persist = persist
+        # replay 에 ReplayTrainer 를 주면 transition 을 버퍼에 모으고 에피소드 사이(또는 백그라운드)에 학습
+        self.replay = replay
+        # async_learning 이면 learn 과 checkpoint 저장을 AsyncLearner 스레드가 순서대로 처리
+        self.updater = async_learner.AsyncLearner(qlearn) if async_learning and replay is None else None
+        # learn(prev -> cur) 를 choose_action(cur) 뒤에 적용해도 같은 결과가 나오는 건 one-step q 뿐이라
+        # 다른 learner 는 결정 전에 밀린 update 를 기다림
+        self.wait_for_learn = self.updater is not None and getattr(qlearn, 'learner', None) != 'q'
+        self.episode_log = None
+        self.episode_start = (time.time(), 0)
 
         self.previous_action = None
         self.previoud_state = None
-
-        self.move_number = 0    # 각 스텝 (0 ~ 2)
-
-        if os.path.isfile(DATA_FILE + '.gz'):
-            self.qlearn.q_table = pd.read_pickle(DATA_FILE + '.gz', compression = 'gzip')
-        if os.path.isfile(RESULT_FILE + '.txt'):
-            f = open('Winrate.txt', 'r')
-            self.rate = []
-            for line in f:
-                self.rate.append(int(line))
-            f.close()
-
+        self.previous_choice = None     # qlambda: 이전 결정의 (state, column, greedy)
+
+        # 선택한 action 의 select / order / follow-up 호출을 차례로 내보냄
+        self.macro = macro.MacroExecutor(self)
+
+        self.placement = placement.PlacementGrid()
+
+        # action_registry 의 모드 번호로 바로 찾는 dispatch table
+        self._select_handlers = {
+            action_registry.SELECT_NONE: self._select_none,
+            action_registry.SELECT_WORKER: self._select_worker,
+            action_registry.SELECT_ALL_TYPE: self._select_all_type,
+            action_registry.SELECT_ALL_ON_SCREEN: self._select_all_on_screen,
+            action_registry.SELECT_BARRACKS_SITE: self._select_barracks_site,
+            action_registry.SELECT_ARMY: self._select_army,
+        }
+        self._target_handlers = {
+            action_registry.TARGET_NONE: self._target_none,
+            action_registry.TARGET_NEAR_HALF: self._target_near_half,
+            action_registry.TARGET_FAR_HALF: self._target_far_half,
+            action_registry.TARGET_BARRACKS_SITE: self._target_barracks_site,
+            action_registry.TARGET_VESPENE: self._target_vespene,
+            action_registry.TARGET_GAS_WORKER: self._target_gas_worker,
+            action_registry.TARGET_ADDON: self._target_addon,
+            action_registry.TARGET_MINIMAP: self._target_minimap,
+        }
+        self._followup_handlers = {
+            action_registry.FOLLOWUP_NONE: self._followup_none,
+            action_registry.FOLLOWUP_HARVEST: self._followup_harvest,
+            action_registry.FOLLOWUP_RALLY: self._followup_rally,
+        }
+
+        self.checkpoint = CheckpointStore(DATA_FILE)
+        if persist and self.checkpoint.exists():
+            self.checkpoint.load(self.qlearn)
+        elif persist and os.path.isfile(DATA_FILE + '.gz'):
+            # 예전 gzip pickle 을 읽어서 checkpoint 로 옮김
+            self.qlearn.load_dataframe(state_codec.read_pickle(DATA_FILE + '.gz'))
+            self.checkpoint.save(self.qlearn)
+        if persist:
+            if os.path.isfile(RESULT_FILE + '.txt') and not os.path.isfile(EPISODE_FILE):
+                migrate_winrate(RESULT_FILE + '.txt', EPISODE_FILE)
+            self.episode_log = EpisodeLog(EPISODE_FILE)
+
+
+    def close(self):
+        """Writes out the queued updates, replay buffer, episode records and any running checkpoint compaction."""
+        if self.updater is not None:
+            self.updater.close()
+        if self.replay is not None:
+            self.replay.stop()
+            if self.persist:
+                self.replay.buffer.save(REPLAY_FILE)
+        if self.episode_log is not None:
+            self.episode_log.close()
+        self.checkpoint.wait()
+
+    def abort_episode(self):
+        """Forgets a game that ended without a last() step (the env crashed)."""
+        if self.updater is not None:
+            self.updater.drain()
+        with self._table_lock():
+            self.qlearn.reset_traces()
+        self.previous_action = None
+        self.previous_state = None
+        self.previous_choice = None
+        self.macro.reset()
 
     def transformLocation(self, x, y):
         if not self.base_top_left:
@@ -130,39 +157,23 @@ class TerranAgent(base_agent.BaseAgent):
         
         return (x, y)
 
-    def splitAction(self, action_id):
-        agent_action = Q_actions[action_id]
-            
-        x = 0
-        y = 0
-        if '-' in agent_action:
-            agent_action, x, y = agent_action.split('-')
-
-        return (agent_action, x, y)
-
     
-    def unit_type_is_selected(self, obs, unit_type):
-        if (len(obs.observation.single_select) > 0 and
-            obs.observation.single_select[0].unit_type == unit_type):
-            return True
-        if (len(obs.observation.multi_select) > 0 and
-            obs.observation.multi_select[0].unit_type == unit_type):
-            return True
-        return False
-
-    def get_units_by_type(self, obs, unit_type):
-#        print(str(obs.observation))
-        return [unit for unit in obs.observation.feature_units if unit.unit_type == unit_type]
-
-    def can_do(self, obs, action):
-        return action in obs.observation.available_actions
+    def unit_type_is_selected(self, view, unit_type):
+        return unit_type in view.selected_types
+
+    def can_do(self, view, action):
+        return view.can_do(action)
     
 
     def step(self, obs):
         super(TerranAgent, self).step(obs)
 
+        # 이번 스텝의 모든 단계가 같은 view 를 공유
+        view = ObsView(obs)
+        unit_index = view.units
+
         if obs.first():
-            player_y, player_x = (obs.observation.feature_minimap.player_relative ==
+            player_y, player_x = (view.player_relative ==
                                   features.PlayerRelative.SELF).nonzero()
 
             if player_y.any() and player_y.mean() <= 31 :
@@ -172,12 +183,8 @@ class TerranAgent(base_agent.BaseAgent):
 
             self.command_center_rallied = False
 
-            vespenes = self.get_units_by_type(obs, units.Neutral.VespeneGeyser)
-
-            self.vespene_1_x = vespenes[0].x
-            self.vespene_1_y = vespenes[0].y
-            self.vespene_2_x = vespenes[1].x
-            self.vespene_2_y = vespenes[1].y
+            self.vespene_1_x, self.vespene_1_y = unit_index.nth(units.Neutral.VespeneGeyser, 0)
+            self.vespene_2_x, self.vespene_2_y = unit_index.nth(units.Neutral.VespeneGeyser, 1)
 
             self.combatshield_research = False
             self.infantryweapons_research = False
@@ -191,28 +198,49 @@ class TerranAgent(base_agent.BaseAgent):
             self.barrack_location = {}
             self.rand = 0
 
+            self.placement.reset()
+            self.macro.reset()
+
             self.time_counter = -1
 
+            self.episode_start = (time.time(), self.steps - 1)
+
+            if self.updater is not None:
+                # 지난 게임의 마지막 learn, prune, 저장이 끝난 table 로 첫 결정을 내림
+                self.updater.drain()
+
        
         if obs.last():
             reward = obs.reward
 
-            self.rate.append(reward)
-            f = open('Winrate.txt', 'w')
-            for num in self.rate:
-                f.write(str(num) + '\n')
-            f.close()
-
-            self.qlearn.learn(str(self.previous_state), self.previous_action, reward, 'terminal')
-
-            self.qlearn.q_table.to_pickle(DATA_FILE + '.gz', 'gzip')
+            self.learn(self.previous_state, self.previous_action, reward, state_codec.TERMINAL)
+            if self.replay is not None and not self.replay.background:
+                self.replay.train()
+
+            with self._table_lock():
+                table_size = len(self.qlearn)
+            if self.persist:
+                start_time, start_steps = self.episode_start
+                self.episode_log.record(reward, steps=self.steps - start_steps, seconds=time.time() - start_time,
+                                        table_size=table_size)
+
+                if self.updater is None:
+                    # 백그라운드 ReplayTrainer 의 learn_batch / prune 과 겹치지 않게
+                    with instrumentation.timer('save'), self._table_lock():
+                        self.checkpoint.flush(self.qlearn)
+                else:
+                    self.updater.flush(self.checkpoint)
+            if self.updater is not None:
+                self.updater.wake()
+            instrumentation.gauge('qtable_rows', table_size)
 
             self.previous_action = None
             self.previous_state = None
+            self.previous_choice = None
 
             self.command_center_rallied = False
             
-            self.move_number = 0
+            self.macro.reset()
             self.vespene_1_x = 0
             self.vespene_1_y = 0
             self.vespene_2_x = 0
@@ -233,378 +261,344 @@ class TerranAgent(base_agent.BaseAgent):
 
             return actions.FUNCTIONS.no_op()
 
-
-        
-        supply_depot_count = len(self.get_units_by_type(obs, units.Terran.SupplyDepot))
-        refinery_count = len(self.get_units_by_type(obs, units.Terran.Refinery))
-        barracks_count = len(self.get_units_by_type(obs, units.Terran.Barracks))
-        engineering_bay_count = len(self.get_units_by_type(obs, units.Terran.EngineeringBay))
-        factory_count = len(self.get_units_by_type(obs, units.Terran.Factory))
-        armory_count = len(self.get_units_by_type(obs, units.Terran.Armory))
-
-        scv_count = obs.observation.player.food_workers
-        free_supply = (obs.observation.player.food_cap - obs.observation.player.food_used)
-        army_supply = obs.observation.player.food_army
-        player_minerals = obs.observation.player.minerals
-        player_vespene = obs.observation.player.vespene
-
-
-        
-        if self.move_number == 0:
-            self.move_number += 1
-            self.time_counter += 1
-
-            
-            current_state = np.zeros(14)
-            current_state[0] = self.time_counter // 10 
-            current_state[1] = player_minerals // 100 
-            current_state[2] = player_vespene // 50 
-            current_state[3] = barracks_count 
-            current_state[4] = factory_count 
-            current_state[5] = army_supply // 10
-
-            
-            enemy_squares = np.zeros(4)
-            enemy_y, enemy_x = (obs.observation.feature_minimap.player_relative ==
-                                features.PlayerRelative.ENEMY).nonzero()
-            for i in range(0, len(enemy_y)):
-                y = int(math.ceil((enemy_y[i] + 1) / 32))
-                x = int(math.ceil((enemy_x[i] + 1) / 32))
-
-                enemy_squares[((y - 1) * 2) + (x - 1)] = 1
-            if not self.base_top_left:
-                enemy_squares = enemy_squares[::-1]
-            for i in range(0, 4):
-                current_state[i + 6] = enemy_squares[i]
-
-            
-            friendly_squares = np.zeros(4)
-            friendly_y, friendly_x = (obs.observation.feature_minimap.player_relative ==
-                                      features.PlayerRelative.SELF).nonzero()
-            for i in range(0, len(friendly_y)):
-                y = int(math.ceil((friendly_y[i] + 1) / 32))
-                x = int(math.ceil((friendly_x[i] + 1) / 32))
-
-                friendly_squares[((y - 1) * 2) + (x - 1)] = 1
-            if not self.base_top_left:
-                friendly_squares = friendly_squares[::-1]
-            for i in range(0, 4):
-                current_state[i + 10] = friendly_squares[i]
-            
-
-            
-            if self.previous_action is not None:
-                self.qlearn.learn(str(self.previous_state), self.previous_action, 0, str(current_state))
-
-
-            
-            excluded_actions = []
-            if supply_depot_count >= 10 or free_supply > 10:
-                excluded_actions.append(1)  
-            if supply_depot_count == 0 or refinery_count >= 2:
-                excluded_actions.append(2)  
-            if supply_depot_count == 0 or barracks_count >= 3:
-                excluded_actions.append(3)  
-            if barracks_count ==0 or self.reactor_count >= 2:
-                excluded_actions.append(4)  
-            if barracks_count ==0 or self.techlab_count >= 2:
-                excluded_actions.append(5)  
-            if barracks_count ==0 or engineering_bay_count >= 1:
-                excluded_actions.append(6)  
-            if barracks_count == 0 or factory_count >= 2:
-                excluded_actions.append(7)  
-            if factory_count == 0:
-                excluded_actions.append(8)  
-            if scv_count >= 22:
-                excluded_actions.append(9)  
-            if barracks_count ==0 or free_supply == 0:
-                excluded_actions.append(10)  
-                excluded_actions.append(11) 
-            if factory_count == 0 or free_supply < 2:
-                excluded_actions.append(12) 
-                excluded_actions.append(13) 
-            if factory_count > 0 and free_supply >= 2 and player_vespene < 100:
-                excluded_actions.append(13) 
-
-            if self.techlab_count == 0 or player_vespene < 100 or self.combatshield_research is True:
-                excluded_actions.append(14) 
-            if engineering_bay_count == 0 or player_vespene < 100 or self.infantryweapons_research is True:
-                excluded_actions.append(15) 
-            if engineering_bay_count == 0 or player_vespene < 100 or self.infantryarmor_research is True:
-                excluded_actions.append(16) 
-            if armory_count == 0 or player_vespene < 100 or self.vehicleweapons_research is True:
-                excluded_actions.append(17) 
-            if refinery_count == 0 or self.refinery_worker_count == 8:
-                excluded_actions.append(18) 
-            if army_supply == 0:
-                excluded_actions.append(19)
-                excluded_actions.append(20)
-                excluded_actions.append(21)
-                excluded_actions.append(22) 
-
-
-            rl_action = self.qlearn.choose_action(str(current_state), excluded_actions)
-
-            self.previous_state = current_state
-            self.previous_action = rl_action
-
-            agent_action, x, y = self.splitAction(self.previous_action)
-            
-            print(agent_action)
-            if agent_action == 'Build_SupplyDepot' or agent_action == 'Build_Barracks' or agent_action == 'Build_EngineeringBay' or agent_action == 'Build_Refinery' or agent_action == 'Build_Factory' or agent_action == 'Build_Armory' or agent_action == 'Move_Refinery':
-                scvs = self.get_units_by_type(obs, units.Terran.SCV)
-                if len(scvs) > 0:
-                    if scvs[0].x < 1 or scvs[0].y < 1 or scvs[0].x > 82 or scvs[0].y > 82 :
-                        return actions.FUNCTIONS.select_point("select", (scvs[1].x, scvs[1].y))
-                    return actions.FUNCTIONS.select_point("select", (scvs[0].x, scvs[0].y))
-
-            elif agent_action == 'Train_Marine' or agent_action == 'Train_Marauder' :
-                barracks = self.get_units_by_type(obs, units.Terran.Barracks)
-                if len(barracks) > 0:
-                    return actions.FUNCTIONS.select_point("select_all_type", (barracks[0].x, barracks[0].y))
-
-            elif agent_action == 'Train_Hellion' or agent_action == 'Train_Cyclone':
-                factorys = self.get_units_by_type(obs, units.Terran.Factory)
-                if len(factorys) > 0:
-                    return actions.FUNCTIONS.select_point("select_all_type", (factorys[0].x, factorys[0].y))
-
-            elif agent_action == 'Build_Reactor' or agent_action == 'Build_TechLab':
-                self.rand = random.choice(list(self.barrack_location.keys()))
-                return actions.FUNCTIONS.select_point("select", self.barrack_location[self.rand])
-                
-            elif agent_action == 'Train_SCV':
-                commandcenters = self.get_units_by_type(obs, units.Terran.CommandCenter)
-                if len(commandcenters) > 0:
-                    return actions.FUNCTIONS.select_point("select_all_type", (commandcenters[0].x, commandcenters[0].y))
-
-            elif agent_action == 'Research_CombatShield' :
-                techlabs = self.get_units_by_type(obs, units.Terran.BarracksTechLab)
-                if len(techlabs) > 0:
-                    if techlabs[0].x > 82 or techlabs[0].y > 82:
-                        return actions.FUNCTIONS.no_op()
-                    return actions.FUNCTIONS.select_point("select_all_type", (techlabs[0].x, techlabs[0].y))
-
-            elif agent_action == 'Research_TerranInfantryWeapons' or agent_action == 'Research_TerranInfantryArmor':
-                bays = self.get_units_by_type(obs, units.Terran.EngineeringBay)
-                if len(bays) > 0:
-                    return actions.FUNCTIONS.select_point("select_all_type", (bays[0].x, bays[0].y))
-
-            elif agent_action == 'Research_TerranVehicleWeapons' :
-                armorys = self.get_units_by_type(obs, units.Terran.Armory)
-                if len(armorys) > 0:
-                    return actions.FUNCTIONS.select_point("select_all_type", (armorys[0].x, armorys[0].y))
-
-            elif agent_action == 'Attack':
-                if self.can_do(obs, actions.FUNCTIONS.select_army.id):
-                    return actions.FUNCTIONS.select_army("select")
-
-
-        elif self.move_number == 1:
-            self.move_number += 1
-
-            supply_depot_count = len(self.get_units_by_type(obs, units.Terran.SupplyDepot))
-            refinery_count = len(self.get_units_by_type(obs, units.Terran.Refinery))
-            barracks_count = len(self.get_units_by_type(obs, units.Terran.Barracks))
-            engineering_bay_count = len(self.get_units_by_type(obs, units.Terran.EngineeringBay))
-            factory_count = len(self.get_units_by_type(obs, units.Terran.Factory))
-            armory_count = len(self.get_units_by_type(obs, units.Terran.Armory))
-
-            agent_action, x, y = self.splitAction(self.previous_action)
-
-            if agent_action == 'Build_SupplyDepot':
-                if self.unit_type_is_selected(obs, units.Terran.SCV):
-                    if self.can_do(obs, actions.FUNCTIONS.Build_SupplyDepot_screen.id):
-                        if self.base_top_left:
-                            x = random.randint(1, 41)
-                        else:
-                            x = random.randint(42, 82)
-                        y = random.randint(1, 82)
-                        return actions.FUNCTIONS.Build_SupplyDepot_screen("now", (x,y))
-            elif agent_action == 'Build_Barracks':
-                if self.unit_type_is_selected(obs, units.Terran.SCV):
-                    if self.can_do(obs, actions.FUNCTIONS.Build_Barracks_screen.id):
-                        if self.base_top_left:
-                            x = random.randint(42, 82)
-                        else:
-                            x = random.randint(1, 41)
-                        y = random.randint(1, 82)
-                        self.barrack_location[barracks_count] = (x,y)
-                        return actions.FUNCTIONS.Build_Barracks_screen("now", (x,y))
-            elif agent_action == 'Build_EngineeringBay':
-                if self.unit_type_is_selected(obs, units.Terran.SCV):
-                    if self.can_do(obs, actions.FUNCTIONS.Build_EngineeringBay_screen.id):
-                        if self.base_top_left:
-                            x = random.randint(1, 41)
-                        else:
-                            x = random.randint(42, 82)
-                        y = random.randint(1, 82)
-                        return actions.FUNCTIONS.Build_EngineeringBay_screen("now", (x,y))
-            elif agent_action == 'Build_Factory':
-                if self.unit_type_is_selected(obs, units.Terran.SCV):
-                    if self.can_do(obs, actions.FUNCTIONS.Build_Factory_screen.id):
-                        if self.base_top_left:
-                            x = random.randint(42, 82)
-                        else:
-                            x = random.randint(1, 41)
-                        y = random.randint(1, 82)
-                        return actions.FUNCTIONS.Build_Factory_screen("now", (x,y))
-            elif agent_action == 'Build_Armory':
-                if self.unit_type_is_selected(obs, units.Terran.SCV):
-                    if self.can_do(obs, actions.FUNCTIONS.Build_Armory_screen.id):
-                        if self.base_top_left:
-                            x = random.randint(1, 41)
-                        else:
-                            x = random.randint(42, 82)
-                        y = random.randint(1, 82)
-                        return actions.FUNCTIONS.Build_Armory_screen("now", (x,y))
-            elif agent_action == 'Build_Refinery':
-                if self.unit_type_is_selected(obs, units.Terran.SCV):
-                    if self.can_do(obs, actions.FUNCTIONS.Build_Refinery_screen.id):
-                        if refinery_count == 0:
-                            self.refinery_worker_count += 1
-                            return actions.FUNCTIONS.Build_Refinery_screen("now", (self.vespene_1_x,self.vespene_1_y))
-                        if refinery_count == 1:
-                            self.refinery_worker_count += 1
-                            return actions.FUNCTIONS.Build_Refinery_screen("now", (self.vespene_2_x,self.vespene_2_y))
-            elif agent_action == 'Move_Refinery':
-                if self.unit_type_is_selected(obs, units.Terran.SCV):
-                    if (refinery_count == 1 and self.refinery_worker_count <= 3) or (refinery_count == 2 and self.refinery_worker_count <= 4):
-                        self.refinery_worker_count += 1
-                        return actions.FUNCTIONS.Harvest_Gather_screen("queued", (self.vespene_1_x,self.vespene_1_y))
-                    if refinery_count == 2 and self.refinery_worker_count <= 6:
-                        self.refinery_worker_count += 1
-                        return actions.FUNCTIONS.Harvest_Gather_screen("queued", (self.vespene_2_x,self.vespene_2_y))
-            elif agent_action == 'Build_Reactor':
-                if self.unit_type_is_selected(obs, units.Terran.Barracks):
-                    if self.can_do(obs, actions.FUNCTIONS.Build_Reactor_screen.id):
-                        self.reactor_count += 1
-                        return actions.FUNCTIONS.Build_Reactor_screen("now", self.barrack_location[self.rand])
-            elif agent_action == 'Build_TechLab':
-                if self.unit_type_is_selected(obs, units.Terran.Barracks):
-                    if self.can_do(obs, actions.FUNCTIONS.Build_TechLab_screen.id):
-                        self.techlab_count += 1
-                        return actions.FUNCTIONS.Build_TechLab_screen("now", self.barrack_location[self.rand])
-            elif agent_action == 'Train_SCV':
-                if self.unit_type_is_selected(obs, units.Terran.CommandCenter):
-                    if self.can_do(obs, actions.FUNCTIONS.Train_SCV_quick.id):
-                        return actions.FUNCTIONS.Train_SCV_quick("queued")
-            elif agent_action == 'Train_Marine':
-                if self.unit_type_is_selected(obs, units.Terran.Barracks):
-                    if self.can_do(obs, actions.FUNCTIONS.Train_Marine_quick.id):
-                        if self.reactor_count == 2 and self.techlab_count == 2 :
-                            return actions.FUNCTIONS.Train_Marine_quick("queued")
-                        else:
-                            return actions.FUNCTIONS.Train_Marine_quick("now")
-            elif agent_action == 'Train_Marauder':
-                if self.unit_type_is_selected(obs, units.Terran.Barracks):
-                    if self.can_do(obs, actions.FUNCTIONS.Train_Marauder_quick.id):
-                        if self.reactor_count == 2 and self.techlab_count == 2 :
-                            return actions.FUNCTIONS.Train_Marauder_quick("queued")
-                        else:
-                            return actions.FUNCTIONS.Train_Marauder_quick("now")
-            elif agent_action == 'Train_Hellion':
-                if self.unit_type_is_selected(obs, units.Terran.Factory):
-                    if self.can_do(obs, actions.FUNCTIONS.Train_Hellion_quick.id):
-                        return actions.FUNCTIONS.Train_Hellion_quick("queued")
-            elif agent_action == 'Train_Cyclone':
-                if self.unit_type_is_selected(obs, units.Terran.Factory):
-                    if self.can_do(obs, actions.FUNCTIONS.Train_Cyclone_quick.id):
-                        return actions.FUNCTIONS.Train_Cyclone_quick("queued")
-            elif agent_action == 'Research_CombatShield':
-                if self.unit_type_is_selected(obs, units.Terran.BarracksTechLab):
-                    if self.can_do(obs, actions.FUNCTIONS.Research_CombatShield_quick.id):
-                        self.combatshield_research = True
-                        return actions.FUNCTIONS.Research_CombatShield_quick("queued")
-            elif agent_action == 'Research_TerranInfantryWeapons':
-                if self.unit_type_is_selected(obs, units.Terran.EngineeringBay):
-                    if self.can_do(obs, actions.FUNCTIONS.Research_TerranInfantryWeapons_quick.id):
-                        self.infantryweapons_research = True
-                        return actions.FUNCTIONS.Research_TerranInfantryWeapons_quick("queued")
-            elif agent_action == 'Research_TerranInfantryArmor':
-                if self.unit_type_is_selected(obs, units.Terran.EngineeringBay):
-                    if self.can_do(obs, actions.FUNCTIONS.Research_TerranInfantryArmor_quick.id):
-                        self.infantryarmor_research = True
-                        return actions.FUNCTIONS.Research_TerranInfantryArmor_quick("queued")
-            elif agent_action == 'Research_TerranVehicleWeapons':
-                if self.unit_type_is_selected(obs, units.Terran.Armory):
-                    if self.can_do(obs, actions.FUNCTIONS.Research_TerranVehicleWeapons_quick.id):
-                        self.vehicleweapons_research = True
-                        return actions.FUNCTIONS.Research_TerranVehicleWeapons_quick("queued")
-            elif agent_action == 'Attack':
-                if self.can_do(obs, actions.FUNCTIONS.Attack_minimap.id):
-                    location = self.transformLocation(int(x) + (random.randint(-1, 1) * 8), int(y) + (random.randint(-1, 1) * 8))
-                    return actions.FUNCTIONS.Attack_minimap("now", location)
-
-        elif self.move_number == 2:
-            self.move_number = 0
-
-            supply_depot_count = len(self.get_units_by_type(obs, units.Terran.SupplyDepot))
-            refinery_count = len(self.get_units_by_type(obs, units.Terran.Refinery))
-            barracks_count = len(self.get_units_by_type(obs, units.Terran.Barracks))
-            engineering_bay_count = len(self.get_units_by_type(obs, units.Terran.EngineeringBay))
-            factory_count = len(self.get_units_by_type(obs, units.Terran.Factory))
-            armory_count = len(self.get_units_by_type(obs, units.Terran.Armory))
-
-            agent_action, x, y = self.splitAction(self.previous_action)
-
-            if agent_action == 'Build_SupplyDepot' or agent_action == 'Build_Barracks' or agent_action == 'Build_EngineeringBay' or agent_action == 'Build_Factory' or agent_action == 'Build_Armory':
-                if self.can_do(obs, actions.FUNCTIONS.Harvest_Gather_screen.id):
-                    minerals = self.get_units_by_type(obs, units.Neutral.MineralField)
-                    if minerals:
-                        mineral = random.choice(minerals)
-
-                        return actions.FUNCTIONS.Harvest_Gather_screen("queued", (mineral.x, mineral.y))
-
-            elif agent_action == 'Train_SCV':
-                if self.unit_type_is_selected(obs, units.Terran.CommandCenter):
-                    if self.command_center_rallied == False:
-                        minerals = self.get_units_by_type(obs, units.Neutral.MineralField)
-                        if minerals:
-                            mineral = random.choice(minerals)
-                            self.command_center_rallied = True;
-
-                            return actions.FUNCTIONS.Rally_Workers_screen("now", (mineral.x, mineral.y))
-
-                
-        return actions.FUNCTIONS.no_op()       
+        call = self.macro.next_call(view, unit_index) if self.macro.active else None
+        if call is None:
+            call = self.decide(view, unit_index)
+        if self.updater is not None:
+            # 쌓인 learn 은 env.step 동안 백그라운드에서 처리
+            self.updater.wake()
+        return call
+
+    def decide(self, view, unit_index):
+        """Learns from the previous decision, chooses the next action and returns its first call."""
+        self.time_counter += 1
+
+        current_state = self.build_state(view, unit_index)
+
+        excluded_actions = self.build_excluded_actions(view, unit_index)
+
+        if self.previous_action is not None:
+            self.learn(self.previous_state, self.previous_action, 0, current_state, excluded_actions)
+            if self.wait_for_learn:
+                self.updater.drain()
+
+        with instrumentation.timer('choose'):
+            with self._table_lock():
+                rl_action = self.qlearn.choose_action(current_state, excluded_actions)
+                choice = getattr(self.qlearn, 'last_choice', None)
+        instrumentation.count('decisions')
+
+        self.previous_state = current_state
+        self.previous_action = rl_action
+        self.previous_choice = choice
+
+        logging.debug('action %s', REGISTRY.names[rl_action])
+        self.macro.start(rl_action)
+        # 한 스텝에 결정은 한 번만: 첫 단계부터 막히면 이번 스텝은 no_op
+        call = self.macro.next_call(view, unit_index)
+        if call is None:
+            return actions.FUNCTIONS.no_op()
+        return call
+
+    @instrumentation.timed('learn')
+    def learn(self, s, a, r, s_, next_mask=None):
+        if self.replay is not None:
+            self.replay.add(s, a, r, s_, next_mask)
+        elif self.updater is not None:
+            self.updater.learn(s, a, r, s_, self.previous_choice)
+        else:
+            self.qlearn.learn(s, a, r, s_)
+
+    def _table_lock(self):
+        """Lock a background thread holds while it updates the Q-table (a no-op context without one)."""
+        if self.replay is not None and self.replay.background:
+            return self.replay.lock
+        if self.updater is not None:
+            return self.updater.lock
+        return contextlib.nullcontext()
+
+    @instrumentation.timed('state')
+    def build_state(self, view, unit_index):
+        """Integer state key of the current observation."""
+        barracks_count = unit_index.count(units.Terran.Barracks)
+        factory_count = unit_index.count(units.Terran.Factory)
+        player = view.player
+        army_supply = player.food_army
+        player_minerals = player.minerals
+        player_vespene = player.vespene
+
+        current_state = np.zeros(state_codec.STATE_SIZE)
+        current_state[0] = self.time_counter
+        current_state[1] = player_minerals
+        current_state[2] = player_vespene
+        current_state[3] = barracks_count
+        current_state[4] = factory_count
+        current_state[5] = army_supply
+
+        current_state[6:14] = obs_features.quadrant_features(
+            view.player_relative, self.base_top_left)
+
+        current_state = state_codec.encode(current_state)
+        return current_state
+
+    def build_context(self, view, unit_index):
+        """action_registry.CONTEXT vector of the current observation."""
+        player = view.player
+        return np.array([
+            unit_index.count(units.Terran.SupplyDepot),
+            unit_index.count(units.Terran.Refinery),
+            unit_index.count(units.Terran.Barracks),
+            unit_index.count(units.Terran.EngineeringBay),
+            unit_index.count(units.Terran.Factory),
+            unit_index.count(units.Terran.Armory),
+            player.food_workers,
+            player.food_cap - player.food_used,
+            player.food_army,
+            player.vespene,
+            self.reactor_count,
+            self.techlab_count,
+            self.refinery_worker_count,
+            self.combatshield_research,
+            self.infantryweapons_research,
+            self.infantryarmor_research,
+            self.vehicleweapons_research,
+        ], dtype=np.float64)
+
+    @instrumentation.timed('mask')
+    def build_excluded_actions(self, view, unit_index):
+        """Bool mask of the actions whose preconditions do not hold in the current observation."""
+        return REGISTRY.excluded(self.build_context(view, unit_index))
+
+    # --- macro phases ------------------------------------------------------
+    # 각 단계는 PySC2 함수 호출을 돌려주고, 전제 조건이 맞지 않으면 None (macro 중단)
+
+    @instrumentation.timed('select')
+    def select_step(self, view, unit_index, action):
+        """Select phase: select the unit that will carry out the action."""
+        return self._select_handlers[REGISTRY.select_mode[action]](view, unit_index, action)
+
+    def _select_none(self, view, unit_index, action):
+        return None
+
+    def _select_worker(self, view, unit_index, action):
+        scvs = unit_index.coords(REGISTRY.selector[action])
+        if len(scvs) > 0:
+            x, y = scvs[0]
+            if (x < 1 or y < 1 or x > 82 or y > 82) and len(scvs) > 1:
+                x, y = scvs[1]
+            return actions.FUNCTIONS.select_point("select", (x, y))
+        return None
+
+    def _select_all_type(self, view, unit_index, action):
+        target = unit_index.first(REGISTRY.selector[action])
+        if target is not None:
+            return actions.FUNCTIONS.select_point("select_all_type", target)
+        return None
+
+    def _select_all_on_screen(self, view, unit_index, action):
+        target = unit_index.first(REGISTRY.selector[action])
+        if target is not None and target[0] <= 82 and target[1] <= 82:
+            return actions.FUNCTIONS.select_point("select_all_type", target)
+        return None
+
+    def _select_barracks_site(self, view, unit_index, action):
+        self.rand = random.choice(list(self.barrack_location.keys()))
+        return actions.FUNCTIONS.select_point("select", self.barrack_location[self.rand])
+
+    def _select_army(self, view, unit_index, action):
+        if self.can_do(view, actions.FUNCTIONS.select_army.id):
+            return actions.FUNCTIONS.select_army("select")
+        return None
+
+    @instrumentation.timed('order')
+    def order_step(self, view, unit_index, action):
+        """Order phase: give the selected unit its order."""
+        function = REGISTRY.function[action]
+        if function is None:
+            return None
+        selector = REGISTRY.selector[action]
+        if selector is not None and not self.unit_type_is_selected(view, selector):
+            return None
+        if not self.can_do(view, REGISTRY.function_id[action]):
+            return None
+
+        # 좌표 정책이 None 을 돌려주면 이번 명령은 취소
+        args = self._target_handlers[REGISTRY.target[action]](view, unit_index, action)
+        if args is None:
+            return None
+
+        if REGISTRY.counter[action] is not None:
+            setattr(self, REGISTRY.counter[action], getattr(self, REGISTRY.counter[action]) + 1)
+        if REGISTRY.flag[action] is not None:
+            setattr(self, REGISTRY.flag[action], True)
+        return function(self._queue(action), *args)
+
+    def _queue(self, action):
+        policy = REGISTRY.queue[action]
+        if policy == action_registry.QUEUE_QUEUED:
+            return "queued"
+        if policy == action_registry.QUEUE_IF_ADDONS and self.reactor_count == 2 and self.techlab_count == 2:
+            return "queued"
+        return "now"
+
+    def _target_none(self, view, unit_index, action):
+        return ()
+
+    def _target_near_half(self, view, unit_index, action):
+        if self.base_top_left:
+            return self._place(view, action, placement.LEFT, 1, 41)
+        return self._place(view, action, placement.RIGHT, 42, 82)
+
+    def _target_far_half(self, view, unit_index, action):
+        if self.base_top_left:
+            return self._place(view, action, placement.RIGHT, 42, 82)
+        return self._place(view, action, placement.LEFT, 1, 41)
+
+    def _place(self, view, action, side, x_min, x_max):
+        """Free spot for the action's footprint in one screen half; random if there is no feature_screen."""
+        size = REGISTRY.footprint[action]
+        if size and self.placement.observe(view.feature_screen):
+            spot = self.placement.sample(size, side)
+            if spot is None:
+                return None
+            self.placement.reserve(spot[0], spot[1], size)
+            return (spot,)
+        return ((random.randint(x_min, x_max), random.randint(1, 82)),)
+
+    def _target_barracks_site(self, view, unit_index, action):
+        args = self._target_far_half(view, unit_index, action)
+        if args is None:
+            return None
+        self.barrack_location[unit_index.count(units.Terran.Barracks)] = args[0]
+        return args
+
+    def _target_vespene(self, view, unit_index, action):
+        refinery_count = unit_index.count(units.Terran.Refinery)
+        if refinery_count == 0:
+            self.refinery_worker_count += 1
+            return ((self.vespene_1_x, self.vespene_1_y),)
+        if refinery_count == 1:
+            self.refinery_worker_count += 1
+            return ((self.vespene_2_x, self.vespene_2_y),)
+        return None
+
+    def _target_gas_worker(self, view, unit_index, action):
+        refinery_count = unit_index.count(units.Terran.Refinery)
+        if (refinery_count == 1 and self.refinery_worker_count <= 3) or (refinery_count == 2 and self.refinery_worker_count <= 4):
+            self.refinery_worker_count += 1
+            return ((self.vespene_1_x, self.vespene_1_y),)
+        if refinery_count == 2 and self.refinery_worker_count <= 6:
+            self.refinery_worker_count += 1
+            return ((self.vespene_2_x, self.vespene_2_y),)
+        return None
+
+    def _target_addon(self, view, unit_index, action):
+        return (self.barrack_location[self.rand],)
+
+    def _target_minimap(self, view, unit_index, action):
+        x = REGISTRY.x[action] + random.randint(-1, 1) * 8
+        y = REGISTRY.y[action] + random.randint(-1, 1) * 8
+        return (self.transformLocation(x, y),)
+
+    @instrumentation.timed('return')
+    def return_step(self, view, unit_index, action):
+        """Follow-up phase: send builders back to work and rally new SCVs."""
+        return self._followup_handlers[REGISTRY.followup[action]](view, unit_index, action)
+
+    def _followup_none(self, view, unit_index, action):
+        return None
+
+    def _followup_harvest(self, view, unit_index, action):
+        if self.can_do(view, actions.FUNCTIONS.Harvest_Gather_screen.id):
+            mineral = unit_index.random(units.Neutral.MineralField)
+            if mineral is not None:
+                return actions.FUNCTIONS.Harvest_Gather_screen("queued", mineral)
+        return None
+
+    def _followup_rally(self, view, unit_index, action):
+        if self.unit_type_is_selected(view, REGISTRY.selector[action]):
+            if self.command_center_rallied == False:
+                mineral = unit_index.random(units.Neutral.MineralField)
+                if mineral is not None:
+                    self.command_center_rallied = True
+
+                    return actions.FUNCTIONS.Rally_Workers_screen("now", mineral)
+        return None
+
+
+def make_env(map_name="Simple64", difficulty=sc2_env.Difficulty.easy, step_mul=16, visualize=True):
+    return sc2_env.SC2Env(
+        map_name = map_name,
+        players = [sc2_env.Agent(sc2_env.Race.terran),
+                    sc2_env.Bot(sc2_env.Race.protoss,
+                                difficulty)],
+                    # very_easy, easy, medium, medium_hard
+                    # hard, harder, very_hard
+        agent_interface_format = features.AgentInterfaceFormat(
+            feature_dimensions = features.Dimensions(screen=84, minimap=64),
+            use_feature_units = True), # enable feature units
+
+        step_mul = step_mul,
+            # 16 - 150 APM
+            #  8 - 300 APM
+        game_steps_per_episode = 20000,
+
+        visualize = visualize)
+
+
+def run_episode(env, agent):
+    """Plays one game and returns its last TimeStep."""
+    with instrumentation.timer('env_reset'):
+        timesteps = env.reset()
+    agent.reset()
+
+    # loop - feeding step details into the agent and receiving actions
+    while True:
+        with instrumentation.timer('agent_step'):
+            step_actions = [agent.step(timesteps[0])]
+        if timesteps[0].last():
+            instrumentation.end_episode()
+            return timesteps[0]
+        with instrumentation.timer('env_step'):
+            timesteps = env.step(step_actions)
+        instrumentation.count('env_steps')
+        instrumentation.maybe_report()
 
 
 def main(unused_argv):
-    agent = TerranAgent()
+    instrumentation.enable_from_flags()
+    qlearn = table_from_flags()
+    replay = replay_from_flags(qlearn)
+    agent = TerranAgent(qlearn=qlearn, replay=replay, async_learning=FLAGS.async_learning)
+    if replay is not None and FLAGS.replay_background:
+        replay.start()
+
+    def launch():
+        env = make_env()
+        if FLAGS.record:
+            env = recorder.RecordingEnv(env, FLAGS.record)
+        return env
+
+    # 게임마다 SC2 를 새로 띄우지 않고 같은 env 에서 reset
+    session = env_session.EnvSession(launch, FLAGS.env_restart_every)
     try:
-        while True:
-            with sc2_env.SC2Env(
-                map_name = "Simple64",
-                players = [sc2_env.Agent(sc2_env.Race.terran),
-                            sc2_env.Bot(sc2_env.Race.protoss,
-                                        sc2_env.Difficulty.easy)],
-                            # very_easy, easy, medium, medium_hard
-                            # hard, harder, very_hard
-                agent_interface_format = features.AgentInterfaceFormat(
-                    feature_dimensions = features.Dimensions(screen=84, minimap=64),
-                    use_feature_units = True), # enable feature units
-                    
-                step_mul = 16,
-                    # 16 - 150 APM
-                    #  8 - 300 APM
-                game_steps_per_episode = 20000,
-                    
-                visualize = True) as env:
-
-                agent.setup(env.observation_spec(), env.action_spec())
-
-                timesteps = env.reset()
-                agent.reset()
-
-                # loop - feeding step details into the agent and receiving actions
-                while True:
-                    step_actions = [agent.step(timesteps[0])]
-                    if timesteps[0].last():
-                        break
-                    timesteps = env.step(step_actions)
+        with session:
+            while True:
+                try:
+                    # 첫 launch 도 crash 하면 다시 시도하도록 loop 안에서
+                    if agent.obs_spec is None:
+                        agent.setup(session.observation_spec(), session.action_spec())
+                    last = run_episode(session, agent)
+                except env_session.EnvCrashed:
+                    agent.abort_episode()
+                    continue
+                logging.info('game %d: reward %d, reset %.2fs, %d env launches',
+                             agent.episodes, last.reward, session.reset_seconds, session.launches)
 
     except KeyboardInterrupt:
         pass
+    finally:
+        agent.close()
 
 if __name__ == "__main__":
     app.run(main)
@@ -0,0 +1,10 @@
+import os
+import sys
+
+from absl import flags
+
+# 최상위 모듈을 그대로 import 하도록
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 모듈들이 정의한 absl flag 를 기본값으로 사용
+flags.FLAGS.mark_as_parsed()
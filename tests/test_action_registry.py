@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from action_registry import CONTEXT, REGISTRY
+
+
+def if_chain_excluded(c):
+    """The exclusion if-chain of the agent before action_registry, on a CONTEXT dict."""
+    excluded = []
+    if c['supply_depots'] >= 10 or c['free_supply'] > 10:
+        excluded.append(1)
+    if c['supply_depots'] == 0 or c['refineries'] >= 2:
+        excluded.append(2)
+    if c['supply_depots'] == 0 or c['barracks'] >= 3:
+        excluded.append(3)
+    if c['barracks'] == 0 or c['reactors'] >= 2:
+        excluded.append(4)
+    if c['barracks'] == 0 or c['techlabs'] >= 2:
+        excluded.append(5)
+    if c['barracks'] == 0 or c['engineering_bays'] >= 1:
+        excluded.append(6)
+    if c['barracks'] == 0 or c['factories'] >= 2:
+        excluded.append(7)
+    if c['factories'] == 0:
+        excluded.append(8)
+    if c['scvs'] >= 22:
+        excluded.append(9)
+    if c['barracks'] == 0 or c['free_supply'] == 0:
+        excluded.append(10)
+        excluded.append(11)
+    if c['factories'] == 0 or c['free_supply'] < 2:
+        excluded.append(12)
+        excluded.append(13)
+    if c['factories'] > 0 and c['free_supply'] >= 2 and c['vespene'] < 100:
+        excluded.append(13)
+    if c['techlabs'] == 0 or c['vespene'] < 100 or c['combatshield_research']:
+        excluded.append(14)
+    if c['engineering_bays'] == 0 or c['vespene'] < 100 or c['infantryweapons_research']:
+        excluded.append(15)
+    if c['engineering_bays'] == 0 or c['vespene'] < 100 or c['infantryarmor_research']:
+        excluded.append(16)
+    if c['armories'] == 0 or c['vespene'] < 100 or c['vehicleweapons_research']:
+        excluded.append(17)
+    if c['refineries'] == 0 or c['refinery_workers'] == 8:
+        excluded.append(18)
+    if c['army_supply'] == 0:
+        excluded.extend([19, 20, 21, 22])
+    return excluded
+
+
+# 경계값 주변을 고르게 뽑도록 특징마다 후보 값
+CANDIDATES = {
+    'supply_depots': [0, 1, 9, 10, 11],
+    'refineries': [0, 1, 2, 3],
+    'barracks': [0, 1, 2, 3, 4],
+    'engineering_bays': [0, 1, 2],
+    'factories': [0, 1, 2, 3],
+    'armories': [0, 1],
+    'scvs': [12, 21, 22, 23],
+    'free_supply': [0, 1, 2, 3, 10, 11],
+    'army_supply': [0, 1, 20],
+    'vespene': [0, 99, 100, 400],
+    'reactors': [0, 1, 2, 3],
+    'techlabs': [0, 1, 2, 3],
+    'refinery_workers': [0, 7, 8, 9],
+    'combatshield_research': [0, 1],
+    'infantryweapons_research': [0, 1],
+    'infantryarmor_research': [0, 1],
+    'vehicleweapons_research': [0, 1],
+}
+
+
+def contexts(n, seed=0):
+    rng = np.random.RandomState(seed)
+    return [{name: CANDIDATES[name][rng.randint(len(CANDIDATES[name]))] for name in CONTEXT} for _ in range(n)]
+
+
+def as_vector(context):
+    return np.array([context[name] for name in CONTEXT], dtype=np.float64)
+
+
+def test_registry_has_the_old_action_order():
+    assert len(REGISTRY) == 23
+    assert REGISTRY.names[0] == 'no_op'
+    assert REGISTRY.names[19:] == ['Attack-15-15', 'Attack-15-47', 'Attack-47-15', 'Attack-47-47']
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_excluded_matches_the_if_chain(seed):
+    for context in contexts(400, seed):
+        expected = np.zeros(len(REGISTRY), dtype=bool)
+        expected[if_chain_excluded(context)] = True
+        np.testing.assert_array_equal(REGISTRY.excluded(as_vector(context)), expected, err_msg=str(context))
+
+
+def test_excluded_batch_matches_excluded():
+    batch = contexts(200, seed=7)
+    masks = REGISTRY.excluded_batch(np.array([as_vector(context) for context in batch]))
+    for context, mask in zip(batch, masks):
+        np.testing.assert_array_equal(mask, REGISTRY.excluded(as_vector(context)))
@@ -0,0 +1,94 @@
+import random
+
+import numpy as np
+import pytest
+
+import instrumentation
+import terran_agent_alpha
+from mock_env import MockSC2Env
+from q_table import QLearningTable
+from terran_agent_alpha import Q_actions, TerranAgent
+
+
+def play(agent, episodes=2, seed=0, game_steps=20000):
+    random.seed(seed)
+    np.random.seed(seed)
+    env = MockSC2Env(seed=seed, game_steps_per_episode=game_steps)
+    agent.setup(env.observation_spec(), env.action_spec())
+    try:
+        return [terran_agent_alpha.run_episode(env, agent) for _ in range(episodes)]
+    finally:
+        agent.close()
+
+
+@pytest.mark.parametrize('async_learning', [False, True])
+def test_agent_plays_and_learns_on_the_mock_env(async_learning):
+    qlearn = QLearningTable(actions=list(range(len(Q_actions))))
+    agent = TerranAgent(qlearn=qlearn, persist=False, async_learning=async_learning)
+
+    lasts = play(agent)
+
+    assert [last.last() for last in lasts] == [True, True]
+    assert all(last.reward in (-1, 0, 1) for last in lasts)
+    assert agent.episodes == 2
+    assert len(qlearn) > 1
+    assert qlearn.values[:len(qlearn)].any()
+
+
+def test_agent_decisions_respect_the_exclusion_mask():
+    qlearn = QLearningTable(actions=list(range(len(Q_actions))), e_greedy=0.0)
+    chosen = []
+    choose_action = qlearn.choose_action
+
+    def recording_choose_action(state, excluded_actions=[]):
+        action = choose_action(state, excluded_actions)
+        chosen.append((action, np.asarray(excluded_actions)))
+        return action
+    qlearn.choose_action = recording_choose_action
+
+    play(TerranAgent(qlearn=qlearn, persist=False), episodes=1)
+
+    assert chosen
+    for action, mask in chosen:
+        assert mask.all() or not mask[action]
+
+
+def test_sync_and_async_q_learning_give_the_same_table():
+    tables = []
+    for async_learning in (False, True):
+        qlearn = QLearningTable(actions=list(range(len(Q_actions))), learner='q', learning_rate=0.5)
+        agent = TerranAgent(qlearn=qlearn, persist=False, async_learning=async_learning)
+        assert not agent.wait_for_learn
+        play(agent, episodes=30, game_steps=4000)
+        tables.append(qlearn.snapshot())
+    assert tables[0][0] == tables[1][0]
+    np.testing.assert_array_equal(tables[0][1], tables[1][1])
+
+
+def test_async_qlambda_applies_the_pending_update_before_each_decision():
+    qlearn = QLearningTable(actions=list(range(len(Q_actions))), learner='qlambda', learning_rate=0.5)
+    agent = TerranAgent(qlearn=qlearn, persist=False, async_learning=True)
+    assert agent.wait_for_learn
+    backlogs = []
+    choose_action = qlearn.choose_action
+
+    def recording_choose_action(state, excluded_actions=[]):
+        backlogs.append(agent.updater.backlog())
+        return choose_action(state, excluded_actions)
+    qlearn.choose_action = recording_choose_action
+
+    play(agent, episodes=30, game_steps=4000)
+
+    assert len(backlogs) > 30
+    assert not any(backlogs)
+
+
+def test_agent_makes_at_most_one_decision_per_step():
+    instrumentation.enable(1e9)
+    try:
+        play(TerranAgent(persist=False), episodes=1)
+        counters = instrumentation.summary()['counters']
+    finally:
+        instrumentation.disable()
+    assert counters['decisions'] > 0
+    assert counters['decisions'] <= counters['env_steps'] + 1
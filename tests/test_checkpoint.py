@@ -0,0 +1,98 @@
+import os
+
+import numpy as np
+import pytest
+
+from checkpoint import CheckpointStore
+from q_table import QLearningTable
+from state_codec import TERMINAL
+
+
+def table():
+    return QLearningTable(actions=[0, 1], learning_rate=1.0)
+
+
+def values(qlearn):
+    states, rows = qlearn.snapshot()
+    return {state: row.tolist() for state, row in zip(states, rows)}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CheckpointStore(str(tmp_path / 'table'), compact_ratio=1e9)
+    qlearn = table()
+    qlearn.learn(1, 0, 1.0, TERMINAL)
+    store.save(qlearn)
+    return store
+
+
+def test_flush_and_load_replay_the_log(store):
+    qlearn = table()
+    store.load(qlearn)
+    qlearn.learn(2, 1, 5.0, TERMINAL)
+    store.flush(qlearn)
+
+    loaded = table()
+    CheckpointStore(store.path).load(loaded)
+    assert values(loaded) == values(qlearn)
+
+
+@pytest.mark.parametrize('torn', [b'\x01\x02\x03', b'\xff' * 20])
+def test_torn_frame_is_dropped_and_later_flushes_survive(store, torn):
+    qlearn = table()
+    store.load(qlearn)
+    qlearn.learn(2, 1, 5.0, TERMINAL)
+    store.flush(qlearn)
+    with open(store.log_file, 'ab') as f:     # crash 로 frame 일부만 쓰인 상태
+        f.write(torn)
+
+    qlearn = table()
+    store.load(qlearn)
+    qlearn.learn(1, 0, 7.0, TERMINAL)
+    store.flush(qlearn)
+
+    loaded = table()
+    CheckpointStore(store.path).load(loaded)
+    assert values(loaded) == values(qlearn)
+    assert loaded.values[loaded.state_index[1], 0] == 7.0
+
+
+def test_read_only_load_leaves_a_torn_log_alone(store):
+    qlearn = table()
+    store.load(qlearn)
+    qlearn.learn(2, 1, 5.0, TERMINAL)
+    store.flush(qlearn)
+    with open(store.log_file, 'ab') as f:
+        f.write(b'\xff' * 20)
+    size = os.path.getsize(store.log_file)
+
+    CheckpointStore(store.path).load(table(), read_only=True)
+    assert os.path.getsize(store.log_file) == size
+
+
+def test_interrupted_compaction_is_finished_on_load(store):
+    qlearn = table()
+    store.load(qlearn)
+    qlearn.learn(2, 1, 5.0, TERMINAL)
+    store.flush(qlearn)
+    os.replace(store.log_file, store.old_log_file)     # compaction 이 snapshot 을 쓰기 전에 종료
+
+    loaded = table()
+    CheckpointStore(store.path).load(loaded)
+    assert values(loaded) == values(qlearn)
+    assert not os.path.isfile(store.old_log_file)
+
+
+def test_eviction_rewrites_the_snapshot(store):
+    qlearn = QLearningTable(actions=[0, 1], learning_rate=1.0, max_rows=2)
+    store.load(qlearn)
+    for state in range(2, 6):
+        qlearn.learn(state, 0, float(state), TERMINAL)
+    store.flush(qlearn)
+    store.wait()
+
+    loaded = table()
+    CheckpointStore(store.path).load(loaded)
+    assert values(loaded) == values(qlearn)
+    assert len(loaded) <= 2
+    np.testing.assert_array_equal(loaded.snapshot()[1], qlearn.snapshot()[1])
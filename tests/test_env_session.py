@@ -0,0 +1,85 @@
+import pytest
+from pysc2.lib import protocol, sc_process
+
+from env_session import EnvCrashed, EnvSession
+
+
+class FakeEnv:
+    def __init__(self, fail_reset=0, fail_step=False):
+        self.fail_reset = fail_reset
+        self.fail_step = fail_step
+        self.resets = 0
+        self.closed = False
+
+    def reset(self):
+        if self.fail_reset:
+            self.fail_reset -= 1
+            raise protocol.ConnectionError('game died')
+        self.resets += 1
+        return ('timestep',)
+
+    def step(self, actions):
+        if self.fail_step:
+            raise protocol.ProtocolError('connection lost')
+        return ('timestep',)
+
+    def close(self):
+        self.closed = True
+
+
+class Factory:
+    """make_env that hands out the given envs in order, or raises them if they are exceptions."""
+
+    def __init__(self, *envs):
+        self.envs = list(envs)
+        self.made = []
+
+    def __call__(self):
+        env = self.envs.pop(0)
+        if isinstance(env, Exception):
+            raise env
+        self.made.append(env)
+        return env
+
+
+def test_games_reuse_the_env_until_restart_every():
+    factory = Factory(FakeEnv(), FakeEnv())
+    session = EnvSession(factory, restart_every=3)
+    for _ in range(4):
+        session.reset()
+    assert session.launches == 2
+    assert factory.made[0].closed and factory.made[0].resets == 3
+    assert factory.made[1].resets == 1
+
+
+def test_crash_in_step_relaunches_on_the_next_reset():
+    broken = FakeEnv(fail_step=True)
+    factory = Factory(broken, FakeEnv())
+    session = EnvSession(factory)
+    session.reset()
+    with pytest.raises(EnvCrashed):
+        session.step([None])
+    assert broken.closed and session.env is None
+
+    session.reset()
+    assert session.step([None]) == ('timestep',)
+    assert (session.launches, session.crashes, session.failures) == (2, 1, 0)
+
+
+def test_failed_launch_is_retried():
+    factory = Factory(sc_process.SC2LaunchError('no binary'), FakeEnv())
+    session = EnvSession(factory)
+    with pytest.raises(EnvCrashed):
+        session.reset()
+    session.reset()
+    assert session.launches == 1 and session.crashes == 1
+
+
+def test_too_many_crashes_in_a_row_are_reraised():
+    factory = Factory(*[FakeEnv(fail_reset=1) for _ in range(3)])
+    session = EnvSession(factory, max_failures=2)
+    for _ in range(2):
+        with pytest.raises(EnvCrashed):
+            session.reset()
+    with pytest.raises(protocol.ConnectionError):
+        session.reset()
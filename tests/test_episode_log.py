@@ -0,0 +1,51 @@
+import json
+
+import numpy as np
+
+import episode_log
+from episode_log import EpisodeLog
+
+
+def test_migrate_winrate(tmp_path):
+    txt = tmp_path / 'Winrate.txt'
+    txt.write_text('1\n-1\n\n0\n1\n')
+    path = str(tmp_path / 'episodes.jsonl')
+
+    episode_log.migrate_winrate(str(txt), path)
+
+    records = [json.loads(line) for line in open(path)]
+    assert records == [{'episode': 1, 'reward': 1}, {'episode': 2, 'reward': -1},
+                       {'episode': 3, 'reward': 0}, {'episode': 4, 'reward': 1}]
+    assert episode_log.winrate(path, window=2) == 0.5
+
+
+def test_log_continues_numbering_and_reads_the_tail(tmp_path):
+    path = str(tmp_path / 'episodes.jsonl')
+    log = EpisodeLog(path)
+    for reward in (1, 0, -1):
+        log.record(reward, steps=100, seconds=2.0, table_size=10)
+    log.close()
+
+    log = EpisodeLog(path)
+    assert log.record(1) == 4
+    log.close()
+
+    tail = episode_log.read_tail(path, 2)
+    assert [record['episode'] for record in tail] == [3, 4]
+    assert episode_log.read_tail(path, 1)[0]['reward'] == 1
+    assert episode_log.read_tail(path, 10)[0]['steps_per_sec'] == 50.0
+
+
+def test_read_tail_skips_a_torn_last_line(tmp_path):
+    path = tmp_path / 'episodes.jsonl'
+    path.write_text('{"episode": 1, "reward": 1}\n{"episode": 2, "rew')
+    assert episode_log.read_tail(str(path), 5) == [{'episode': 1, 'reward': 1}]
+
+
+def test_rolling_winrate(tmp_path):
+    path = str(tmp_path / 'episodes.jsonl')
+    with open(path, 'w') as f:
+        for episode, reward in enumerate([1, 1, 0, 0, 1], 1):
+            f.write(json.dumps({'episode': episode, 'reward': reward}) + '\n')
+    stats = episode_log.rolling_stats(path, window=2)
+    np.testing.assert_allclose(stats['winrate'], [1.0, 1.0, 0.5, 0.0, 0.5])
@@ -0,0 +1,81 @@
+import numpy as np
+
+import state_codec
+from linear_q import LinearQ
+from state_codec import TERMINAL
+
+S = int(state_codec.pack(np.zeros(state_codec.STATE_SIZE)))
+S_NEXT = int(state_codec.pack(state_codec.MAXES))
+
+
+def table():
+    qlearn = LinearQ(actions=[0, 1, 2], learning_rate=1.0, reward_decay=1.0, e_greedy=1.0)
+    # S_NEXT 에서는 action 2 가 가장 좋음
+    qlearn.learn(S_NEXT, 2, 5.0, TERMINAL)
+    qlearn.learn(S_NEXT, 0, 1.0, TERMINAL)
+    return qlearn
+
+
+def q_next(qlearn):
+    return qlearn.q_values([S_NEXT])[0]
+
+
+def learned_from(qlearn, target):
+    """Weights qlearn would have after learning (S, 1) towards a fixed target; qlearn is left as it was."""
+    weights = qlearn.weights.copy()
+    qlearn.learn(S, 1, target, TERMINAL)
+    learned, qlearn.weights = qlearn.weights, weights
+    return learned
+
+
+def test_learning_moves_the_estimate_towards_the_target():
+    qlearn = table()
+    q_values = qlearn.q_values([S_NEXT])[0]
+    assert q_values[2] > q_values[0] > q_values[1] == 0.0
+    assert qlearn.choose_action(S_NEXT) == 2
+    assert qlearn.choose_action(S_NEXT, [2]) == 0
+
+
+def test_learn_bootstraps_from_the_actions_allowed_in_the_next_state():
+    qlearn = table()
+
+    # 마스크를 기록하기 전에는 모든 행동에서, 기록한 뒤에는 허용된 행동에서만 bootstrap
+    expected = learned_from(qlearn, q_next(qlearn)[2])
+    qlearn.learn(S, 1, 0.0, S_NEXT)
+    np.testing.assert_allclose(qlearn.weights, expected)
+
+    qlearn = table()
+    qlearn.choose_action(S_NEXT, [2])
+    assert qlearn.disallowed_actions[S_NEXT].tolist() == [False, False, True]
+    expected = learned_from(qlearn, q_next(qlearn)[0])
+    qlearn.learn(S, 1, 0.0, S_NEXT)
+    np.testing.assert_allclose(qlearn.weights, expected)
+
+    # 모든 행동이 제외된 state 는 마스크 없이
+    qlearn = table()
+    qlearn.choose_action(S_NEXT, [0, 1, 2])
+    expected = learned_from(qlearn, q_next(qlearn)[2])
+    qlearn.learn(S, 1, 0.0, S_NEXT)
+    np.testing.assert_allclose(qlearn.weights, expected)
+
+
+def test_learn_batch_applies_next_masks_like_learn():
+    qlearn = table()
+
+    expected = learned_from(qlearn, q_next(qlearn)[0])
+    qlearn.learn_batch([S], [1], [0.0], [S_NEXT], next_masks=[[False, False, True]], terminal=[False])
+    np.testing.assert_allclose(qlearn.weights, expected)
+
+    qlearn = table()
+    expected = learned_from(qlearn, q_next(qlearn)[2])
+    qlearn.learn_batch([S], [1], [0.0], [S_NEXT], next_masks=[[True, True, True]])
+    assert np.isfinite(qlearn.weights).all()
+    np.testing.assert_allclose(qlearn.weights, expected)
+
+
+def test_masks_are_kept_for_the_most_recent_states_only():
+    qlearn = LinearQ(actions=[0, 1], memory_size=4)
+    for state in range(1, 7):
+        qlearn.choose_action(state, [0])
+    qlearn.choose_action(3, [1])
+    assert list(qlearn.disallowed_actions) == [4, 5, 6, 3]
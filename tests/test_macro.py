@@ -0,0 +1,71 @@
+from action_registry import REGISTRY
+from macro import FOLLOWUP, ORDER, SELECT, MacroExecutor
+
+
+class FakeAgent:
+    def __init__(self, selected=False, select=True, order=True, followup=True):
+        self.selected = selected
+        self.results = {'select': select, 'order': order, 'return': followup}
+        self.calls = []
+
+    def unit_type_is_selected(self, view, unit_type):
+        return self.selected
+
+    def _step(self, name, action):
+        self.calls.append(name)
+        return (name, action) if self.results[name] else None
+
+    def select_step(self, view, unit_index, action):
+        return self._step('select', action)
+
+    def order_step(self, view, unit_index, action):
+        return self._step('order', action)
+
+    def return_step(self, view, unit_index, action):
+        return self._step('return', action)
+
+
+def run(macro, action):
+    macro.start(action)
+    calls = []
+    while macro.active:
+        call = macro.next_call(None, None)
+        if call is not None:
+            calls.append(call[0])
+    return calls
+
+
+def action_id(name):
+    return REGISTRY.names.index(name)
+
+
+def test_phases_follow_the_registry():
+    macro = MacroExecutor(FakeAgent())
+    macro.start(action_id('no_op'))
+    assert macro.phases == []
+    macro.start(action_id('Train_Marine'))
+    assert macro.phases == [SELECT, ORDER]
+    macro.start(action_id('Build_SupplyDepot'))
+    assert macro.phases == [SELECT, ORDER, FOLLOWUP]
+    assert run(macro, action_id('Build_SupplyDepot')) == ['select', 'order', 'return']
+
+
+def test_select_is_skipped_when_the_type_is_already_selected():
+    agent = FakeAgent(selected=True)
+    macro = MacroExecutor(agent)
+    assert run(macro, action_id('Train_SCV')) == ['order', 'return']
+    # a barracks site has to be picked every time
+    assert run(macro, action_id('Build_Reactor')) == ['select', 'order']
+
+
+def test_failed_phase_drops_the_rest_of_the_macro():
+    agent = FakeAgent(select=False)
+    macro = MacroExecutor(agent)
+    macro.start(action_id('Build_Barracks'))
+    assert macro.next_call(None, None) is None
+    assert not macro.active
+    assert agent.calls == ['select']
+
+    agent = FakeAgent(order=False)
+    assert run(MacroExecutor(agent), action_id('Build_Barracks')) == ['select']
+    assert agent.calls == ['select', 'order']
@@ -0,0 +1,37 @@
+import numpy as np
+from pysc2.lib import actions
+
+from mock_env import MockSC2Env
+
+NO_OP = actions.FUNCTIONS.no_op()
+
+
+def no_op_game(seed):
+    env = MockSC2Env(seed=seed)
+    timesteps = env.reset()
+    trace = []
+    while not timesteps[0].last():
+        timesteps = env.step([NO_OP])
+        observation = timesteps[0].observation
+        trace.append((np.asarray(observation['player']).tolist(), np.asarray(observation['feature_units']).tobytes()))
+    return trace, timesteps[0].reward
+
+
+def test_same_seed_replays_the_same_game():
+    assert no_op_game(0) == no_op_game(0)
+
+
+def test_a_passive_agent_does_not_win():
+    trace, reward = no_op_game(1)
+    assert len(trace) > 1
+    assert reward in (-1, 0)
+
+
+def test_first_timestep_has_the_agent_interface_fields():
+    env = MockSC2Env(seed=0)
+    timestep = env.reset()[0]
+    assert timestep.first()
+    observation = timestep.observation
+    for name in ('player', 'available_actions', 'feature_units', 'single_select', 'multi_select', 'feature_minimap'):
+        assert name in observation
+    assert actions.FUNCTIONS.no_op.id in observation['available_actions']
@@ -0,0 +1,56 @@
+import numpy as np
+from pysc2.env import environment
+from pysc2.lib import actions, features, named_array, units
+
+from obs_view import ObsView
+
+
+def timestep(single_select=(), multi_select=(), feature_screen=True):
+    def selection(unit_types):
+        rows = np.zeros((len(unit_types), len(features.UnitLayer)), dtype=np.int32)
+        rows[:, features.UnitLayer.unit_type] = unit_types
+        return named_array.NamedNumpyArray(rows, [None, features.UnitLayer])
+
+    player = np.arange(len(features.Player), dtype=np.int32)
+    observation = named_array.NamedDict(
+        player=named_array.NamedNumpyArray(player, features.Player),
+        available_actions=np.array([actions.FUNCTIONS.no_op.id, actions.FUNCTIONS.Train_SCV_quick.id], dtype=np.int32),
+        single_select=selection(single_select),
+        multi_select=selection(multi_select),
+        feature_units=named_array.NamedNumpyArray(np.zeros((0, len(features.FeatureUnit)), dtype=np.int64),
+                                                  [None, features.FeatureUnit]),
+        feature_minimap=named_array.NamedDict(player_relative=np.ones((64, 64), dtype=np.int32)),
+    )
+    if feature_screen:
+        observation['feature_screen'] = np.zeros((len(features.SCREEN_FEATURES), 84, 84), dtype=np.int32)
+    return environment.TimeStep(step_type=environment.StepType.MID, reward=0, discount=1.0,
+                                observation=observation)
+
+
+def test_player_fields_are_plain_ints():
+    view = ObsView(timestep())
+    assert view.player.minerals == features.Player.minerals
+    assert type(view.player.food_cap) is int
+    assert view.player is view.player
+
+
+def test_can_do_matches_available_actions():
+    view = ObsView(timestep())
+    assert view.can_do(actions.FUNCTIONS.Train_SCV_quick.id)
+    assert not view.can_do(actions.FUNCTIONS.Attack_minimap.id)
+    assert view.available.sum() == 2
+
+
+def test_selected_types():
+    assert ObsView(timestep()).selected_types == (-1, -1)
+    view = ObsView(timestep(single_select=[units.Terran.SCV],
+                            multi_select=[units.Terran.Marine, units.Terran.Marauder]))
+    assert view.selected_types == (units.Terran.SCV, units.Terran.Marine)
+
+
+def test_raw_layers():
+    view = ObsView(timestep())
+    assert type(view.player_relative) is np.ndarray
+    assert view.player_relative.shape == (64, 64)
+    assert view.feature_screen.shape == (len(features.SCREEN_FEATURES), 84, 84)
+    assert ObsView(timestep(feature_screen=False)).feature_screen is None
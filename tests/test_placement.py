@@ -0,0 +1,74 @@
+import numpy as np
+from pysc2.lib import features
+
+from placement import LEFT, RIGHT, PlacementGrid
+
+N = 84
+
+
+def screen(blocked_boxes=()):
+    layers = np.zeros((len(features.SCREEN_FEATURES), N, N), dtype=np.int32)
+    layers[features.SCREEN_FEATURES.buildable.index] = 1
+    layers[features.SCREEN_FEATURES.pathable.index] = 1
+    for y0, y1, x0, x1 in blocked_boxes:
+        layers[features.SCREEN_FEATURES.pathable.index, y0:y1, x0:x1] = 0
+    return layers
+
+
+def spots(grid, size, side):
+    candidates = grid.candidates[(size, side)]
+    return set(candidates.positions[:len(candidates)].tolist())
+
+
+def test_incremental_updates_match_a_full_rebuild():
+    grid = PlacementGrid(sizes=[6, 9])
+    assert grid.observe(screen())
+    boxes = [(10, 16, 10, 16), (40, 49, 60, 69), (70, 84, 0, 5)]
+    for i in range(len(boxes)):
+        assert grid.observe(screen(boxes[:i + 1]))
+    assert grid.rebuilds == 1
+
+    fresh = PlacementGrid(sizes=[6, 9])
+    fresh.observe(screen(boxes))
+    for size in (6, 9):
+        for side in (LEFT, RIGHT):
+            assert spots(grid, size, side) == spots(fresh, size, side)
+
+
+def test_freed_pixels_trigger_a_rebuild():
+    grid = PlacementGrid(sizes=[6])
+    grid.observe(screen([(10, 20, 10, 20)]))
+    before = grid.free_spots(6, LEFT)
+    grid.observe(screen())
+    assert grid.rebuilds == 2
+    assert grid.free_spots(6, LEFT) > before
+
+
+def test_reserve_removes_the_spots_under_the_footprint():
+    grid = PlacementGrid(sizes=[6])
+    grid.observe(screen())
+    before = grid.free_spots(6, LEFT)
+    grid.reserve(20, 20, 6)
+    assert grid.free_spots(6, LEFT) < before
+    assert 20 * N + 20 not in spots(grid, 6, LEFT)
+
+    # the structure then shows up in the layers; the grid should not change
+    after = spots(grid, 6, LEFT)
+    grid.observe(screen([(17, 23, 17, 23)]))
+    assert spots(grid, 6, LEFT) == after
+
+
+def test_sample_stays_in_its_half_and_returns_none_when_full():
+    grid = PlacementGrid(sizes=[9], rng=np.random.RandomState(0))
+    assert grid.sample(9, LEFT) is None         # not observed yet
+    grid.observe(screen())
+    for _ in range(50):
+        x, y = grid.sample(9, RIGHT)
+        assert x >= N // 2
+        x, y = grid.sample(9, LEFT)
+        assert x < N // 2
+
+    grid.observe(screen([(0, N, 0, N // 2 + 4)]))
+    assert grid.sample(9, LEFT) is None
+    assert grid.free_spots(9, LEFT) == 0
+    assert not grid.observe(None)
@@ -0,0 +1,87 @@
+import numpy as np
+
+from q_table import QLearningTable
+from state_codec import TERMINAL
+
+
+def rows_by_state(qlearn):
+    states, values = qlearn.snapshot()
+    return {state: row.tolist() for state, row in zip(states, values)}
+
+
+def test_prune_drops_zero_rows_and_keeps_rows_with_their_states():
+    qlearn = QLearningTable(actions=[0, 1, 2], learning_rate=1.0)
+    for state in range(10):
+        qlearn.check_state_exist(state)
+    for state in (1, 4, 7):
+        qlearn.learn(state, 1, float(state), TERMINAL)
+    before = rows_by_state(qlearn)
+    qlearn.take_dirty()
+    qlearn.learn(7, 2, 1.0, TERMINAL)
+
+    qlearn.prune()
+
+    assert sorted(qlearn.states) == [1, 4, 7]
+    assert {state: qlearn.state_index[state] for state in qlearn.states} == \
+        {state: row for row, state in enumerate(qlearn.states)}
+    for state in (1, 4):
+        assert rows_by_state(qlearn)[state] == before[state]
+    # dirty 행 번호도 새 위치로
+    dirty_states, dirty_rows = qlearn.take_dirty()
+    assert dirty_states == [7]
+    assert dirty_rows[0].tolist() == [0.0, 7.0, 1.0]
+
+
+def test_prune_evicts_least_recently_learned_rows():
+    qlearn = QLearningTable(actions=[0, 1], learning_rate=1.0, eviction='lru')
+    for state in range(1, 6):
+        qlearn.learn(state, 0, 1.0, TERMINAL)
+    qlearn.learn(1, 0, 1.0, TERMINAL)
+
+    qlearn.prune(3)     # TERMINAL 행은 값이 0 이라 먼저 지워짐
+    assert sorted(qlearn.states) == [1, 4, 5]
+
+
+def test_prune_evicts_least_often_learned_rows():
+    qlearn = QLearningTable(actions=[0, 1], learning_rate=1.0, eviction='lfu')
+    for state in (1, 1, 1, 2, 2, 3, 4):
+        qlearn.learn(state, 0, 1.0, TERMINAL)
+
+    qlearn.prune(2)
+    assert sorted(qlearn.states) == [1, 2]
+
+
+def test_prune_remaps_pending_and_traces():
+    nstep = QLearningTable(actions=[0, 1], learning_rate=1.0, learner='nstep', n_steps=5)
+    for state in range(1, 4):
+        nstep.check_state_exist(state)
+    nstep.learn(3, 1, 1.0, 10)
+    nstep.prune(0)
+    assert 3 in nstep.state_index
+    assert [(nstep.states[row], column) for row, column, _ in nstep.pending] == [(3, 1)]
+
+    qlambda = QLearningTable(actions=[0, 1], learning_rate=0.5, learner='qlambda')
+    for state in range(1, 4):
+        qlambda.check_state_exist(state)
+    qlambda.learn(3, 0, 1.0, 11)
+    qlambda.prune(0)
+    assert [(qlambda.states[row], column) for row, column in qlambda.traces] == [(3, 0)]
+
+
+def test_disallowed_actions_go_with_their_rows():
+    qlearn = QLearningTable(actions=[0, 1], learning_rate=1.0)
+    qlearn.choose_action(1, [1])
+    qlearn.choose_action(2, [0])
+    qlearn.learn(2, 1, 1.0, TERMINAL)
+    qlearn.prune()
+    assert list(qlearn.disallowed_actions) == [2]
+
+
+def test_max_rows_is_enforced_at_the_end_of_an_episode():
+    qlearn = QLearningTable(actions=[0, 1], learning_rate=1.0, max_rows=10)
+    for state in range(1, 30):
+        qlearn.learn(state, 0, 1.0, state + 1)
+    qlearn.learn(30, 0, 1.0, TERMINAL)
+    assert len(qlearn) <= 10
+    assert qlearn.take_evicted() > 0
+    np.testing.assert_array_equal(qlearn.values[len(qlearn):], 0)
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+import qtable_file
+from q_table import QLearningTable
+
+
+@pytest.fixture
+def table_file(tmp_path):
+    path = str(tmp_path / 'table.qtb')
+    states = [30, 10, 20]
+    values = np.array([[3.0, -3.0], [1.0, -1.0], [2.0, 5.0]])
+    qtable_file.write(path, states, values)
+    return path, states, values
+
+
+def test_write_and_read_round_trip(table_file):
+    path, states, values = table_file
+    qlearn = qtable_file.read(path, QLearningTable(actions=[0, 1]))
+    read_states, read_values = qlearn.snapshot()
+    assert read_states == sorted(states)
+    np.testing.assert_array_equal(read_values, values[np.argsort(states)])
+
+
+def test_mapped_table_lookups(table_file):
+    path, _, _ = table_file
+    table = qtable_file.MappedQTable(path)
+    assert len(table) == 3
+    assert table.find(20) == 1
+    assert table.find(25) is None
+    assert table.q_values(30).tolist() == [3.0, -3.0]
+    assert table.q_values(25).tolist() == [0.0, 0.0]
+
+
+def test_mapped_table_plays_greedily_within_the_mask(table_file):
+    path, _, _ = table_file
+    table = qtable_file.MappedQTable(path, e_greedy=1.0)
+    assert table.choose_action(20) == 1
+    assert table.choose_action(20, [1]) == 0
+    table.learn(20, 0, 100.0, 30)       # 읽기 전용: 아무것도 바뀌지 않음
+    assert table.q_values(20).tolist() == [2.0, 5.0]
+
+
+def test_float32_files_and_empty_tables(tmp_path):
+    path = str(tmp_path / 'small.qtb')
+    qtable_file.write(path, [7], np.array([[0.5, 0.25]]), dtype=np.float32)
+    assert qtable_file.MappedQTable(path).values.dtype == np.float32
+
+    empty = str(tmp_path / 'empty.qtb')
+    qtable_file.write(empty, [], np.zeros((0, 2)))
+    assert len(qtable_file.MappedQTable(empty)) == 0
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'not_a_table.qtb'
+    path.write_bytes(b'x' * 100)
+    with pytest.raises(ValueError):
+        qtable_file.MappedQTable(str(path))
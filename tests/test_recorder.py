@@ -0,0 +1,50 @@
+import random
+
+import numpy as np
+
+import recorder
+import terran_agent_alpha
+from mock_env import MockSC2Env
+from terran_agent_alpha import TerranAgent
+
+
+def seeded_agent(seed=0):
+    random.seed(seed)
+    np.random.seed(seed)
+    return TerranAgent(persist=False)
+
+
+def record(directory, episodes=1, chunk_size=300):
+    agent = seeded_agent()
+    lasts = []
+    with recorder.RecordingEnv(MockSC2Env(seed=0), directory, chunk_size) as env:
+        agent.setup(env.observation_spec(), env.action_spec())
+        for _ in range(episodes):
+            lasts.append(terran_agent_alpha.run_episode(env, agent))
+    return agent, lasts
+
+
+def test_recording_round_trips_the_observations(tmp_path):
+    directory = str(tmp_path / 'recording')
+    agent, lasts = record(directory)
+
+    assert len(recorder.chunk_files(directory)) > 1
+    steps = [step for path in recorder.chunk_files(directory) for step in recorder.iter_chunk(path)]
+    assert len(steps) == agent.steps
+    first, _ = steps[0]
+    last, last_action = steps[-1]
+    assert first.first() and last.last()
+    assert last.reward == lasts[0].reward
+    assert last_action is None
+    np.testing.assert_array_equal(last.observation['player'], lasts[0].observation['player'])
+    assert all(original is not None for _, original in steps[:-1])
+
+
+def test_replay_with_the_same_seed_repeats_the_recorded_actions(tmp_path):
+    directory = str(tmp_path / 'recording')
+    record(directory, episodes=2)
+
+    result = recorder.replay(directory, seeded_agent())
+    assert result['episodes'] == 2
+    assert result['same_as_recorded'] == 1.0
+    assert result['digest'] == recorder.replay(directory, seeded_agent())['digest']
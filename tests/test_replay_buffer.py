@@ -0,0 +1,54 @@
+import numpy as np
+
+from q_table import QLearningTable
+from replay_buffer import ReplayBuffer, ReplayTrainer
+from state_codec import TERMINAL
+
+
+def filled(capacity, n):
+    buffer = ReplayBuffer(capacity, 2)
+    for i in range(n):
+        buffer.add(i + 1, i % 2, float(i), TERMINAL if i % 3 == 2 else i + 2, [i % 2 == 0, False])
+    return buffer
+
+
+def test_ring_buffer_keeps_the_newest_transitions_in_order():
+    buffer = filled(4, 6)
+    assert len(buffer) == 4
+    states, actions, rewards, next_states, next_masks, terminal = buffer.batch(buffer.ordered())
+    assert states.tolist() == [3, 4, 5, 6]
+    assert rewards.tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert terminal.tolist() == [True, False, False, True]
+    assert next_masks[:, 0].tolist() == [True, False, True, False]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = str(tmp_path / 'replay.npz')
+    buffer = filled(4, 6)
+    buffer.save(path)
+
+    loaded = ReplayBuffer.load(path)
+    assert len(loaded) == 4
+    for saved, read in zip(buffer.batch(buffer.ordered()), loaded.batch(loaded.ordered())):
+        np.testing.assert_array_equal(saved, read)
+
+    smaller = ReplayBuffer.load(path, capacity=2)
+    assert smaller.batch(smaller.ordered())[0].tolist() == [5, 6]
+    smaller.add(99, 0, 0.0, TERMINAL)
+    assert smaller.batch(smaller.ordered())[0].tolist() == [6, 99]
+
+
+def test_warm_start_learns_every_transition():
+    qlearn = QLearningTable(actions=[0, 1], learning_rate=1.0)
+    trainer = ReplayTrainer(qlearn, filled(10, 6), batch_size=4)
+    trainer.warm_start()
+    assert trainer.updates == 2
+    assert qlearn.values[qlearn.state_index[3], 0] == 2.0      # 3 -> TERMINAL, reward 2
+
+
+def test_learn_batch_accepts_lists():
+    qlearn = QLearningTable(actions=[0, 1], learning_rate=1.0)
+    qlearn.learn_batch([1, 2, 3], [0, 1, 0], [1.0, 2.0, 3.0], [2, TERMINAL, 3],
+                       next_masks=[[False, False]] * 3, terminal=[False, True, False])
+    assert qlearn.values[qlearn.state_index[2], 1] == 2.0
+    assert 3 not in qlearn.state_index      # s == s_ 인 transition 은 건너뜀
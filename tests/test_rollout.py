@@ -0,0 +1,28 @@
+import queue
+
+from rollout import PolicyClient
+from state_codec import TERMINAL
+
+
+def test_policy_client_batches_transitions_to_the_learner():
+    outbox = queue.Queue()
+    client = PolicyClient([0, 1], outbox, batch_size=2)
+    client.choose_action(1, [1])
+    client.learn(1, 0, 0.0, 2)
+    assert outbox.empty()
+    client.learn(2, 1, 1.0, TERMINAL, choice=(2, 1, True))
+
+    kind, transitions = outbox.get_nowait()
+    assert kind == 'transitions'
+    assert [transition[:4] for transition in transitions] == [(1, 0, 0.0, 2), (2, 1, 1.0, TERMINAL)]
+    assert not client.values.any()      # worker 쪽 table 은 직접 학습하지 않음
+
+
+def test_reset_traces_keeps_unsent_transitions():
+    outbox = queue.Queue()
+    client = PolicyClient([0, 1], outbox, batch_size=10)
+    client.learn(1, 0, 1.0, 2)
+    client.reset_traces()
+    client.load_snapshot([], [])
+    client.flush()
+    assert [transition[:4] for transition in outbox.get_nowait()[1]] == [(1, 0, 1.0, 2)]
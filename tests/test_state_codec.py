@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+import state_codec
+from state_codec import TERMINAL
+
+
+def legacy_key(buckets):
+    """State key as the old agent wrote it: str() of the float feature array."""
+    return str(np.array(buckets, dtype=np.float64))
+
+
+def test_encode_matches_pack_of_buckets():
+    raw = [125, 1234, 260, 2, 1, 37, 0, 1, 0, 0, 1, 0, 0, 1]
+    buckets = [12, 12, 5, 2, 1, 3, 0, 1, 0, 0, 1, 0, 0, 1]
+    assert state_codec.encode(raw) == state_codec.pack(buckets)
+    assert state_codec.unpack(state_codec.encode(raw)).tolist() == buckets
+
+
+def test_parse_legacy_key():
+    buckets = [3, 4, 1, 1, 0, 2, 0, 0, 1, 0, 1, 0, 0, 0]
+    assert state_codec.parse_legacy_key(legacy_key(buckets)) == state_codec.pack(buckets)
+    assert state_codec.parse_legacy_key('terminal') == TERMINAL
+
+
+def test_rekey_dataframe_merges_clipped_legacy_keys():
+    low = [0, 200, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]    # minerals clip at 127 buckets
+    high = [0, 300, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+    other = [1, 2, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+    table = pd.DataFrame([[1.0, 0.0], [3.0, 2.0], [5.0, 5.0], [0.5, 0.5]],
+                         index=[legacy_key(low), legacy_key(high), legacy_key(other), 'terminal'], columns=[0, 1])
+
+    rekeyed = state_codec.rekey_dataframe(table)
+
+    clipped = state_codec.pack(low)
+    assert clipped == state_codec.pack(high)
+    assert rekeyed.loc[clipped].tolist() == [2.0, 1.0]
+    assert rekeyed.loc[state_codec.pack(other)].tolist() == [5.0, 5.0]
+    assert rekeyed.loc[TERMINAL].tolist() == [0.5, 0.5]
+    assert len(rekeyed) == 3
+
+
+def test_rekey_dataframe_keeps_integer_keys():
+    key = state_codec.pack([1, 2, 3, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0])
+    table = pd.DataFrame([[1.0, 2.0]], index=[key], columns=[0, 1])
+    assert state_codec.rekey_dataframe(table).loc[key].tolist() == [1.0, 2.0]
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from tournament import Standings, wilson
+
+
+def test_wilson_interval():
+    assert wilson(0, 0) == (0.0, 1.0)
+    low, high = wilson(50, 100)
+    assert low == pytest.approx(0.4038, abs=1e-4)
+    assert high == pytest.approx(0.5962, abs=1e-4)
+    assert wilson(0, 10)[0] == 0.0 and wilson(10, 10)[1] == 1.0
+    # 게임이 많을수록 구간이 좁아짐
+    assert np.diff(wilson(30, 100)) > np.diff(wilson(300, 1000))
+
+
+def play(standings, policy, wins, losses):
+    for reward in [1] * wins + [-1] * losses:
+        standings.add(policy, 0, reward, 1.0)
+
+
+def test_policies_stop_once_their_rank_is_settled():
+    standings = Standings(['a', 'b', 'c'], ['easy'], min_games=10, max_games=100, z=1.96)
+    play(standings, 0, 5, 5)
+    play(standings, 1, 5, 5)
+    play(standings, 2, 0, 4)
+    # c 는 min_games 전이라 계속, a 와 b 는 구간이 겹쳐서 계속
+    assert standings.active().tolist() == [True, True, True]
+
+    # c 는 상한이 a, b 의 하한보다 낮아서 중단, a 와 b 는 아직 겹침
+    play(standings, 2, 0, 36)
+    assert standings.active().tolist() == [True, True, False]
+
+    # a 가 b 와 갈라지면 a 는 순위가 정해지고, b 는 상한이 a 의 하한보다 낮아서 중단
+    play(standings, 0, 43, 0)
+    assert standings.active().tolist() == [False, False, False]
+
+
+def test_next_policy_balances_rungs_and_counts_running_games():
+    standings = Standings(['a', 'b'], ['easy', 'medium'], min_games=100, max_games=4, z=1.96)
+    in_flight = np.zeros((2, 2), dtype=np.int64)
+    standings.add(0, 0, 1, 1.0)
+    assert standings.next_policy(0, in_flight) == 1
+    in_flight[1, 0] = 1
+    assert standings.next_policy(0, in_flight) in (0, 1)
+    assert standings.next_policy(1, in_flight) in (0, 1)
+
+    standings.add(0, 1, 1, 1.0)
+    standings.add(0, 1, 1, 1.0)
+    in_flight[0, 0] = 1        # a 는 끝난 게임 3 + 진행 중 1 = max_games
+    assert standings.next_policy(1, in_flight) == 1
+    in_flight[1, 1] = 3
+    assert standings.next_policy(0, in_flight) is None
@@ -0,0 +1,275 @@
+"""Rank saved Q-tables by playing them greedily against a difficulty ladder.
+
+Every policy is opened read-only as a memory-mapped .qtb (gzip pickles and
+checkpoints are converted to a temporary .qtb first) and played with
+exploration off. Worker processes each keep one env alive for one rung of
+the ladder and play the games the coordinator hands them; the coordinator
+gives every rung's next game to the active policy with the fewest games on
+that rung, so each policy's games stay balanced over the ladder.
+
+Win rates come with Wilson score intervals. After --min_games a policy stops
+getting games once its interval no longer overlaps any other policy's (its
+rank is settled), once its upper bound falls below the best lower bound (a
+clear loser), or at --max_games:
+
+    python tournament.py --policies a.gz,b.qtb,Terran_Agent_data --ladder very_easy,easy,medium --workers 6
+    python tournament.py --policies a.qtb,b.qtb --env mock --ladder easy,medium
+
+The --env, --map, --step_mul and --workers flags are the ones rollout.py
+defines.
+"""
+from pysc2.env import sc2_env
+from absl import app, flags, logging
+
+import json
+import math
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+import env_session
+import qtable_file
+import rollout
+import terran_agent_alpha
+from checkpoint import CheckpointStore
+from q_table import QLearningTable
+from terran_agent_alpha import Q_actions, TerranAgent
+
+FLAGS = flags.FLAGS
+flags.DEFINE_list('policies', [], 'Q-tables to rank: .qtb files, .gz pickles or checkpoint paths.')
+flags.DEFINE_list('ladder', ['very_easy', 'easy', 'medium'], 'Bot difficulties every policy plays against.')
+flags.DEFINE_integer('min_games', 20, 'Games per policy before it can be stopped early.')
+flags.DEFINE_integer('max_games', 300, 'Games per policy at most.')
+flags.DEFINE_float('z_score', 1.96, 'z-score of the Wilson intervals (1.96 = 95%).')
+flags.DEFINE_integer('seed', 0, 'Seed of the worker processes.')
+flags.DEFINE_string('output', 'tournament.json', 'Where to write the JSON results.')
+
+
+def wilson(wins, games, z=1.96):
+    """Wilson score interval of a win rate."""
+    if games == 0:
+        return 0.0, 1.0
+    p = wins / float(games)
+    denominator = 1 + z * z / games
+    centre = (p + z * z / (2 * games)) / denominator
+    half = z * math.sqrt(p * (1 - p) / games + z * z / (4 * games * games)) / denominator
+    return max(centre - half, 0.0), min(centre + half, 1.0)
+
+
+def as_qtb(path, directory):
+    """A .qtb file holding the policy at path, converted into directory if needed."""
+    base, extension = os.path.splitext(path)
+    if extension == '.qtb' and not any(os.path.isfile(base + suffix) for suffix in ('.log', '.log.old')):
+        return path
+    output = os.path.join(directory, '%d_%s.qtb' % (len(os.listdir(directory)), os.path.basename(base)))
+    if extension == '.gz':
+        qtable_file.from_pickle(path, output)
+        return output
+    qlearn = QLearningTable(actions=list(range(len(Q_actions))))
+    CheckpointStore(base if extension == '.qtb' else path).load(qlearn, read_only=True)
+    qtable_file.write(output, *qlearn.snapshot())
+    return output
+
+
+class Standings:
+    """Wins and games per policy and ladder rung, and which policies still need games."""
+
+    def __init__(self, policies, ladder, min_games, max_games, z):
+        self.policies = policies
+        self.ladder = ladder
+        self.min_games = min_games
+        self.max_games = max_games
+        self.z = z
+        self.wins = np.zeros((len(policies), len(ladder)), dtype=np.int64)
+        self.games = np.zeros((len(policies), len(ladder)), dtype=np.int64)
+        self.seconds = np.zeros(len(policies))
+
+    def add(self, policy, rung, reward, seconds):
+        self.games[policy, rung] += 1
+        self.wins[policy, rung] += reward == 1
+        self.seconds[policy] += seconds
+
+    def intervals(self):
+        return [wilson(wins, games, self.z) for wins, games in zip(self.wins.sum(axis=1), self.games.sum(axis=1))]
+
+    def active(self):
+        """Bool array of the policies that still need games."""
+        games = self.games.sum(axis=1)
+        intervals = self.intervals()
+        best_low = max(low for low, _ in intervals)
+        active = games < self.max_games
+        for i, (low, high) in enumerate(intervals):
+            if games[i] < self.min_games or len(self.policies) == 1:
+                continue
+            separated = all(high < other_low or low > other_high
+                            for j, (other_low, other_high) in enumerate(intervals) if j != i)
+            if separated or high < best_low:
+                active[i] = False
+        return active
+
+    def next_policy(self, rung, in_flight):
+        """Active policy with the fewest finished and running games on a rung, or None."""
+        # 진행 중인 게임까지 세어야 max_games 를 넘지 않음
+        active = np.flatnonzero(self.active() & (self.games.sum(axis=1) + in_flight.sum(axis=1) < self.max_games))
+        if len(active) == 0:
+            return None
+        load = self.games[active, rung] + in_flight[active, rung]
+        return int(active[np.argmin(load)])
+
+    def results(self, hours):
+        intervals = self.intervals()
+        games = self.games.sum(axis=1)
+        rates = self.wins.sum(axis=1) / np.maximum(games, 1).astype(np.float64)
+        order = np.lexsort((-np.array([low for low, _ in intervals]), -rates))
+        return [{
+            'rank': rank + 1,
+            'policy': self.policies[i],
+            'games': int(games[i]),
+            'winrate': float(rates[i]),
+            'interval': [float(value) for value in intervals[i]],
+            'ladder': {name: {'games': int(self.games[i, rung]), 'wins': int(self.wins[i, rung])}
+                       for rung, name in enumerate(self.ladder)},
+            'games_per_hour': float(games[i] / hours) if hours else 0.0,
+        } for rank, i in enumerate(order)]
+
+
+def _worker(worker_id, config, rung, tasks, results):
+    if not FLAGS.is_parsed():
+        FLAGS.mark_as_parsed()
+    seed = config['seed'] * 1000 + worker_id
+    random.seed(seed)
+    np.random.seed(seed)
+
+    env_config = dict(config, difficulty=config['ladder'][rung])
+    factory = rollout.ENV_FACTORIES[config['env']]
+    agents = {}
+    with env_session.EnvSession(lambda: factory(env_config, worker_id), config['env_restart_every']) as session:
+        while True:
+            policy = tasks.get()
+            if policy is None:
+                return
+            agent = agents.get(policy)
+            if agent is None:
+                # e_greedy=1.0: 항상 greedy (탐험 없음)
+                qlearn = qtable_file.MappedQTable(config['qtb_files'][policy], list(range(len(Q_actions))),
+                                                  e_greedy=1.0)
+                agent = agents[policy] = TerranAgent(qlearn=qlearn, persist=False)
+            start = time.time()
+            try:
+                if agent.obs_spec is None:
+                    agent.setup(session.observation_spec(), session.action_spec())
+                reward = terran_agent_alpha.run_episode(session, agent).reward
+            except env_session.EnvCrashed:
+                agent.abort_episode()
+                reward = None
+            results.put((policy, rung, reward, time.time() - start))
+
+
+def run(config):
+    ladder, n_policies = config['ladder'], len(config['policies'])
+    standings = Standings(config['policies'], ladder, config['min_games'], config['max_games'], config['z'])
+    # 단계마다 worker 가 하나 이상 있도록
+    n_workers = max(config['workers'], len(ladder))
+
+    directory = tempfile.mkdtemp(prefix='tournament_')
+    try:
+        config = dict(config, qtb_files=[as_qtb(path, directory) for path in config['policies']])
+        task_queues = [multiprocessing.Queue() for _ in ladder]
+        results = multiprocessing.Queue()
+        capacity = np.zeros(len(ladder), dtype=np.int64)
+        workers = []
+        for worker_id in range(n_workers):
+            rung = worker_id % len(ladder)
+            capacity[rung] += 1
+            worker = multiprocessing.Process(target=_worker,
+                                             args=(worker_id, config, rung, task_queues[rung], results))
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+
+        in_flight = np.zeros((n_policies, len(ladder)), dtype=np.int64)
+        start = time.time()
+        while True:
+            # 각 단계의 빈 worker 에게 게임을 하나씩
+            for rung in range(len(ladder)):
+                while in_flight[:, rung].sum() < capacity[rung]:
+                    policy = standings.next_policy(rung, in_flight)
+                    if policy is None:
+                        break
+                    in_flight[policy, rung] += 1
+                    task_queues[rung].put(policy)
+            if in_flight.sum() == 0:
+                break
+
+            try:
+                policy, rung, reward, seconds = results.get(timeout=1)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    raise RuntimeError('all tournament workers exited')
+                continue
+            in_flight[policy, rung] -= 1
+            if reward is not None:
+                standings.add(policy, rung, reward, seconds)
+                logging.info('%s vs %s: reward %d (%d games)', config['policies'][policy], ladder[rung], reward,
+                             standings.games[policy].sum())
+
+        for task_queue in task_queues:
+            for _ in range(n_workers):
+                task_queue.put(None)
+        for worker in workers:
+            worker.join(timeout=30)
+            if worker.is_alive():
+                worker.terminate()
+        hours = (time.time() - start) / 3600
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        'config': {key: value for key, value in config.items() if key != 'qtb_files'},
+        'games': int(standings.games.sum()),
+        'games_per_hour': float(standings.games.sum() / hours) if hours else 0.0,
+        'standings': standings.results(hours),
+    }
+
+
+def report(results):
+    print('%d games, %.0f games/hour' % (results['games'], results['games_per_hour']))
+    for entry in results['standings']:
+        low, high = entry['interval']
+        print('%2d. %-40s %5.1f%% [%5.1f%%, %5.1f%%]  %4d games  %s' % (
+            entry['rank'], entry['policy'], entry['winrate'] * 100, low * 100, high * 100, entry['games'],
+            ' '.join('%s %d/%d' % (name, rung['wins'], rung['games']) for name, rung in entry['ladder'].items())))
+
+
+def main(unused_argv):
+    if not FLAGS.policies:
+        raise app.UsageError('--policies is required')
+    for name in FLAGS.ladder:
+        if name not in sc2_env.Difficulty.__members__:
+            raise app.UsageError('Unknown difficulty %r' % name)
+    results = run({
+        'policies': FLAGS.policies,
+        'ladder': FLAGS.ladder,
+        'workers': FLAGS.workers,
+        'env': FLAGS.env,
+        'map': FLAGS.map,
+        'step_mul': FLAGS.step_mul,
+        'env_restart_every': FLAGS.env_restart_every,
+        'min_games': FLAGS.min_games,
+        'max_games': FLAGS.max_games,
+        'z': FLAGS.z_score,
+        'seed': FLAGS.seed,
+    })
+    with open(FLAGS.output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    report(results)
+
+
+if __name__ == '__main__':
+    app.run(main)
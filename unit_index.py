@@ -0,0 +1,59 @@
+import random
+
+import numpy as np
+from pysc2.lib import features
+
+_UNIT_TYPE = features.FeatureUnit.unit_type
+_X = features.FeatureUnit.x
+_Y = features.FeatureUnit.y
+
+
+class UnitIndex:
+    """feature_units grouped by unit type, built once per observation.
+
+    The unit_type column is sorted once (stably, so units keep their
+    original order within a type) and every query afterwards is a dict
+    lookup plus a slice.
+    """
+
+    def __init__(self, feature_units):
+        feature_units = np.asarray(feature_units)
+        if feature_units.ndim != 2 or len(feature_units) == 0:
+            self._xy = np.zeros((0, 2), dtype=np.int64)
+            self._groups = {}
+            return
+
+        unit_types = feature_units[:, _UNIT_TYPE]
+        order = np.argsort(unit_types, kind='stable')
+        sorted_types = unit_types[order]
+        types, starts, counts = np.unique(sorted_types, return_index=True, return_counts=True)
+
+        self._xy = feature_units[order][:, [_X, _Y]]
+        self._groups = {unit_type: (start, start + count)
+                        for unit_type, start, count in zip(types.tolist(), starts.tolist(), counts.tolist())}
+
+    def count(self, unit_type):
+        start, end = self._groups.get(unit_type, (0, 0))
+        return end - start
+
+    def coords(self, unit_type):
+        """(n, 2) array of (x, y) screen coordinates of every unit of the type."""
+        start, end = self._groups.get(unit_type, (0, 0))
+        return self._xy[start:end]
+
+    def nth(self, unit_type, n):
+        start, end = self._groups.get(unit_type, (0, 0))
+        if start + n >= end:
+            return None
+        x, y = self._xy[start + n]
+        return (int(x), int(y))
+
+    def first(self, unit_type):
+        return self.nth(unit_type, 0)
+
+    def random(self, unit_type):
+        start, end = self._groups.get(unit_type, (0, 0))
+        if start == end:
+            return None
+        x, y = self._xy[random.randrange(start, end)]
+        return (int(x), int(y))